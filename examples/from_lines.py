@@ -62,9 +62,9 @@ force = ForceDiagram.from_formdiagram(form)
 
 horizontal_nodal(form, force)
 
-scale = vertical_from_zmax(form, zmax=2)
+result = vertical_from_zmax(form, zmax=2)
 
-print('scale:', scale)
+print('scale:', result['scale'])
 print('zmax:', max(form.get_vertices_attribute('z')))
 print('residual:', form.residual())
 
@@ -54,10 +54,10 @@ force = ForceDiagram.from_formdiagram(form)
 horizontal(form, force)
 
 
-scale = vertical_from_zmax(form, zmax=3, xtol=1e-3, rtol=1e-2, kmax=200)
+result = vertical_from_zmax(form, zmax=3, xtol=1e-3, rtol=1e-2, kmax=200)
 
 
-print('scale:', scale)
+print('scale:', result['scale'])
 print('zmax:', max(form.get_vertices_attribute('z')))
 print('residual:', form.residual())
 
@@ -20,7 +20,10 @@ def read(*names, **kwargs):
 
 long_description = read('README.md')
 requirements = read('requirements.txt').split('\n')
-optional_requirements = {}
+optional_requirements = {
+    'sparseqr': ['sparseqr'],
+    'pyamg': ['pyamg'],
+}
 
 setup(
     name='compas_tna',
@@ -9,6 +9,7 @@ compas_tna
 .. toctree::
     :maxdepth: 1
 
+    compas_tna.benchmarks
     compas_tna.diagrams
     compas_tna.equilibrium
     compas_tna.rhino
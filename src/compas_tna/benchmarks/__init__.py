@@ -0,0 +1,60 @@
+"""
+********************************************************************************
+compas_tna.benchmarks
+********************************************************************************
+
+.. currentmodule:: compas_tna.benchmarks
+
+Timed scenarios of the main steps of the form finding pipeline, on procedurally
+generated form diagrams of increasing size, with results stored as JSON baselines.
+
+.. code-block:: bash
+
+    python -m compas_tna.benchmarks run
+    python -m compas_tna.benchmarks compare
+
+The ``compare`` command exits with a non-zero status if the best run of any benchmark is slower
+than the median of the baseline runs by more than their spread (see :func:`compare_results`).
+It requires at least three runs per benchmark.
+
+
+Generators
+==========
+
+.. autosummary::
+    :toctree: generated/
+    :nosignatures:
+
+    orthogonal_grid
+    radial_dome
+    cross_vault
+    fan_vault
+    resolution
+
+
+Benchmarks
+==========
+
+.. autosummary::
+    :toctree: generated/
+    :nosignatures:
+
+    make_diagram
+    environment
+    run_benchmarks
+    save_results
+    load_results
+    compare_results
+
+"""
+from __future__ import absolute_import
+
+from . import generators
+from . import scenarios
+from . import runner
+
+__all__ = generators.__all__ + scenarios.__all__ + runner.__all__
+
+from .generators import *
+from .scenarios import *
+from .runner import *
@@ -0,0 +1,105 @@
+"""Run the benchmarks, or compare their results with a baseline.
+
+Examples
+--------
+.. code-block:: bash
+
+    # run the benchmarks and store the results as the baseline
+    python -m compas_tna.benchmarks run --output data/benchmarks/baseline.json
+
+    # run the benchmarks and compare the results with the baseline
+    python -m compas_tna.benchmarks compare --baseline data/benchmarks/baseline.json
+
+    # include the largest diagrams
+    python -m compas_tna.benchmarks run --sizes 100 1000 10000 100000
+
+"""
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import division
+
+import os
+import sys
+import argparse
+
+from compas_tna.benchmarks.scenarios import DIAGRAMS
+from compas_tna.benchmarks.scenarios import SCENARIOS
+from compas_tna.benchmarks.runner import BASELINE
+from compas_tna.benchmarks.runner import SIZES
+from compas_tna.benchmarks.runner import run_benchmarks
+from compas_tna.benchmarks.runner import save_results
+from compas_tna.benchmarks.runner import load_results
+from compas_tna.benchmarks.runner import compare_results
+
+
+__author__  = 'Tom Van Mele'
+__email__   = 'vanmelet@ethz.ch'
+
+
+def _parser():
+    parser = argparse.ArgumentParser(prog='python -m compas_tna.benchmarks', description='Benchmarks of compas_tna.')
+    commands = parser.add_subparsers(dest='command')
+
+    run = commands.add_parser('run', help='run the benchmarks and save the results')
+    compare = commands.add_parser('compare', help='run the benchmarks and compare the results with a baseline')
+
+    for command in (run, compare):
+        command.add_argument('--diagrams', nargs='+', choices=sorted(DIAGRAMS), help='the diagrams (default: all)')
+        command.add_argument('--scenarios', nargs='+', choices=sorted(SCENARIOS), help='the scenarios (default: all)')
+        command.add_argument('--sizes', nargs='+', type=int, default=SIZES, help='the approximate numbers of edges (default: %(default)s)')
+        command.add_argument('--repeat', type=int, default=5, help='the number of timed runs per benchmark (default: %(default)s)')
+        command.add_argument('--output', help='save the results to this file')
+
+    run.set_defaults(output=BASELINE)
+
+    compare.add_argument('--baseline', default=BASELINE, help='the baseline results (default: %(default)s)')
+    compare.add_argument('--tolerance', type=float, default=0.1, help='the allowed relative slowdown on top of the noise of the baseline (default: %(default)s)')
+    compare.add_argument('--spread', type=float, default=3.0, help='the allowed slowdown in multiples of the spread of the baseline runs (default: %(default)s)')
+    compare.add_argument('--floor', type=float, default=0.001, help='the absolute slowdown in seconds below which differences are ignored (default: %(default)s)')
+    return parser
+
+
+def main(argv=None):
+    args = _parser().parse_args(argv)
+    if args.command is None:
+        _parser().print_help()
+        return 2
+
+    if args.command == 'compare':
+        if not os.path.exists(args.baseline):
+            print('The baseline does not exist: {}'.format(args.baseline))
+            print('Use the run command to create it.')
+            return 2
+        baseline = load_results(args.baseline)
+        # the noise of the timings cannot be estimated from less than three runs
+        if args.repeat < 3 or baseline.get('repeat', 0) < 3:
+            print('Comparing requires at least three runs per benchmark, in the results and in the baseline.')
+            return 2
+
+    results = run_benchmarks(args.diagrams, args.scenarios, args.sizes, repeat=args.repeat)
+
+    if args.output:
+        save_results(results, args.output)
+        print('Results saved to {}'.format(args.output))
+
+    if args.command == 'run':
+        return 0
+
+    rows = compare_results(results, baseline, tolerance=args.tolerance, spread=args.spread, floor=args.floor)
+    print()
+    print('{0:<44} {1:>12} {2:>12} {3:>12} {4:>8}'.format('benchmark', 'baseline', 'current', 'limit', 'ratio'))
+    for row in rows:
+        flag = 'REGRESSION' if row['regression'] else ''
+        print('{0:<44} {1:>12.4f} {2:>12.4f} {3:>12.4f} {4:>8.2f} {5}'.format(row['key'], row['baseline'], row['current'], row['limit'], row['ratio'], flag))
+    regressions = [row for row in rows if row['regression']]
+    print()
+    print('{} of {} benchmarks regressed (tolerance {:.0%} + {} x spread).'.format(len(regressions), len(rows), args.tolerance, args.spread))
+    return 1 if regressions else 0
+
+
+# ==============================================================================
+# Main
+# ==============================================================================
+
+if __name__ == '__main__':
+    sys.exit(main())
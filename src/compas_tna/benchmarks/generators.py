@@ -0,0 +1,293 @@
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import division
+
+from math import pi
+from math import sin
+from math import cos
+from math import sqrt
+
+from compas_tna.diagrams import FormDiagram
+
+
+__author__  = 'Tom Van Mele'
+__email__   = 'vanmelet@ethz.ch'
+
+
+__all__ = [
+    'orthogonal_grid',
+    'radial_dome',
+    'cross_vault',
+    'fan_vault',
+    'resolution',
+]
+
+
+def _orient(vertices, faces):
+    # make all faces counterclockwise
+    oriented = []
+    for face in faces:
+        area = 0.0
+        for i in range(len(face)):
+            x0, y0 = vertices[face[i - 1]][:2]
+            x1, y1 = vertices[face[i]][:2]
+            area += x0 * y1 - x1 * y0
+        oriented.append(face if area > 0 else face[::-1])
+    return oriented
+
+
+def _form(vertices, faces, anchors, feet):
+    # remove the vertices that are not used by any face
+    used     = sorted(set(index for face in faces for index in face))
+    index    = {old: new for new, old in enumerate(used)}
+    vertices = [vertices[old] for old in used]
+    faces    = [[index[old] for old in face] for face in faces]
+    anchors  = [index[old] for old in anchors if old in index]
+    form = FormDiagram.from_vertices_and_faces(vertices, _orient(vertices, faces))
+    boundaries = form.vertices_on_boundaries()
+    form.set_vertices_attribute('is_anchor', True, keys=anchors)
+    form.update_exterior(boundaries[0], feet=feet)
+    form.update_interior(boundaries[1:])
+    return form
+
+
+class _Vertices(object):
+    # vertex list that merges coincident points
+
+    def __init__(self, precision=9):
+        self.precision = precision
+        self.xyz       = []
+        self.index     = {}
+
+    def __call__(self, x, y):
+        key = round(x, self.precision), round(y, self.precision)
+        if key not in self.index:
+            self.index[key] = len(self.xyz)
+            self.xyz.append([x, y, 0.0])
+        return self.index[key]
+
+
+def orthogonal_grid(n, size=10.0, opening=0, feet=2):
+    """Construct the form diagram of a vault on a square base, with an orthogonal grid.
+
+    Parameters
+    ----------
+    n : int
+        The number of cells in each direction.
+    size : float, optional
+        The size of the base.
+        Default is ``10.0``.
+    opening : int, optional
+        The number of cells in each direction of a central opening.
+        Default is ``0``.
+    feet : int, optional
+        The number of feet per anchor, see :meth:`FormDiagram.update_exterior`.
+        Default is ``2``.
+
+    Returns
+    -------
+    FormDiagram
+        A form diagram with all vertices on the boundary of the base anchored.
+
+    """
+    d = size / n
+    vertices = [[i * d, j * d, 0.0] for j in range(n + 1) for i in range(n + 1)]
+    lo = (n - opening) // 2
+    hi = lo + opening
+    faces = []
+    for j in range(n):
+        for i in range(n):
+            if opening and lo <= i < hi and lo <= j < hi:
+                continue
+            a = j * (n + 1) + i
+            faces.append([a, a + 1, a + n + 2, a + n + 1])
+    anchors = [j * (n + 1) + i for j in range(n + 1) for i in range(n + 1) if i in (0, n) or j in (0, n)]
+    return _form(vertices, faces, anchors, feet)
+
+
+def radial_dome(n, segments=None, radius=5.0, opening=0, feet=2):
+    """Construct the form diagram of a dome on a circular base, with a radial pattern.
+
+    Parameters
+    ----------
+    n : int
+        The number of rings.
+    segments : int, optional
+        The number of segments per ring.
+        Default is ``4 * n``.
+    radius : float, optional
+        The radius of the base.
+        Default is ``5.0``.
+    opening : int, optional
+        The number of inner rings that are left open, forming an oculus.
+        Default is ``0``.
+    feet : int, optional
+        The number of feet per anchor, see :meth:`FormDiagram.update_exterior`.
+        Default is ``2``.
+
+    Returns
+    -------
+    FormDiagram
+        A form diagram with all vertices of the outer ring anchored.
+
+    """
+    s = segments or 4 * n
+    vertices = []
+    rings = []
+    if not opening:
+        vertices.append([0.0, 0.0, 0.0])
+    for k in range(max(1, opening), n + 1):
+        r = radius * k / n
+        rings.append(list(range(len(vertices), len(vertices) + s)))
+        vertices += [[r * cos(2 * pi * j / s), r * sin(2 * pi * j / s), 0.0] for j in range(s)]
+    faces = []
+    if not opening:
+        ring = rings[0]
+        faces += [[0, ring[j - 1], ring[j]] for j in range(s)]
+    for inner, outer in zip(rings[:-1], rings[1:]):
+        faces += [[inner[j - 1], outer[j - 1], outer[j], inner[j]] for j in range(s)]
+    return _form(vertices, faces, rings[-1], feet)
+
+
+def cross_vault(n, size=10.0, opening=0, feet=2):
+    """Construct the form diagram of a cross vault on a square base.
+
+    The pattern consists of concentric squares, connected by lines perpendicular
+    to the sides of the base, such that the diagonals form the groins of the vault.
+
+    Parameters
+    ----------
+    n : int
+        The number of concentric squares.
+    size : float, optional
+        The size of the base.
+        Default is ``10.0``.
+    opening : int, optional
+        The number of inner squares that are left open.
+        Default is ``0``.
+    feet : int, optional
+        The number of feet per anchor, see :meth:`FormDiagram.update_exterior`.
+        Default is ``2``.
+
+    Returns
+    -------
+    FormDiagram
+        A form diagram with the corners of the base anchored.
+
+    """
+    h = 0.5 * size / n
+    vertices = []
+    rings = []
+    if not opening:
+        vertices.append([0.0, 0.0, 0.0])
+        rings.append([0])
+    for k in range(max(1, opening), n + 1):
+        # 2k segments per side, starting at the corner (-k, -k)
+        points = []
+        for i in range(2 * k):
+            points.append([(-k + i) * h, -k * h, 0.0])
+        for i in range(2 * k):
+            points.append([k * h, (-k + i) * h, 0.0])
+        for i in range(2 * k):
+            points.append([(k - i) * h, k * h, 0.0])
+        for i in range(2 * k):
+            points.append([-k * h, (k - i) * h, 0.0])
+        rings.append(list(range(len(vertices), len(vertices) + len(points))))
+        vertices += points
+    faces = []
+    for inner, outer in zip(rings[:-1], rings[1:]):
+        k = len(outer) // 8
+        for side in range(4):
+            if len(inner) == 1:
+                I = inner * 1
+            else:
+                I = [inner[(side * (2 * k - 2) + i) % len(inner)] for i in range(2 * k - 1)]
+            O = [outer[(side * 2 * k + i) % len(outer)] for i in range(2 * k + 1)]
+            faces.append([I[0], O[0], O[1]])
+            faces.append([I[-1], O[-2], O[-1]])
+            for i in range(len(I) - 1):
+                faces.append([I[i], O[i + 1], O[i + 2], I[i + 1]])
+    corners = [rings[-1][i * 2 * n] for i in range(4)]
+    return _form(vertices, faces, corners, feet)
+
+
+def fan_vault(n, bays=(2, 2), size=5.0, feet=2):
+    """Construct the form diagram of a fan vault on a rectangular grid of columns.
+
+    Every bay is divided into four quadrants, each of which is covered by
+    a fan of lines radiating from the column in its corner.
+
+    Parameters
+    ----------
+    n : int
+        The number of rings and the number of segments of every fan.
+    bays : tuple, optional
+        The number of bays in each direction.
+        Default is ``(2, 2)``.
+    size : float, optional
+        The size of a bay.
+        Default is ``5.0``.
+    feet : int, optional
+        The number of feet per anchor, see :meth:`FormDiagram.update_exterior`.
+        Default is ``2``.
+
+    Returns
+    -------
+    FormDiagram
+        A form diagram with all columns anchored.
+
+    """
+    h = 0.5 * size
+    vertices = _Vertices()
+    faces = []
+    columns = set()
+    for bx in range(bays[0]):
+        for by in range(bays[1]):
+            for cx, sx in ((bx * size, +1), ((bx + 1) * size, -1)):
+                for cy, sy in ((by * size, +1), ((by + 1) * size, -1)):
+                    c = vertices(cx, cy)
+                    columns.add(c)
+                    fan = []
+                    for j in range(n + 1):
+                        t = 0.5 * pi * j / n
+                        u, v = cos(t), sin(t)
+                        l = h / max(u, v)
+                        fan.append([vertices(cx + sx * u * l * k / n, cy + sy * v * l * k / n) for k in range(1, n + 1)])
+                    for j in range(n):
+                        faces.append([c, fan[j][0], fan[j + 1][0]])
+                        for k in range(n - 1):
+                            faces.append([fan[j][k], fan[j][k + 1], fan[j + 1][k + 1], fan[j + 1][k]])
+    return _form(vertices.xyz, faces, sorted(columns), feet)
+
+
+def resolution(generator, edges):
+    """Compute the resolution parameter of a generator for an approximate number of edges.
+
+    Parameters
+    ----------
+    generator : callable
+        One of the generators of this module.
+    edges : int
+        The approximate number of edges.
+
+    Returns
+    -------
+    int
+        The resolution parameter ``n`` of the generator.
+
+    """
+    factor = {
+        orthogonal_grid: 2.0,
+        radial_dome    : 8.0,
+        cross_vault    : 8.0,
+        fan_vault      : 32.0,
+    }[generator]
+    return max(1, int(round(sqrt(edges / factor))))
+
+
+# ==============================================================================
+# Main
+# ==============================================================================
+
+if __name__ == '__main__':
+    pass
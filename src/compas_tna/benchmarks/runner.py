@@ -0,0 +1,265 @@
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import division
+
+import os
+import json
+import platform
+import datetime
+
+from timeit import default_timer
+
+import compas
+import compas_tna
+
+from compas_tna.benchmarks.scenarios import DIAGRAMS
+from compas_tna.benchmarks.scenarios import SCENARIOS
+from compas_tna.benchmarks.scenarios import make_diagram
+
+
+__author__  = 'Tom Van Mele'
+__email__   = 'vanmelet@ethz.ch'
+
+
+__all__ = [
+    'BASELINE',
+    'SIZES',
+    'environment',
+    'run_benchmarks',
+    'save_results',
+    'load_results',
+    'compare_results',
+]
+
+
+BASELINE = compas_tna.get('benchmarks/baseline.json')
+
+SIZES = [100, 1000, 10000]
+
+
+def _version(name):
+    try:
+        module = __import__(name)
+    except ImportError:
+        return None
+    return getattr(module, '__version__', None)
+
+
+def environment():
+    """Describe the environment in which the benchmarks are run.
+
+    Returns
+    -------
+    dict
+        The versions of Python and of the relevant packages, and a description of the platform.
+
+    """
+    return {
+        'python'        : platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform'      : platform.platform(),
+        'machine'       : platform.machine(),
+        'processor'     : platform.processor(),
+        'compas'        : compas.__version__,
+        'compas_tna'    : compas_tna.__version__,
+        'numpy'         : _version('numpy'),
+        'scipy'         : _version('scipy'),
+        'date'          : datetime.datetime.now().isoformat(),
+    }
+
+
+def _key(diagram, size, scenario):
+    return '{}/{}/{}'.format(diagram, size, scenario)
+
+
+def _median(values):
+    values = sorted(values)
+    n = len(values)
+    if n % 2:
+        return values[n // 2]
+    return 0.5 * (values[n // 2 - 1] + values[n // 2])
+
+
+def run_benchmarks(diagrams=None, scenarios=None, sizes=None, repeat=5, display=True):
+    """Time the benchmark scenarios on the benchmark diagrams.
+
+    Parameters
+    ----------
+    diagrams : list, optional
+        The names of the diagrams.
+        Default is all of ``DIAGRAMS``.
+    scenarios : list, optional
+        The names of the scenarios.
+        Default is all of ``SCENARIOS``.
+    sizes : list, optional
+        The approximate numbers of edges of the diagrams.
+        Default is ``SIZES``.
+    repeat : int, optional
+        The number of timed runs per scenario.
+        Default is ``5``.
+    display : bool, optional
+        Display the timings while the benchmarks are running.
+        Default is ``True``.
+
+    Returns
+    -------
+    dict
+        The results, with the environment under ``'environment'``, and per benchmark
+        the number of vertices and edges of the diagram, and the best and median
+        timings (in seconds) under ``'benchmarks'``.
+        The benchmarks are identified by ``'diagram/size/scenario'``.
+
+    Notes
+    -----
+    The diagram and any data required by a scenario are constructed once, before the timed runs.
+    Every run starts from a fresh copy of that data, of which the construction is not timed.
+
+    """
+    diagrams  = diagrams or sorted(DIAGRAMS)
+    scenarios = scenarios or sorted(SCENARIOS)
+    sizes     = sizes or SIZES
+    results   = {'environment': environment(), 'repeat': repeat, 'benchmarks': {}}
+    for name in diagrams:
+        for size in sizes:
+            form = make_diagram(name, size)
+            vcount = form.number_of_vertices()
+            ecount = len(list(form.edges_where({'is_edge': True})))
+            for scenario in scenarios:
+                setup, run = SCENARIOS[scenario](form)
+                times = []
+                for i in range(repeat):
+                    args = setup()
+                    t0 = default_timer()
+                    run(*args)
+                    times.append(default_timer() - t0)
+                key = _key(name, size, scenario)
+                results['benchmarks'][key] = {
+                    'diagram' : name,
+                    'size'    : size,
+                    'scenario': scenario,
+                    'vertices': vcount,
+                    'edges'   : ecount,
+                    'best'    : min(times),
+                    'median'  : _median(times),
+                    'times'   : times,
+                }
+                if display:
+                    print('{0:<44} {1:>8} edges {2:>10.4f} s (best) {3:>10.4f} s (median)'.format(key, ecount, min(times), _median(times)))
+    return results
+
+
+def save_results(results, path=None):
+    """Save benchmark results to a JSON file.
+
+    Parameters
+    ----------
+    results : dict
+        The results, as returned by :func:`run_benchmarks`.
+    path : str, optional
+        The path of the file.
+        Default is ``BASELINE``.
+
+    """
+    path = path or BASELINE
+    folder = os.path.dirname(path)
+    if folder and not os.path.isdir(folder):
+        os.makedirs(folder)
+    with open(path, 'w') as fp:
+        json.dump(results, fp, indent=4, sort_keys=True)
+
+
+def load_results(path=None):
+    """Load benchmark results from a JSON file.
+
+    Parameters
+    ----------
+    path : str, optional
+        The path of the file.
+        Default is ``BASELINE``.
+
+    Returns
+    -------
+    dict
+        The results.
+
+    """
+    with open(path or BASELINE, 'r') as fp:
+        return json.load(fp)
+
+
+def _spread(values):
+    # the median absolute deviation, scaled to estimate the standard deviation of normally distributed timings
+    median = _median(values)
+    return 1.4826 * _median([abs(value - median) for value in values])
+
+
+def compare_results(results, baseline, tolerance=0.1, spread=3.0, floor=0.001):
+    """Compare benchmark results with a baseline.
+
+    Parameters
+    ----------
+    results : dict
+        The results, as returned by :func:`run_benchmarks`.
+    baseline : dict
+        The baseline results.
+    tolerance : float, optional
+        The allowed relative increase of the timings, on top of the noise of the baseline.
+        Default is ``0.1``.
+    spread : float, optional
+        The allowed increase of the timings, in multiples of the spread of the baseline runs.
+        Default is ``3.0``.
+    floor : float, optional
+        The absolute increase of the timings (in seconds) below which
+        differences are considered noise.
+        Default is ``0.001``.
+
+    Returns
+    -------
+    list
+        Per benchmark present in both the results and the baseline, a dict with
+        the key of the benchmark, the baseline (median) and current (best) timing,
+        their ratio, the limit above which the current timing is a regression,
+        and whether it is.
+
+    Raises
+    ------
+    ValueError
+        If the results or the baseline have less than three runs per benchmark,
+        which is not enough to estimate the noise of the timings.
+
+    Notes
+    -----
+    The best of the current runs is compared with the median of the baseline runs,
+    plus a margin that accounts for the noise of the baseline:
+    ``median + max(spread * s, floor) + tolerance * median``,
+    with ``s`` the median absolute deviation of the baseline runs, scaled to estimate their standard deviation.
+
+    """
+    for name, data in (('results', results), ('baseline', baseline)):
+        if data.get('repeat', 0) < 3:
+            raise ValueError('The {} have less than three runs per benchmark: {}'.format(name, data.get('repeat')))
+    rows = []
+    for key in sorted(results['benchmarks']):
+        if key not in baseline['benchmarks']:
+            continue
+        times = baseline['benchmarks'][key]['times']
+        t0    = _median(times)
+        t1    = results['benchmarks'][key]['best']
+        limit = t0 + max(spread * _spread(times), floor) + tolerance * t0
+        rows.append({
+            'key'       : key,
+            'baseline'  : t0,
+            'current'   : t1,
+            'ratio'     : t1 / t0 if t0 else float('inf'),
+            'limit'     : limit,
+            'regression': t1 > limit,
+        })
+    return rows
+
+
+# ==============================================================================
+# Main
+# ==============================================================================
+
+if __name__ == '__main__':
+    pass
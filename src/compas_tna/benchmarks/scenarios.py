@@ -0,0 +1,191 @@
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import division
+
+import sys
+
+try:
+    from numpy import array
+
+except ImportError:
+    if 'ironpython' not in sys.version.lower():
+        raise
+
+from compas_tna.diagrams import FormDiagram
+from compas_tna.diagrams import ForceDiagram
+
+from compas_tna.equilibrium import horizontal
+from compas_tna.equilibrium import horizontal_nodal
+from compas_tna.equilibrium import vertical_from_zmax
+from compas_tna.equilibrium import vertical_from_q
+
+from compas_tna.utilities import LoadUpdater
+
+from compas_tna.benchmarks.generators import orthogonal_grid
+from compas_tna.benchmarks.generators import radial_dome
+from compas_tna.benchmarks.generators import cross_vault
+from compas_tna.benchmarks.generators import fan_vault
+from compas_tna.benchmarks.generators import resolution
+
+
+__author__  = 'Tom Van Mele'
+__email__   = 'vanmelet@ethz.ch'
+
+
+__all__ = [
+    'DIAGRAMS',
+    'SCENARIOS',
+    'make_diagram',
+]
+
+
+# name => (generator, function computing the options from the resolution)
+DIAGRAMS = {
+    'grid'              : (orthogonal_grid, lambda n: {}),
+    'grid_opening'      : (orthogonal_grid, lambda n: {'opening': max(1, n // 3)}),
+    'dome'              : (radial_dome, lambda n: {}),
+    'dome_oculus'       : (radial_dome, lambda n: {'opening': max(1, n // 4)}),
+    'crossvault'        : (cross_vault, lambda n: {}),
+    'crossvault_opening': (cross_vault, lambda n: {'opening': max(1, n // 4)}),
+    'fanvault'          : (fan_vault, lambda n: {}),
+}
+
+
+def make_diagram(name, edges):
+    """Construct one of the benchmark diagrams, with approximately the specified number of edges.
+
+    Parameters
+    ----------
+    name : str
+        The name of the diagram, one of ``DIAGRAMS``.
+    edges : int
+        The approximate number of edges.
+
+    Returns
+    -------
+    FormDiagram
+
+    """
+    generator, options = DIAGRAMS[name]
+    n = resolution(generator, edges)
+    return generator(n, **options(n))
+
+
+# ==============================================================================
+# Scenarios
+# ==============================================================================
+
+# every scenario takes a form diagram and returns a tuple (setup, run)
+# ``setup`` is called before every timed run, and its result is passed to ``run``
+# such that every run starts from the same state
+
+
+def _copy(form):
+    data = form.to_bytes(compress=False)
+    return lambda: FormDiagram.from_bytes(data)
+
+
+def _horizontal(form, kmax=10):
+    force = ForceDiagram.from_formdiagram(form)
+    data  = form.to_bytes(compress=False), force.to_bytes(compress=False)
+
+    def setup():
+        return FormDiagram.from_bytes(data[0]), ForceDiagram.from_bytes(data[1])
+
+    def run(form, force):
+        horizontal(form, force, kmax=kmax, display=False)
+
+    return setup, run
+
+
+def _horizontal_nodal(form, kmax=10):
+    force = ForceDiagram.from_formdiagram(form)
+    data  = form.to_bytes(compress=False), force.to_bytes(compress=False)
+
+    def setup():
+        return FormDiagram.from_bytes(data[0]), ForceDiagram.from_bytes(data[1])
+
+    def run(form, force):
+        horizontal_nodal(form, force, kmax=kmax, display=False)
+
+    return setup, run
+
+
+def _vertical_from_zmax(form, zmax=3.0):
+    copy = _copy(form)
+
+    def setup():
+        return copy(),
+
+    def run(form):
+        vertical_from_zmax(form, zmax, display=False)
+
+    return setup, run
+
+
+def _vertical_from_q(form, scale=1.0):
+    copy = _copy(form)
+
+    def setup():
+        return copy(),
+
+    def run(form):
+        vertical_from_q(form, scale=scale, display=False)
+
+    return setup, run
+
+
+def _loads(form):
+    xyz = array(form.get_vertices_attributes('xyz'), dtype=float)
+    p   = array(form.get_vertices_attributes(('px', 'py', 'pz')), dtype=float)
+
+    def setup():
+        return p.copy(),
+
+    def run(p):
+        update_loads = LoadUpdater(form, p.copy())
+        update_loads(p, xyz)
+
+    return setup, run
+
+
+def _force_from_form(form):
+
+    def setup():
+        return ()
+
+    def run():
+        ForceDiagram.from_formdiagram(form)
+
+    return setup, run
+
+
+def _data(form):
+
+    def setup():
+        return ()
+
+    def run():
+        FormDiagram.from_data(form.to_data())
+
+    return setup, run
+
+
+# name => scenario
+SCENARIOS = {
+    'horizontal'        : _horizontal,
+    'horizontal_nodal'  : _horizontal_nodal,
+    'vertical_from_zmax': _vertical_from_zmax,
+    'vertical_from_q'   : _vertical_from_q,
+    'loads'             : _loads,
+    'force_from_form'   : _force_from_form,
+    'data'              : _data,
+}
+
+
+# ==============================================================================
+# Main
+# ==============================================================================
+
+if __name__ == '__main__':
+    pass
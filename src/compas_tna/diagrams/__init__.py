@@ -11,16 +11,19 @@ compas_tna.diagrams
 
     FormDiagram
     ForceDiagram
+    TNAArrays
 
 """
 from __future__ import absolute_import
 
 from .diagram import *
+from .arrays import *
 
 from .formdiagram import *
 from .forcediagram import *
 
+from . import arrays
 from . import formdiagram
 from . import forcediagram
 
-__all__ = formdiagram.__all__ + forcediagram.__all__
+__all__ = formdiagram.__all__ + forcediagram.__all__ + arrays.__all__
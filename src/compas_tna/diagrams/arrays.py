@@ -0,0 +1,216 @@
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import division
+
+import sys
+
+try:
+    from numpy import array
+    from numpy import float64
+
+except ImportError:
+    if 'ironpython' not in sys.version.lower():
+        raise
+
+from compas.numerical import connectivity_matrix
+
+from compas_tna.utilities.linalg import LaplacianAssembler
+
+
+__author__  = 'Tom Van Mele'
+__email__   = 'vanmelet@ethz.ch'
+
+
+__all__ = ['TNAArrays']
+
+
+class TNAArrays(object):
+    """Array-based snapshot of the data of a form diagram, and optionally
+    of the corresponding force diagram, as used by the equilibrium solvers.
+
+    Parameters
+    ----------
+    form : compas_tna.diagrams.FormDiagram
+        The form diagram.
+    force : compas_tna.diagrams.ForceDiagram, optional
+        The force diagram.
+
+    Attributes
+    ----------
+    vcount : int
+        The number of vertices.
+    ecount : int
+        The number of edges with ``is_edge`` set to ``True``.
+    vertex_keys : list
+        The vertex keys, in the order of the vertex indices.
+    edge_keys : list
+        The keys of the edges with ``is_edge`` set to ``True``, in the order of the edge indices.
+    key_index : dict
+        Vertex key to vertex index.
+    uv_index : dict
+        Edge key to edge index, for the edges with ``is_edge`` set to ``True``.
+    edges : list
+        The edges as pairs of vertex indices.
+    C : sparse matrix
+        The (m x n) connectivity matrix.
+    fixed : list
+        The indices of the anchored and fixed vertices.
+    free : list
+        The indices of the other vertices.
+    assembler : compas_tna.utilities.LaplacianAssembler
+        The assembler of the force density weighted Laplacians of the form diagram.
+    xyz : array
+        The (n x 3) vertex coordinates.
+    p : array
+        The (n x 3) point loads.
+    t : array
+        The (n x 1) thickness.
+    q : array
+        The (m x 1) force densities.
+    lmin, lmax, fmin, fmax : array
+        The (m x 1) bounds on the lengths of the edges of the form and force diagram.
+    _vertex_keys : list
+        The vertex keys of the force diagram, in the order of the vertex indices.
+    _key_index : dict
+        Vertex key to vertex index, in the force diagram.
+    _edges : list
+        The edges of the force diagram as pairs of vertex indices,
+        ordered as the corresponding edges of the form diagram.
+    _C : sparse matrix
+        The (m x _n) connectivity matrix of the force diagram.
+    _fixed : list
+        The indices of the fixed vertices of the force diagram.
+    _xy : array
+        The (_n x 2) vertex coordinates of the force diagram.
+
+    Notes
+    -----
+    The data is extracted in one pass over the vertices and one pass over the edges.
+    The topological data (index maps, edges, connectivity matrix) is stored
+    on the diagram and reused by subsequent snapshots for as long as the vertices
+    and the selection of edges remain the same.
+    The same holds for the assembler of the Laplacians, which moreover
+    depends on the selection of fixed vertices.
+    The attributes of the force diagram are only available if it was provided.
+
+    Examples
+    --------
+    .. code-block:: python
+
+        arrays = form.to_arrays(force)
+
+        horizontal(form, force, arrays=arrays)
+
+    """
+
+    def __init__(self, form, force=None):
+        self._vertex_keys = None
+        self._key_index   = None
+        self._edges       = None
+        self._C           = None
+        self._fixed       = None
+        self._xy          = None
+        self._extract_form(form)
+        if force is not None:
+            self._extract_force(force, form)
+
+    def _extract_form(self, form):
+        dva = form.default_vertex_attributes
+        dea = form.default_edge_attributes
+        # ----------------------------------------------------------------------
+        # vertices
+        # ----------------------------------------------------------------------
+        vertices = []
+        xyz      = []
+        p        = []
+        t        = []
+        fixed    = []
+        for index, (key, attr) in enumerate(form.vertices(True)):
+            vertices.append(key)
+            xyz.append([attr.get(name, dva.get(name, 0.0)) for name in 'xyz'])
+            p.append([attr.get(name, dva.get(name, 0.0)) for name in ('px', 'py', 'pz')])
+            t.append(attr.get('t', dva.get('t', 1.0)))
+            if attr.get('is_anchor', dva.get('is_anchor')) or attr.get('is_fixed', dva.get('is_fixed')):
+                fixed.append(index)
+        # ----------------------------------------------------------------------
+        # edges
+        # ----------------------------------------------------------------------
+        uvs    = []
+        q      = []
+        bounds = []
+        names  = (('lmin', 1e-7), ('lmax', 1e+7), ('fmin', 1e-7), ('fmax', 1e+7))
+        for u, v, attr in form.edges(True):
+            if not attr.get('is_edge', False):
+                continue
+            uvs.append((u, v))
+            q.append(attr.get('q', 1.0))
+            bounds.append([attr.get(name, dea.get(name, value)) for name, value in names])
+        # ----------------------------------------------------------------------
+        # topology
+        # ----------------------------------------------------------------------
+        topology = getattr(form, '_tna_topology', None)
+        if topology is None or topology['vertices'] != vertices or topology['uvs'] != uvs:
+            key_index = {key: index for index, key in enumerate(vertices)}
+            edges     = [[key_index[u], key_index[v]] for u, v in uvs]
+            topology  = {
+                'vertices'  : vertices,
+                'uvs'       : uvs,
+                'key_index' : key_index,
+                'uv_index'  : {uv: index for index, uv in enumerate(uvs)},
+                'edges'     : edges,
+                'C'         : connectivity_matrix(edges, 'csr'),
+            }
+            form._tna_topology = topology
+        fixedset = set(fixed)
+        free     = [index for index in range(len(vertices)) if index not in fixedset]
+        bounds   = array(bounds, dtype=float64).reshape((-1, 4))
+        assembler = topology.get('assembler')
+        if assembler is None or assembler.fixed != fixed:
+            assembler = topology['assembler'] = LaplacianAssembler(topology['C'], free, fixed)
+        # ----------------------------------------------------------------------
+        # snapshot
+        # ----------------------------------------------------------------------
+        self.vcount       = len(vertices)
+        self.ecount       = len(uvs)
+        self.vertex_keys  = topology['vertices']
+        self.edge_keys    = topology['uvs']
+        self.key_index    = topology['key_index']
+        self.uv_index     = topology['uv_index']
+        self.edges        = topology['edges']
+        self.C            = topology['C']
+        self.fixed        = fixed
+        self.free         = free
+        self.assembler    = assembler
+        self.xyz          = array(xyz, dtype=float64).reshape((-1, 3))
+        self.p            = array(p, dtype=float64).reshape((-1, 3))
+        self.t            = array(t, dtype=float64).reshape((-1, 1))
+        self.q            = array(q, dtype=float64).reshape((-1, 1))
+        self.lmin         = bounds[:, 0:1]
+        self.lmax         = bounds[:, 1:2]
+        self.fmin         = bounds[:, 2:3]
+        self.fmax         = bounds[:, 3:4]
+
+    def _extract_force(self, force, form):
+        _vertex_keys = list(force.vertices())
+        _key_index   = {key: index for index, key in enumerate(_vertex_keys)}
+        _fixed       = [_key_index[key] for key in force.fixed()]
+        _edges       = force.ordered_edges(form)
+        self._vertex_keys = _vertex_keys
+        self._key_index   = _key_index
+        self._edges       = _edges
+        self._C           = connectivity_matrix(_edges, 'csr')
+        self._fixed       = _fixed or [0]
+        self._xy          = array(force.get_vertices_attributes('xy'), dtype=float64).reshape((-1, 2))
+
+    @property
+    def has_force(self):
+        """bool : True if the snapshot contains the data of a force diagram."""
+        return self._key_index is not None
+
+
+# ==============================================================================
+# Main
+# ==============================================================================
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,317 @@
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import division
+
+import sys
+import json
+import zlib
+import base64
+import struct
+
+from array import array
+from ast import literal_eval
+
+from compas.utilities import DataEncoder
+
+
+__author__  = 'Tom Van Mele'
+__email__   = 'vanmelet@ethz.ch'
+
+
+__all__ = [
+    'pack_diagram',
+    'unpack_diagram',
+]
+
+
+MAGIC = b'TNAD'
+
+VERSION = 1
+
+HEADER = struct.Struct('<4sBBI')
+
+INT_MIN = -2 ** 31
+
+INT_MAX = 2 ** 31 - 1
+
+MISSING = object()
+
+
+def _tobytes(values):
+    if hasattr(values, 'tobytes'):
+        return values.tobytes()
+    return values.tostring()
+
+
+def _frombytes(typecode, data, byteorder):
+    values = array(typecode)
+    if hasattr(values, 'frombytes'):
+        values.frombytes(data)
+    else:
+        values.fromstring(data)
+    if byteorder != sys.byteorder:
+        values.byteswap()
+    return values
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _typecode(values):
+    if all(isinstance(value, bool) for value in values):
+        return 'b'
+    if all(_is_int(value) and INT_MIN <= value <= INT_MAX for value in values):
+        return 'i'
+    if all(isinstance(value, float) or (_is_int(value) and INT_MIN <= value <= INT_MAX) for value in values):
+        return 'd'
+    return None
+
+
+def _keys(keys):
+    if all(_is_int(key) and INT_MIN <= key <= INT_MAX for key in keys):
+        return None
+    return [repr(key) for key in keys]
+
+
+class _Writer(object):
+
+    def __init__(self):
+        self.blocks = []
+        self.offset = 0
+
+    def write(self, typecode, values):
+        data = _tobytes(array(typecode, values))
+        self.blocks.append(data)
+        offset = self.offset
+        self.offset += len(data)
+        return [typecode, offset, len(data)]
+
+    def write_doubles(self, values):
+        # the indices of the integers in a column of doubles
+        # are stored with the column, to restore their type
+        spec = self.write('d', values)
+        ints = [index for index, value in enumerate(values) if _is_int(value)]
+        if ints:
+            spec.append(ints)
+        return spec
+
+    def columns(self, attrs, defaults):
+        columns = {}
+        names = set(defaults)
+        for attr in attrs:
+            names.update(attr)
+        for name in sorted(names):
+            default = defaults.get(name)
+            values  = [attr.get(name, default) for attr in attrs]
+            if name in defaults and all(value == default for value in values):
+                continue
+            typecode = _typecode(values)
+            if typecode is None:
+                missing = [index for index, attr in enumerate(attrs) if name not in attr]
+                columns[name] = ['json', values, missing]
+            elif typecode == 'd':
+                columns[name] = self.write_doubles(values)
+            else:
+                columns[name] = self.write(typecode, [int(value) if typecode == 'b' else value for value in values])
+        return columns
+
+
+def pack_diagram(diagram, compress=True):
+    """Pack the data of a diagram in a compact binary format.
+
+    Parameters
+    ----------
+    diagram : compas_tna.diagrams.Diagram
+        The diagram.
+    compress : bool, optional
+        Compress the packed data.
+        Default is ``True``.
+
+    Returns
+    -------
+    bytes
+        The packed data.
+        The data starts with a fixed-size header identifying the format, followed by
+        a JSON header describing the topology and the columns, and the binary blocks.
+
+    Notes
+    -----
+    The topology is stored as integer arrays, and the attributes of the vertices,
+    edges and faces as typed columns (doubles, integers, booleans).
+    Columns of doubles that also contain integers store the indices of the integers,
+    such that the type of every value is preserved.
+    Edges of which the attributes are shared by both directions are stored once.
+    Columns in which all values are equal to the default value of the attribute
+    are omitted. Columns with values of other types are stored as JSON,
+    together with the indices of the elements that do not have the attribute.
+
+    """
+    vertices  = list(diagram.vertices())
+    key_index = {key: index for index, key in enumerate(vertices)}
+    faces     = list(diagram.faces())
+    edgedata  = diagram.edgedata
+    edges     = []
+    twins     = []
+    seen      = set()
+    for (u, v), attr in edgedata.items():
+        if id(attr) in seen:
+            continue
+        seen.add(id(attr))
+        edges.append((u, v))
+        twins.append(edgedata.get((v, u)) is attr)
+    writer    = _Writer()
+    topology  = {
+        'vcount'     : len(vertices),
+        'fcount'     : len(faces),
+        'ecount'     : len(edges),
+        'vertices'   : _keys(vertices),
+        'faces'      : _keys(faces),
+        'vertex_keys': None,
+        'face_keys'  : None,
+        'face_sizes' : None,
+        'face_index' : None,
+        'edge_index' : None,
+        'edge_twins' : None,
+    }
+    if topology['vertices'] is None:
+        topology['vertex_keys'] = writer.write('i', vertices)
+    if topology['faces'] is None:
+        topology['face_keys'] = writer.write('i', faces)
+    topology['face_sizes'] = writer.write('i', [len(diagram.face[fkey]) for fkey in faces])
+    topology['face_index'] = writer.write('i', [key_index[key] for fkey in faces for key in diagram.face[fkey]])
+    topology['edge_index'] = writer.write('i', [key_index[key] for uv in edges for key in uv])
+    topology['edge_twins'] = writer.write('b', [int(twin) for twin in twins])
+    header = {
+        'byteorder'   : sys.byteorder,
+        'attributes'  : diagram.attributes,
+        'dva'         : diagram.default_vertex_attributes,
+        'dea'         : diagram.default_edge_attributes,
+        'dfa'         : diagram.default_face_attributes,
+        'max_int_key' : diagram._max_int_key,
+        'max_int_fkey': diagram._max_int_fkey,
+        'topology'    : topology,
+        'vertex'      : writer.columns([diagram.vertex[key] for key in vertices], diagram.default_vertex_attributes),
+        'face'        : writer.columns([diagram.facedata.get(fkey) or {} for fkey in faces], diagram.default_face_attributes),
+        'edge'        : writer.columns([edgedata[uv] for uv in edges], diagram.default_edge_attributes),
+    }
+    header = json.dumps(header, cls=DataEncoder, sort_keys=True).encode('utf-8')
+    body   = b''.join([header] + writer.blocks)
+    if compress:
+        body = zlib.compress(body)
+    return HEADER.pack(MAGIC, VERSION, int(compress), len(header)) + body
+
+
+def _unpack_header(data):
+    if data[:len(MAGIC)] != MAGIC:
+        data = base64.b64decode(data)
+    magic, version, compressed, size = HEADER.unpack(data[:HEADER.size])
+    if magic != MAGIC:
+        raise ValueError('The data is not a packed diagram.')
+    if version > VERSION:
+        raise ValueError('Unsupported version of the packed diagram format: {}'.format(version))
+    body = data[HEADER.size:]
+    if compressed:
+        body = zlib.decompress(body)
+    header = json.loads(body[:size].decode('utf-8'))
+    return header, body[size:]
+
+
+class _Reader(object):
+
+    def __init__(self, blob, byteorder):
+        self.blob      = blob
+        self.byteorder = byteorder
+
+    def read(self, spec):
+        typecode, offset, length = spec[:3]
+        values = _frombytes(typecode, self.blob[offset:offset + length], self.byteorder)
+        if typecode == 'b':
+            return [bool(value) for value in values]
+        values = values.tolist()
+        if len(spec) > 3:
+            for index in spec[3]:
+                values[index] = int(values[index])
+        return values
+
+    def column(self, spec):
+        if spec[0] == 'json':
+            values = spec[1]
+            for index in spec[2]:
+                values[index] = MISSING
+            return values
+        return self.read(spec)
+
+    def columns(self, columns):
+        return [(name, self.column(spec)) for name, spec in columns.items()]
+
+
+def _attr(columns, index):
+    return dict((name, values[index]) for name, values in columns if values[index] is not MISSING)
+
+
+def unpack_diagram(diagram, data):
+    """Replace the data of a diagram by data packed with :func:`pack_diagram`.
+
+    Parameters
+    ----------
+    diagram : compas_tna.diagrams.Diagram
+        The diagram.
+    data : bytes or str
+        The packed data, or its base64 encoding.
+
+    """
+    header, blob = _unpack_header(data)
+    reader   = _Reader(blob, header['byteorder'])
+    topology = header['topology']
+    if topology['vertices'] is None:
+        vertices = reader.read(topology['vertex_keys'])
+    else:
+        vertices = [literal_eval(key) for key in topology['vertices']]
+    if topology['faces'] is None:
+        faces = reader.read(topology['face_keys'])
+    else:
+        faces = [literal_eval(fkey) for fkey in topology['faces']]
+    sizes      = reader.read(topology['face_sizes'])
+    face_index = reader.read(topology['face_index'])
+    edge_index = reader.read(topology['edge_index'])
+    edge_twins = reader.read(topology['edge_twins'])
+
+    diagram.attributes.update(header['attributes'] or {})
+    diagram.default_vertex_attributes.update(header['dva'] or {})
+    diagram.default_face_attributes.update(header['dfa'] or {})
+    diagram.default_edge_attributes.update(header['dea'] or {})
+    diagram.clear()
+
+    columns = reader.columns(header['vertex'])
+    for index, key in enumerate(vertices):
+        diagram.add_vertex(key, attr_dict=_attr(columns, index))
+
+    columns = reader.columns(header['face'])
+    start = 0
+    for index, (fkey, size) in enumerate(zip(faces, sizes)):
+        keys  = [vertices[i] for i in face_index[start:start + size]]
+        start += size
+        diagram.add_face(keys, fkey=fkey, attr_dict=_attr(columns, index))
+
+    columns = reader.columns(header['edge'])
+    dea = diagram.default_edge_attributes
+    for index, twin in enumerate(edge_twins):
+        attr = dea.copy()
+        attr.update(_attr(columns, index))
+        u = vertices[edge_index[2 * index]]
+        v = vertices[edge_index[2 * index + 1]]
+        diagram.edgedata[u, v] = attr
+        if twin:
+            diagram.edgedata[v, u] = attr
+
+    diagram._max_int_key  = header['max_int_key']
+    diagram._max_int_fkey = header['max_int_fkey']
+
+
+# ==============================================================================
+# Main
+# ==============================================================================
+
+if __name__ == '__main__':
+    pass
@@ -2,9 +2,14 @@ from __future__ import print_function
 from __future__ import absolute_import
 from __future__ import division
 
+import base64
+
 from compas.datastructures import Mesh
 from compas.utilities import geometric_key
 
+from compas_tna.diagrams.binary import pack_diagram
+from compas_tna.diagrams.binary import unpack_diagram
+
 
 __author__  = 'Tom Van Mele'
 __email__   = 'vanmelet@ethz.ch'
@@ -13,8 +18,312 @@ __email__   = 'vanmelet@ethz.ch'
 __all__ = ['Diagram']
 
 
+def _values(values):
+    if hasattr(values, 'tolist'):
+        return values.reshape(-1).tolist()
+    return values
+
+
+def _columns(attrs, defaults):
+    names = set(defaults)
+    for attr in attrs:
+        names.update(attr)
+    return {name: [attr.get(name, defaults.get(name)) for attr in attrs] for name in names}
+
+
+def _key(key):
+    # keys that are lists after a round trip through JSON were tuples
+    if isinstance(key, list):
+        return tuple(_key(item) for item in key)
+    return key
+
+
 class Diagram(Mesh):
 
+    # --------------------------------------------------------------------------
+    # binary data
+    # --------------------------------------------------------------------------
+
+    @classmethod
+    def from_data(cls, data):
+        """Construct a diagram from its data.
+
+        Parameters
+        ----------
+        data : dict or bytes or str
+            The data, as returned by ``to_data``, or by :meth:`to_bytes`.
+
+        Returns
+        -------
+        Diagram
+            A diagram of the type of ``cls``.
+
+        """
+        if isinstance(data, dict):
+            return super(Diagram, cls).from_data(data)
+        return cls.from_bytes(data)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Construct a diagram from data in the compact binary format.
+
+        Parameters
+        ----------
+        data : bytes or str
+            The data, as returned by :meth:`to_bytes`.
+
+        Returns
+        -------
+        Diagram
+            A diagram of the type of ``cls``.
+
+        """
+        diagram = cls()
+        diagram.set_bytes(data)
+        return diagram
+
+    def to_bytes(self, compress=True, text=False):
+        """Convert the data of the diagram to a compact binary format.
+
+        Parameters
+        ----------
+        compress : bool, optional
+            Compress the data.
+            Default is ``True``.
+        text : bool, optional
+            Return the base64 encoding of the data, for transport in text-based formats such as JSON.
+            Default is ``False``.
+
+        Returns
+        -------
+        bytes or str
+            The data.
+
+        Notes
+        -----
+        The topology is stored as integer arrays and the attributes as typed columns.
+        Columns in which all values are equal to the default value of the attribute are omitted.
+        In contrast to ``to_data``, the result is therefore independent of the number
+        of attributes that have default values.
+
+        Examples
+        --------
+        .. code-block:: python
+
+            data = form.to_bytes()
+            form = FormDiagram.from_bytes(data)
+
+        """
+        data = pack_diagram(self, compress=compress)
+        if text:
+            return base64.b64encode(data).decode('ascii')
+        return data
+
+    def set_bytes(self, data):
+        """Replace the data of the diagram by data in the compact binary format.
+
+        Parameters
+        ----------
+        data : bytes or str
+            The data, as returned by :meth:`to_bytes`.
+
+        """
+        unpack_diagram(self, data)
+
+    # --------------------------------------------------------------------------
+    # bulk attributes
+    # --------------------------------------------------------------------------
+
+    def set_vertices_arrays(self, arrays, keys=None):
+        """Set the values of multiple attributes of multiple vertices from aligned arrays.
+
+        Parameters
+        ----------
+        arrays : dict
+            A dict mapping attribute names to sequences of values,
+            with one value per vertex.
+            The sequences can be lists, or NumPy arrays of shape (n, ) or (n, 1).
+        keys : list, optional
+            The vertices corresponding to the values.
+            Default is all vertices, in the order of ``self.vertices()``,
+            which is also the order of ``self.key_index()``.
+
+        Examples
+        --------
+        .. code-block:: python
+
+            form.set_vertices_arrays({'x': xyz[:, 0], 'y': xyz[:, 1], 'z': xyz[:, 2]})
+
+        """
+        if keys is None:
+            keys = list(self.vertices())
+        names  = list(arrays.keys())
+        values = [_values(arrays[name]) for name in names]
+        vertex = self.vertex
+        for key, row in zip(keys, zip(*values)):
+            vertex[key].update(zip(names, row))
+
+    def set_edges_arrays(self, arrays, keys=None):
+        """Set the values of multiple attributes of multiple edges from aligned arrays.
+
+        Parameters
+        ----------
+        arrays : dict
+            A dict mapping attribute names to sequences of values,
+            with one value per edge.
+            The sequences can be lists, or NumPy arrays of shape (m, ) or (m, 1).
+        keys : list, optional
+            The edges corresponding to the values.
+            Default is all edges, in the order of ``self.edges()``.
+
+        Examples
+        --------
+        .. code-block:: python
+
+            form.set_edges_arrays({'q': q, 'f': f}, keys=list(form.edges_where({'is_edge': True})))
+
+        """
+        if keys is None:
+            keys = list(self.edges())
+        names    = list(arrays.keys())
+        values   = [_values(arrays[name]) for name in names]
+        edgedata = self.edgedata
+        for (u, v), row in zip(keys, zip(*values)):
+            attr = edgedata.get((u, v))
+            if attr is None:
+                self.set_edge_attributes((u, v), names, row)
+                continue
+            attr.update(zip(names, row))
+
+    # --------------------------------------------------------------------------
+    # attribute columns
+    # --------------------------------------------------------------------------
+
+    def get_columns(self):
+        """Get the values of all attributes of all vertices and edges, as columns.
+
+        Returns
+        -------
+        dict
+            A dict with the following items:
+
+            * ``'vertex_keys'``: the vertex keys,
+            * ``'edge_keys'``: the edge keys,
+            * ``'vertex'``: a dict mapping attribute names to lists of values, aligned with the vertex keys,
+            * ``'edge'``: a dict mapping attribute names to lists of values, aligned with the edge keys.
+
+        """
+        vertex_keys  = []
+        vertex_attrs = []
+        for key, attr in self.vertices(True):
+            vertex_keys.append(key)
+            vertex_attrs.append(attr)
+        edge_keys  = []
+        edge_attrs = []
+        for u, v, attr in self.edges(True):
+            edge_keys.append((u, v))
+            edge_attrs.append(attr)
+        return {
+            'vertex_keys': vertex_keys,
+            'edge_keys'  : edge_keys,
+            'vertex'     : _columns(vertex_attrs, self.default_vertex_attributes),
+            'edge'       : _columns(edge_attrs, self.default_edge_attributes),
+        }
+
+    def get_changed_columns(self, columns):
+        """Get the attribute columns that have changed with respect to a previous state.
+
+        Parameters
+        ----------
+        columns : dict
+            The previous state, as returned by :meth:`get_columns`.
+
+        Returns
+        -------
+        dict
+            The columns that have changed, in the same format as the result of :meth:`get_columns`.
+            Only columns of which at least one value is different are included,
+            with all their values.
+
+        Notes
+        -----
+        The topology of the diagram is not compared.
+        This is meant for synchronising the results of operations that only modify
+        attributes, such as the equilibrium solvers, with :meth:`set_columns`.
+
+        Examples
+        --------
+        .. code-block:: python
+
+            columns = form.get_columns()
+            horizontal(form, force)
+            delta = form.get_changed_columns(columns)
+
+            # elsewhere, on a copy of the original diagram
+            form.set_columns(delta)
+
+        """
+        current = self.get_columns()
+        delta   = {'vertex_keys': current['vertex_keys'], 'edge_keys': current['edge_keys'], 'vertex': {}, 'edge': {}}
+        for name in ('vertex', 'edge'):
+            keys = name + '_keys'
+            if current[keys] != columns[keys]:
+                delta[name] = current[name]
+                continue
+            for attr, values in current[name].items():
+                if columns[name].get(attr) != values:
+                    delta[name][attr] = values
+        if not delta['vertex']:
+            delta['vertex_keys'] = []
+        if not delta['edge']:
+            delta['edge_keys'] = []
+        return delta
+
+    def set_columns(self, columns):
+        """Update the attributes of the vertices and edges in place, from attribute columns.
+
+        Parameters
+        ----------
+        columns : dict
+            The columns, as returned by :meth:`get_columns` or :meth:`get_changed_columns`.
+
+        """
+        if columns['vertex']:
+            self.set_vertices_arrays(columns['vertex'], keys=[_key(key) for key in columns['vertex_keys']])
+        if columns['edge']:
+            self.set_edges_arrays(columns['edge'], keys=[tuple(_key(key) for key in uv) for uv in columns['edge_keys']])
+
+    def to_data_like(self, data, columns=None):
+        """Get the data of the diagram in the same format as other data, or only the changed columns.
+
+        Parameters
+        ----------
+        data : dict or bytes or str
+            The data the format of which should be matched,
+            typically the data from which the diagram was created.
+        columns : dict, optional
+            A previous state, as returned by :meth:`get_columns`.
+            Default is ``None``.
+
+        Returns
+        -------
+        dict or str
+            If ``columns`` is provided, the columns that have changed, as returned by :meth:`get_changed_columns`.
+            Otherwise, the result of ``to_data`` if ``data`` is a dict,
+            and the result of :meth:`to_bytes` as text if it is not.
+
+        Notes
+        -----
+        This is meant for returning the results of the solvers
+        that are called in an external process.
+
+        """
+        if columns is not None:
+            return self.get_changed_columns(columns)
+        if isinstance(data, dict):
+            return self.to_data()
+        return self.to_bytes(text=True)
+
     # --------------------------------------------------------------------------
     # selections
     # --------------------------------------------------------------------------
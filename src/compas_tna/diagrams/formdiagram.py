@@ -23,6 +23,7 @@ from compas.geometry import cross_vectors
 from compas.geometry import mesh_smooth_area
 
 from compas_tna.diagrams import Diagram
+from compas_tna.diagrams import TNAArrays
 
 
 __author__  = 'Tom Van Mele'
@@ -199,6 +200,28 @@ class FormDiagram(Diagram):
         """
         return dict(enumerate(self.edges_where({'is_edge': True})))
 
+    def to_arrays(self, force=None):
+        """Pack the data required by the equilibrium solvers into arrays.
+
+        Parameters
+        ----------
+        force : compas_tna.diagrams.ForceDiagram, optional
+            The corresponding force diagram.
+            If provided, the data of the force diagram is included.
+
+        Returns
+        -------
+        TNAArrays
+            The array snapshot.
+
+        Notes
+        -----
+        The topological data is reused from the previous snapshot,
+        unless the vertices or the edges with ``is_edge`` set to ``True`` have changed.
+
+        """
+        return TNAArrays(self, force=force)
+
     # --------------------------------------------------------------------------
     # dual and reciprocal
     # --------------------------------------------------------------------------
@@ -15,6 +15,7 @@ Horizontal
 
     horizontal
     horizontal_nodal
+    HorizontalUpdater
 
 Vertical
 ========
@@ -26,15 +27,27 @@ Vertical
     vertical_from_zmax
     vertical_from_bbox
     vertical_from_q
+    vertical_from_q_cases
+
+Parameter studies
+=================
+
+.. autosummary::
+    :toctree: generated/
+    :nosignatures:
+
+    parameter_sweep
 
 """
 from __future__ import absolute_import
 
 from . import horizontal
 from . import vertical
+from . import sweep
 
-__all__ = horizontal.__all__ + vertical.__all__
+__all__ = horizontal.__all__ + vertical.__all__ + sweep.__all__
 
 from .horizontal import *
 from .vertical import *
+from .sweep import *
 
@@ -7,25 +7,33 @@ import sys
 try:
     from numpy import array
     from numpy import float64
+    from numpy import sqrt
+    from numpy import maximum
 
 except ImportError:
     if 'ironpython' not in sys.version.lower():
         raise
 
-import compas
-import compas_tna
+try:
+    from concurrent.futures import ThreadPoolExecutor
+except ImportError:
+    ThreadPoolExecutor = None
 
-from compas.utilities import XFunc
-from compas.geometry import angle_vectors_xy
+import compas
 
-from compas.numerical import connectivity_matrix
 from compas.numerical import normrow
 from compas.numerical import normalizerow
 
 from compas_tna.utilities import rot90
 from compas_tna.utilities import apply_bounds
-from compas_tna.utilities import parallelise_sparse
+from compas_tna.utilities import angle_deviations
+from compas_tna.utilities import laplacian_solver
+from compas_tna.utilities import LaplacianSolver
 from compas_tna.utilities import parallelise_nodal
+from compas_tna.utilities import NodalParalleliser
+from compas_tna.utilities import factorization_cache
+from compas_tna.utilities import get_xworker
+from compas_tna.utilities import start_timer
 
 
 __author__  = 'Tom Van Mele'
@@ -34,6 +42,7 @@ __email__   = 'vanmelet@ethz.ch'
 
 __all__ = [
     'horizontal',
+    'HorizontalUpdater',
     'horizontal_xfunc',
     'horizontal_nodal',
     'horizontal_nodal_xfunc',
@@ -45,22 +54,125 @@ __all__ = [
 EPS = 1 / sys.float_info.epsilon
 
 
+def _record_deviations(result, uv, _uv):
+    a = angle_deviations(uv, _uv)
+    result['deviation_max'].append(float(a.max()) if a.size else 0.0)
+    result['deviation_rms'].append(float(sqrt((a ** 2).mean())) if a.size else 0.0)
+    return a
+
+
+def _is_converged(result, atol, a=None):
+    # atol is either a tolerance on the maximum deviation
+    # or an array of tolerances per edge
+    if atol is None:
+        return False
+    if a is not None and hasattr(atol, 'shape'):
+        return bool((a <= atol).all())
+    return result['deviation_max'][-1] < atol
+
+
+def _update(solve, C, Ct, xy, l, t):
+    # solve for the coordinates of one of the diagrams
+    # and compute the new edge vectors and lengths
+    xy = solve(Ct.dot(l * t), xy)
+    uv = C.dot(xy)
+    return xy, uv, normrow(uv)
+
+
+def _parallelise(C, _C, xy, _xy, solve, _solve, lmin, lmax, fmin, fmax, alpha, kmax, atol, display, callback, timer, concurrent=False, kmin=0):
+    # make the diagrams parallel to a target vector
+    # that is the (alpha) weighted average of the directions of corresponding
+    # edges of the two diagrams
+    Ct  = C.transpose()
+    _Ct = _C.transpose()
+    uv  = C.dot(xy)
+    _uv = _C.dot(_xy)
+    l   = normrow(uv)
+    _l  = normrow(_uv)
+    t   = alpha * normalizerow(uv) + (1 - alpha) * normalizerow(_uv)
+    # the updates of the form and force diagram only depend on the targets
+    # and can therefore be computed at the same time
+    executor = None
+    if concurrent and ThreadPoolExecutor is not None and alpha not in (0.0, 1.0):
+        executor = ThreadPoolExecutor(max_workers=1)
+    # angle deviations before the first iteration
+    result = {'iterations': 0, 'converged': False, 'deviation_max': [], 'deviation_rms': []}
+    a = _record_deviations(result, uv, _uv)
+    timer('residuals')
+    try:
+        for k in range(kmax):
+            # stop if the diagrams are parallel within tolerance
+            if k >= kmin and _is_converged(result, atol, a):
+                break
+            # apply length bounds
+            apply_bounds(l, lmin, lmax)
+            apply_bounds(_l, fmin, fmax)
+            # print, if allowed
+            if display:
+                print(k)
+            if executor is not None:
+                # update the form diagram in the worker thread
+                # and the force diagram in this one
+                future = executor.submit(_update, solve, C, Ct, xy, l, t)
+                _xy, _uv, _l = _update(_solve, _C, _Ct, _xy, _l, t)
+                xy, uv, l = future.result()
+            else:
+                if alpha != 1.0:
+                    # if emphasis is not entirely on the form
+                    # update the form diagram
+                    xy, uv, l = _update(solve, C, Ct, xy, l, t)
+                if alpha != 0.0:
+                    # if emphasis is not entirely on the force
+                    # update the force diagram
+                    _xy, _uv, _l = _update(_solve, _C, _Ct, _xy, _l, t)
+            timer('solves')
+            # angle deviations
+            # note that this does not account for flipped edges!
+            a = _record_deviations(result, uv, _uv)
+            result['iterations'] = k + 1
+            timer('residuals')
+            if callback:
+                callback(k, {'deviation_max': result['deviation_max'][-1], 'deviation_rms': result['deviation_rms'][-1]})
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    result['converged'] = _is_converged(result, atol, a)
+    return xy, _xy, l, _l, a, result
+
+
+def _snapshot(form, force, arrays):
+    if arrays is None:
+        return form.to_arrays(force)
+    if not arrays.has_force:
+        raise ValueError('The snapshot does not contain the data of the force diagram.')
+    return arrays
+
+
 def horizontal_xfunc(formdata, forcedata, *args, **kwargs):
     from compas_tna.diagrams import FormDiagram
     from compas_tna.diagrams import ForceDiagram
+    delta = kwargs.pop('delta', False)
+    # the diagrams are reconstructed on every call
+    # but the factorisations are kept in the cache of the (worker) process
+    kwargs.setdefault('cache', factorization_cache())
     form = FormDiagram.from_data(formdata)
     force = ForceDiagram.from_data(forcedata)
-    horizontal(form, force, *args, **kwargs)
-    return form.to_data(), force.to_data()
+    columns = form.get_columns() if delta else None
+    _columns = force.get_columns() if delta else None
+    result = horizontal(form, force, *args, **kwargs)
+    return form.to_data_like(formdata, columns), force.to_data_like(forcedata, _columns), result
 
 
 def horizontal_nodal_xfunc(formdata, forcedata, *args, **kwargs):
     from compas_tna.diagrams import FormDiagram
     from compas_tna.diagrams import ForceDiagram
+    delta = kwargs.pop('delta', False)
     form = FormDiagram.from_data(formdata)
     force = ForceDiagram.from_data(forcedata)
-    horizontal_nodal(form, force, *args, **kwargs)
-    return form.to_data(), force.to_data()
+    columns = form.get_columns() if delta else None
+    _columns = force.get_columns() if delta else None
+    result = horizontal_nodal(form, force, *args, **kwargs)
+    return form.to_data_like(formdata, columns), force.to_data_like(forcedata, _columns), result
 
 
 def horizontal_rhino(form, force, *args, **kwargs):
@@ -68,10 +180,14 @@ def horizontal_rhino(form, force, *args, **kwargs):
     def callback(line, args):
         print(line)
         compas_rhino.wait()
-    f = XFunc('compas_tna.equilibrium.horizontal_xfunc', tmpdir=compas_tna.TEMP, callback=callback)
-    formdata, forcedata = f(form.to_data(), force.to_data(), *args, **kwargs)
-    form.data = formdata
-    force.data = forcedata
+    worker = get_xworker()
+    worker.callback = callback
+    # the results are always returned as the changed columns
+    kwargs['delta'] = True
+    formdata, forcedata, result = worker('compas_tna.equilibrium.horizontal_xfunc', form.to_bytes(text=True), force.to_bytes(text=True), *args, **kwargs)
+    form.set_columns(formdata)
+    force.set_columns(forcedata)
+    return result
 
 
 def horizontal_nodal_rhino(form, force, *args, **kwargs):
@@ -79,13 +195,17 @@ def horizontal_nodal_rhino(form, force, *args, **kwargs):
     def callback(line, args):
         print(line)
         compas_rhino.wait()
-    f = XFunc('compas_tna.equilibrium.horizontal_nodal_xfunc', tmpdir=compas_tna.TEMP, callback=callback)
-    formdata, forcedata = f(form.to_data(), force.to_data(), *args, **kwargs)
-    form.data = formdata
-    force.data = forcedata
+    worker = get_xworker()
+    worker.callback = callback
+    # the results are always returned as the changed columns
+    kwargs['delta'] = True
+    formdata, forcedata, result = worker('compas_tna.equilibrium.horizontal_nodal_xfunc', form.to_bytes(text=True), force.to_bytes(text=True), *args, **kwargs)
+    form.set_columns(formdata)
+    force.set_columns(forcedata)
+    return result
 
 
-def horizontal(form, force, alpha=100.0, kmax=100, display=True):
+def horizontal(form, force, alpha=100.0, kmax=100, display=True, atol=None, arrays=None, writeback=True, callback=None, cache=None, concurrent=False):
     r"""Compute horizontal equilibrium.
 
     This implementation is based on the following formulation
@@ -110,6 +230,48 @@ def horizontal(form, force, alpha=100.0, kmax=100, display=True):
        Maximum number of iterations (the default is 100).
     display : bool
         Display information about the current iteration (the default is True).
+    atol : float, optional
+        Tolerance on the maximum angle deviation between corresponding edges
+        of the form and force diagram, in degrees.
+        If provided, the iterations stop as soon as the maximum deviation
+        drops below this value (the default is None, which implies that all
+        ``kmax`` iterations are performed).
+    arrays : compas_tna.diagrams.TNAArrays, optional
+        A snapshot of the data of the form and force diagram,
+        as returned by ``form.to_arrays(force)``.
+        The snapshot itself is not modified.
+        Default is ``None``, in which case a snapshot is made.
+    writeback : bool, optional
+        If True, the results are assigned to the attributes of the diagrams.
+        If False, the diagrams are not modified and the results are returned
+        as arrays instead, aligned with the vertex and edge indices of the snapshot.
+        Default is ``True``.
+    callback : callable, optional
+        A function to be called after every iteration, with the index of the
+        iteration and a dict with the current maximum and root-mean-square
+        angle deviations (``'deviation_max'``, ``'deviation_rms'``) as parameters.
+        Default is ``None``.
+    cache : compas_tna.utilities.FactorizationCache, optional
+        The cache of the factorised Laplacians of the form and force diagram.
+        Default is ``None``, in which case the cache of the form diagram is used
+        (see :func:`compas_tna.utilities.factorization_cache`).
+    concurrent : bool, optional
+        If True, the form and force diagram are updated at the same time, on two threads.
+        Default is ``False``.
+        Only effective if both diagrams are updated (``0 < alpha < 100``),
+        and only beneficial if the two systems are large enough to outweigh the overhead of the thread.
+
+    Returns
+    -------
+    dict
+        Information about the solution process, with the number of
+        ``'iterations'``, whether the solution is ``'converged'``, and
+        the history of the maximum and root-mean-square angle deviations
+        (``'deviation_max'``, ``'deviation_rms'``), before the first and after
+        every iteration.
+        If ``writeback`` is False, the dict also contains the coordinates of
+        the form and force diagram (``'xy'``, ``'_xy'``), and the force densities
+        and angle deviations of the edges (``'q'``, ``'a'``).
 
     """
     # --------------------------------------------------------------------------
@@ -117,70 +279,52 @@ def horizontal(form, force, alpha=100.0, kmax=100, display=True):
     # alpha == 0 : force diagram fixed
     # --------------------------------------------------------------------------
     alpha = max(0., min(1., float(alpha) / 100.0))
+    timer = start_timer('horizontal')
+    # --------------------------------------------------------------------------
+    # snapshot
+    # --------------------------------------------------------------------------
+    arrays = _snapshot(form, force, arrays)
+    timer('extraction')
     # --------------------------------------------------------------------------
     # form diagram
     # --------------------------------------------------------------------------
-    k_i   = form.key_index()
-    uv_i  = form.uv_index()
-    fixed = set(list(form.anchors()) + list(form.fixed()))
-    fixed = [k_i[key] for key in fixed]
-    edges = [[k_i[u], k_i[v]] for u, v in form.edges_where({'is_edge': True})]
-    xy    = array(form.get_vertices_attributes('xy'), dtype=float64)
-    lmin   = array([attr.get('lmin', 1e-7) for u, v, attr in form.edges_where({'is_edge': True}, True)], dtype=float64).reshape((-1, 1))
-    lmax   = array([attr.get('lmax', 1e+7) for u, v, attr in form.edges_where({'is_edge': True}, True)], dtype=float64).reshape((-1, 1))
-    fmin   = array([attr.get('fmin', 1e-7) for u, v, attr in form.edges_where({'is_edge': True}, True)], dtype=float64).reshape((-1, 1))
-    fmax   = array([attr.get('fmax', 1e+7) for u, v, attr in form.edges_where({'is_edge': True}, True)], dtype=float64).reshape((-1, 1))
-    C     = connectivity_matrix(edges, 'csr')
+    fixed = arrays.fixed
+    xy    = arrays.xyz[:, :2].copy()
+    lmin  = arrays.lmin
+    lmax  = arrays.lmax
+    fmin  = arrays.fmin
+    fmax  = arrays.fmax
+    C     = arrays.C
     Ct    = C.transpose()
     CtC   = Ct.dot(C)
     # --------------------------------------------------------------------------
     # force diagram
     # --------------------------------------------------------------------------
-    _k_i   = force.key_index()
-    _fixed = list(force.fixed())
-    _fixed = [_k_i[key] for key in _fixed]
-    _fixed = _fixed or [0]
-    _edges = force.ordered_edges(form)
-    _xy    = array(force.get_vertices_attributes('xy'), dtype=float64)
-    _C     = connectivity_matrix(_edges, 'csr')
+    _fixed = arrays._fixed
+    _xy    = arrays._xy.copy()
+    _C     = arrays._C
     _Ct    = _C.transpose()
     _Ct_C  = _Ct.dot(_C)
+    timer('assembly')
+    # --------------------------------------------------------------------------
+    # the solvers for the reduced laplacians
+    # are factorised only once, and reused in subsequent calls
+    # with the same topology and fixed vertices
+    # --------------------------------------------------------------------------
+    if cache is None:
+        cache = factorization_cache(form)
+    solve  = laplacian_solver(CtC, fixed, cache=cache) if alpha != 1.0 else None
+    _solve = laplacian_solver(_Ct_C, _fixed, cache=cache) if alpha != 0.0 else None
+    timer('factorization')
     # --------------------------------------------------------------------------
     # rotate force diagram to make it parallel to the form diagram
     # use CCW direction (opposite of cycle direction)
     # --------------------------------------------------------------------------
     _xy[:] = rot90(_xy, +1.0)
     # --------------------------------------------------------------------------
-    # make the diagrams parallel to a target vector
-    # that is the (alpha) weighted average of the directions of corresponding
-    # edges of the two diagrams
-    # --------------------------------------------------------------------------
-    uv  = C.dot(xy)
-    _uv = _C.dot(_xy)
-    l   = normrow(uv)
-    _l  = normrow(_uv)
-    t   = alpha * normalizerow(uv) + (1 - alpha) * normalizerow(_uv)
     # parallelise
-    # add the outer loop to the parallelise function
-    for k in range(kmax):
-        # apply length bounds
-        apply_bounds(l, lmin, lmax)
-        apply_bounds(_l, fmin, fmax)
-        # print, if allowed
-        if display:
-            print(k)
-        if alpha != 1.0:
-            # if emphasis is not entirely on the form
-            # update the form diagram
-            xy = parallelise_sparse(CtC, Ct.dot(l * t), xy, fixed, 'CtC')
-            uv = C.dot(xy)
-            l  = normrow(uv)
-        if alpha != 0.0:
-            # if emphasis is not entirely on the force
-            # update the force diagram
-            _xy = parallelise_sparse(_Ct_C, _Ct.dot(_l * t), _xy, _fixed, '_Ct_C')
-            _uv = _C.dot(_xy)
-            _l  = normrow(_uv)
+    # --------------------------------------------------------------------------
+    xy, _xy, l, _l, a, result = _parallelise(C, _C, xy, _xy, solve, _solve, lmin, lmax, fmin, fmax, alpha, kmax, atol, display, callback, timer, concurrent)
     # --------------------------------------------------------------------------
     # compute the force densities
     # --------------------------------------------------------------------------
@@ -191,31 +335,231 @@ def horizontal(form, force, alpha=100.0, kmax=100, display=True):
     # --------------------------------------------------------------------------
     _xy[:] = rot90(_xy, -1.0)
     # --------------------------------------------------------------------------
-    # angle deviations
-    # note that this does not account for flipped edges!
+    # return the arrays, if write-back is not requested
     # --------------------------------------------------------------------------
-    a = [angle_vectors_xy(uv[i], _uv[i], deg=True) for i in range(len(edges))]
+    if not writeback:
+        result.update({'xy': xy, '_xy': _xy, 'q': q, 'a': a})
+        timer('writeback')
+        timer.stop()
+        return result
     # --------------------------------------------------------------------------
     # update form
     # --------------------------------------------------------------------------
-    for key, attr in form.vertices(True):
-        i = k_i[key]
-        attr['x'] = xy[i, 0]
-        attr['y'] = xy[i, 1]
-    for u, v, attr in form.edges_where({'is_edge': True}, True):
-        i = uv_i[(u, v)]
-        attr['q'] = q[i, 0]
-        attr['a'] = a[i]
+    form.set_vertices_arrays({'x': xy[:, 0], 'y': xy[:, 1]}, keys=arrays.vertex_keys)
+    form.set_edges_arrays({'q': q, 'a': a}, keys=arrays.edge_keys)
     # --------------------------------------------------------------------------
     # update force
     # --------------------------------------------------------------------------
-    for key, attr in force.vertices(True):
-        i = _k_i[key]
-        attr['x'] = _xy[i, 0]
-        attr['y'] = _xy[i, 1]
+    force.set_vertices_arrays({'x': _xy[:, 0], 'y': _xy[:, 1]}, keys=arrays._vertex_keys)
+    timer('writeback')
+    timer.stop()
 
+    return result
 
-def horizontal_nodal(form, force, alpha=100, kmax=100, display=True):
+
+class HorizontalUpdater(object):
+    """Incremental computation of horizontal equilibrium, for small changes
+    to a form diagram in equilibrium.
+
+    The snapshot of the diagrams, the connectivity matrices and the factorisations
+    of the reduced Laplacians are computed once, at construction.
+    Every call continues from the coordinates of the form and force diagram
+    of the previous call (warm start), after reading the modified coordinates
+    and length bounds from the form diagram, and stops as soon as the perturbation
+    caused by the modifications has been absorbed.
+
+    Parameters
+    ----------
+    form : compas_tna.diagrams.FormDiagram
+        The form diagram.
+    force : compas_tna.diagrams.ForceDiagram
+        The force diagram.
+    alpha : float, optional
+        Weighting factor for computation of the target vectors, see :func:`horizontal`.
+        Default is ``100.0``.
+
+    Attributes
+    ----------
+    deviation_max : float
+        The maximum angle deviation after the previous call, or ``None`` if the updater
+        has not been called yet.
+    deviations : array
+        The angle deviations of the edges after the previous call, or ``None`` if the updater
+        has not been called yet.
+
+    Notes
+    -----
+    The topology of the diagrams and the fixed vertices are assumed not to change.
+    Modifications of the coordinates of the force diagram are ignored,
+    the force diagram is updated from the state of the previous call.
+    If anything else changes, a new updater should be constructed.
+
+    Examples
+    --------
+    .. code-block:: python
+
+        update = HorizontalUpdater(form, force)
+        update(atol=0.1)
+
+        # the designer moves a few vertices
+        form.set_vertex_attributes(key, 'xy', [x, y])
+
+        result = update(vertices=[key])
+        print(result['iterations'])
+
+    """
+
+    def __init__(self, form, force, alpha=100.0):
+        self.form          = form
+        self.force         = force
+        self.alpha         = max(0., min(1., float(alpha) / 100.0))
+        self.arrays        = arrays = form.to_arrays(force)
+        self.fixed         = arrays.fixed
+        self.C             = arrays.C
+        self._C            = arrays._C
+        self.xy            = arrays.xyz[:, :2].copy()
+        self._formxy       = arrays.xyz[:, :2].copy()
+        self._xy           = rot90(arrays._xy.copy(), +1.0)
+        self.lmin          = arrays.lmin.copy()
+        self.lmax          = arrays.lmax.copy()
+        self.fmin          = arrays.fmin.copy()
+        self.fmax          = arrays.fmax.copy()
+        self.deviation_max = None
+        self.deviations    = None
+        self.deviation_rms = None
+        Ct                 = self.C.transpose()
+        _Ct                = self._C.transpose()
+        self.solve         = LaplacianSolver(Ct.dot(self.C), arrays.fixed) if self.alpha != 1.0 else None
+        self._solve        = LaplacianSolver(_Ct.dot(self._C), arrays._fixed) if self.alpha != 0.0 else None
+
+    def read(self, vertices=None, edges=None):
+        """Read modified coordinates and length bounds from the form diagram.
+
+        Parameters
+        ----------
+        vertices : list, optional
+            The keys of the vertices of which the coordinates were modified.
+            Default is ``None``, in which case the coordinates of all vertices are read,
+            and the vertices of which the coordinates differ from the ones the form diagram had
+            after the previous read or write-back are considered modified.
+        edges : list, optional
+            The keys of the edges of which the bounds were modified.
+            Default is ``None``, in which case the bounds of all edges are read.
+
+        Notes
+        -----
+        After a call with ``writeback=False``, the form diagram still has the coordinates
+        from before that call. Only the vertices that were modified since then are read,
+        such that the next call continues from the coordinates of the previous one.
+
+        """
+        form      = self.form
+        arrays    = self.arrays
+        key_index = arrays.key_index
+        uv_index  = arrays.uv_index
+        if vertices is None:
+            formxy   = array(form.get_vertices_attributes('xy', keys=arrays.vertex_keys), dtype=float64)
+            modified = (formxy != self._formxy).any(axis=1)
+            self.xy[modified] = formxy[modified]
+            self._formxy = formxy
+        else:
+            for key in vertices:
+                index = key_index[key]
+                self.xy[index] = self._formxy[index] = form.get_vertex_attributes(key, 'xy')
+        if edges is None:
+            edges = arrays.edge_keys
+        dea = form.default_edge_attributes
+        for u, v in edges:
+            index = uv_index[u, v] if (u, v) in uv_index else uv_index[v, u]
+            attr  = form.edgedata[u, v]
+            self.lmin[index] = attr.get('lmin', dea.get('lmin', 1e-7))
+            self.lmax[index] = attr.get('lmax', dea.get('lmax', 1e+7))
+            self.fmin[index] = attr.get('fmin', dea.get('fmin', 1e-7))
+            self.fmax[index] = attr.get('fmax', dea.get('fmax', 1e+7))
+
+    def __call__(self, vertices=None, edges=None, kmax=100, atol=None, rtol=0.1, display=False, callback=None, writeback=True, concurrent=False):
+        """Update horizontal equilibrium after modifications of the form diagram.
+
+        Parameters
+        ----------
+        vertices : list, optional
+            The keys of the vertices of which the coordinates were modified.
+            Default is ``None``, in which case the modified vertices are identified, see :meth:`read`.
+        edges : list, optional
+            The keys of the edges of which the length bounds were modified.
+            Default is ``None``, in which case the bounds of all edges are read.
+        kmax : int, optional
+            The maximum number of iterations.
+            Default is ``100``.
+        atol : float, optional
+            Tolerance on the maximum angle deviation, in degrees.
+            Default is ``None``, in which case at least one iteration is performed,
+            and the iterations stop as soon as the deviation of every edge is within ``rtol``
+            of its deviation after the previous call.
+            The tolerance of an edge is relative to the larger of its own deviation
+            and the root-mean-square deviation after the previous call.
+            On the first call, all ``kmax`` iterations are performed.
+        rtol : float, optional
+            The relative tolerance with respect to the deviations after the previous call.
+            Only used if ``atol`` is not provided.
+            Default is ``0.1``.
+        display : bool, optional
+            Display information about the current iteration.
+            Default is ``False``.
+        callback : callable, optional
+            A function to be called after every iteration, see :func:`horizontal`.
+            Default is ``None``.
+        writeback : bool, optional
+            If True, the results are assigned to the attributes of the diagrams.
+            Default is ``True``.
+        concurrent : bool, optional
+            If True, the form and force diagram are updated at the same time, see :func:`horizontal`.
+            Default is ``False``.
+
+        Returns
+        -------
+        dict
+            Information about the solution process, as returned by :func:`horizontal`,
+            with the number of ``'iterations'`` needed to absorb the modifications.
+
+        """
+        timer = start_timer('HorizontalUpdater')
+        self.read(vertices, edges)
+        timer('extraction')
+        kmin = 0
+        if atol is None and self.deviations is not None:
+            # the modifications are absorbed if no edge deviates more than before
+            # comparing the maximum deviations is not sufficient
+            # since the maximum can be elsewhere, for example if the previous state is not converged
+            a0   = self.deviations
+            atol = a0 + rtol * maximum(a0, self.deviation_rms)
+            kmin = 1
+        xy, _xy, l, _l, a, result = _parallelise(self.C, self._C, self.xy, self._xy, self.solve, self._solve,
+                                                 self.lmin, self.lmax, self.fmin, self.fmax,
+                                                 self.alpha, kmax, atol, display, callback, timer, concurrent, kmin)
+        self.xy  = xy
+        self._xy = _xy
+        self.deviations    = a.copy()
+        self.deviation_max = result['deviation_max'][-1]
+        self.deviation_rms = result['deviation_rms'][-1]
+        q   = (_l / l).astype(float64)
+        _xy = rot90(_xy, -1.0)
+        if not writeback:
+            result.update({'xy': xy.copy(), '_xy': _xy, 'q': q, 'a': a})
+            timer('writeback')
+            timer.stop()
+            return result
+        arrays = self.arrays
+        self.form.set_vertices_arrays({'x': xy[:, 0], 'y': xy[:, 1]}, keys=arrays.vertex_keys)
+        self._formxy = xy.copy()
+        self.form.set_edges_arrays({'q': q, 'a': a}, keys=arrays.edge_keys)
+        self.force.set_vertices_arrays({'x': _xy[:, 0], 'y': _xy[:, 1]}, keys=arrays._vertex_keys)
+        timer('writeback')
+        timer.stop()
+        return result
+
+
+def horizontal_nodal(form, force, alpha=100, kmax=100, display=True, atol=None, algo='sparse', arrays=None, writeback=True, callback=None):
     """Compute horizontal equilibrium using a node-per-node approach.
 
     Parameters
@@ -230,45 +574,108 @@ def horizontal_nodal(form, force, alpha=100, kmax=100, display=True):
        Maximum number of iterations (the default is 100).
     display : bool
         Display information about the current iteration (the default is True).
+    atol : float, optional
+        Tolerance on the maximum angle deviation between corresponding edges
+        of the form and force diagram, in degrees.
+        If provided, the iterations stop as soon as the maximum deviation
+        drops below this value (the default is None, which implies that all
+        ``kmax`` iterations are performed).
+    algo : {'sparse', 'python'}, optional
+        The implementation of the node-per-node update.
+        ``'sparse'`` uses the vectorised :class:`compas_tna.utilities.NodalParalleliser`.
+        ``'python'`` uses the reference implementation :func:`compas_tna.utilities.parallelise_nodal`,
+        which loops over the vertices and their neighbours.
+        Default is ``'sparse'``.
+    arrays : compas_tna.diagrams.TNAArrays, optional
+        A snapshot of the data of the form and force diagram,
+        as returned by ``form.to_arrays(force)``.
+        The snapshot itself is not modified.
+        Default is ``None``, in which case a snapshot is made.
+    writeback : bool, optional
+        If True, the results are assigned to the attributes of the diagrams.
+        If False, the diagrams are not modified and the results are returned
+        as arrays instead, aligned with the vertex and edge indices of the snapshot.
+        Default is ``True``.
+    callback : callable, optional
+        A function to be called after every iteration, with the index of the
+        iteration and a dict with the current maximum and root-mean-square
+        angle deviations (``'deviation_max'``, ``'deviation_rms'``) as parameters.
+        Default is ``None``.
+
+    Returns
+    -------
+    dict
+        Information about the solution process, with the number of
+        ``'iterations'``, whether the solution is ``'converged'``, and
+        the history of the maximum and root-mean-square angle deviations
+        (``'deviation_max'``, ``'deviation_rms'``), before the first and after
+        every iteration.
+        If ``writeback`` is False, the dict also contains the coordinates of
+        the form and force diagram (``'xy'``, ``'_xy'``), and the force densities,
+        forces, lengths and angle deviations of the edges (``'q'``, ``'f'``, ``'l'``, ``'a'``).
 
     """
+    if algo not in ('sparse', 'python'):
+        raise ValueError('Unknown algorithm: {}'.format(algo))
     alpha = float(alpha) / 100.0
     alpha = max(0., min(1., alpha))
+    timer = start_timer('horizontal_nodal')
+    # --------------------------------------------------------------------------
+    # snapshot
+    # --------------------------------------------------------------------------
+    arrays = _snapshot(form, force, arrays)
+    timer('extraction')
     # --------------------------------------------------------------------------
     # form diagram
     # --------------------------------------------------------------------------
-    k_i    = form.key_index()
-    uv_i   = form.uv_index()
-    i_nbrs = {k_i[key]: [k_i[nbr] for nbr in form.vertex_neighbors(key)] for key in form.vertices()}
-    ij_e   = {(k_i[u], k_i[v]): index for (u, v), index in iter(uv_i.items())}
-    fixed  = set(list(form.anchors()) + list(form.fixed()))
-    fixed  = [k_i[key] for key in fixed]
-    edges  = [[k_i[u], k_i[v]] for u, v in form.edges_where({'is_edge': True})]
-    lmin   = array([attr.get('lmin', 1e-7) for u, v, attr in form.edges_where({'is_edge': True}, True)], dtype=float64).reshape((-1, 1))
-    lmax   = array([attr.get('lmax', 1e+7) for u, v, attr in form.edges_where({'is_edge': True}, True)], dtype=float64).reshape((-1, 1))
-    fmin   = array([attr.get('fmin', 1e-7) for u, v, attr in form.edges_where({'is_edge': True}, True)], dtype=float64).reshape((-1, 1))
-    fmax   = array([attr.get('fmax', 1e+7) for u, v, attr in form.edges_where({'is_edge': True}, True)], dtype=float64).reshape((-1, 1))
-    xy     = array(form.get_vertices_attributes('xy'), dtype=float64)
-    C      = connectivity_matrix(edges, 'csr')
+    k_i    = arrays.key_index
+    uv_i   = arrays.uv_index
+    fixed  = arrays.fixed
+    lmin   = arrays.lmin
+    lmax   = arrays.lmax
+    fmin   = arrays.fmin
+    fmax   = arrays.fmax
+    xy     = arrays.xyz[:, :2].copy()
+    C      = arrays.C
     # --------------------------------------------------------------------------
     # force diagram
     # --------------------------------------------------------------------------
-    _k_i    = force.key_index()
-    _uv_i   = force.uv_index(form=form)
-    _i_nbrs = {_k_i[key]: [_k_i[nbr] for nbr in force.vertex_neighbors(key)] for key in force.vertices()}
-    _ij_e   = {(_k_i[u], _k_i[v]): index for (u, v), index in iter(_uv_i.items())}
-    _fixed  = list(force.fixed())
-    _fixed  = [_k_i[key] for key in _fixed]
-    _fixed  = _fixed or [0]
-    _edges  = force.ordered_edges(form)
-    _xy     = array(force.get_vertices_attributes('xy'), dtype=float64)
-    _C      = connectivity_matrix(_edges, 'csr')
+    _k_i    = arrays._key_index
+    _xy     = arrays._xy.copy()
+    _C      = arrays._C
     # --------------------------------------------------------------------------
     # rotate force diagram to make it parallel to the form diagram
     # use CCW direction (opposite of cycle direction)
     # --------------------------------------------------------------------------
     _xy[:] = rot90(_xy, +1.0)
     # --------------------------------------------------------------------------
+    # the node-per-node update
+    # --------------------------------------------------------------------------
+    if algo == 'sparse':
+        parallelise_form  = NodalParalleliser(C, fixed=fixed)
+        parallelise_force = NodalParalleliser(_C)
+
+        def update_form(targets):
+            parallelise_form(xy, targets, kmax=1, lmin=lmin, lmax=lmax)
+
+        def update_force(targets):
+            parallelise_force(_xy, targets, kmax=1, lmin=fmin, lmax=fmax)
+
+    else:
+        i_nbrs  = {k_i[key]: [k_i[nbr] for nbr in form.vertex_neighbors(key)] for key in form.vertices()}
+        ij_e    = {(k_i[u], k_i[v]): index for (u, v), index in iter(uv_i.items())}
+        _uv_i   = force.uv_index(form=form)
+        _i_nbrs = {_k_i[key]: [_k_i[nbr] for nbr in force.vertex_neighbors(key)] for key in force.vertices()}
+        _ij_e   = {(_k_i[u], _k_i[v]): index for (u, v), index in iter(_uv_i.items())}
+
+        def update_form(targets):
+            parallelise_nodal(xy, C, targets, i_nbrs, ij_e, fixed=fixed, kmax=1, lmin=lmin, lmax=lmax, display=False)
+
+        def update_force(targets):
+            parallelise_nodal(_xy, _C, targets, _i_nbrs, _ij_e, kmax=1, lmin=fmin, lmax=fmax, display=False)
+
+    timer('assembly')
+    # --------------------------------------------------------------------------
     # make the diagrams parallel to a target vector
     # that is the (alpha) weighted average of the directions of corresponding
     # edges of the two diagrams
@@ -282,19 +689,41 @@ def horizontal_nodal(form, force, alpha=100, kmax=100, display=True):
     # --------------------------------------------------------------------------
     targets = alpha * normalizerow(uv) + (1 - alpha) * normalizerow(_uv)
     # --------------------------------------------------------------------------
-    # parallelise
+    # angle deviations before the first iteration
     # --------------------------------------------------------------------------
-    if alpha < 1:
-        parallelise_nodal(xy, C, targets, i_nbrs, ij_e, fixed=fixed, kmax=kmax, lmin=lmin, lmax=lmax)
-    if alpha > 0:
-        parallelise_nodal(_xy, _C, targets, _i_nbrs, _ij_e, kmax=kmax, lmin=fmin, lmax=fmax)
+    result = {'iterations': 0, 'converged': False, 'deviation_max': [], 'deviation_rms': []}
+    a = _record_deviations(result, uv, _uv)
+    timer('residuals')
     # --------------------------------------------------------------------------
-    # update the coordinate difference vectors
+    # parallelise
+    # the targets are fixed, therefore the two diagrams can be updated
+    # in alternation, one step at a time
     # --------------------------------------------------------------------------
-    uv  = C.dot(xy)
-    _uv = _C.dot(_xy)
-    l   = normrow(uv)
-    _l  = normrow(_uv)
+    for k in range(kmax):
+        if _is_converged(result, atol):
+            break
+        if display:
+            print(k)
+        if alpha < 1:
+            update_form(targets)
+        if alpha > 0:
+            update_force(targets)
+        timer('solves')
+        # ----------------------------------------------------------------------
+        # update the coordinate difference vectors
+        # and the angle deviations
+        # note that this does not account for flipped edges!
+        # ----------------------------------------------------------------------
+        uv  = C.dot(xy)
+        _uv = _C.dot(_xy)
+        a   = _record_deviations(result, uv, _uv)
+        result['iterations'] = k + 1
+        timer('residuals')
+        if callback:
+            callback(k, {'deviation_max': result['deviation_max'][-1], 'deviation_rms': result['deviation_rms'][-1]})
+    result['converged'] = _is_converged(result, atol)
+    l  = normrow(uv)
+    _l = normrow(_uv)
     # --------------------------------------------------------------------------
     # compute the force densities
     # --------------------------------------------------------------------------
@@ -306,30 +735,26 @@ def horizontal_nodal(form, force, alpha=100, kmax=100, display=True):
     # --------------------------------------------------------------------------
     _xy[:] = rot90(_xy, -1.0)
     # --------------------------------------------------------------------------
-    # angle deviations
-    # note that this does not account for flipped edges!
+    # return the arrays, if write-back is not requested
     # --------------------------------------------------------------------------
-    a = [angle_vectors_xy(uv[i], _uv[i], deg=True) for i in range(len(edges))]
+    if not writeback:
+        result.update({'xy': xy, '_xy': _xy, 'q': q, 'f': f, 'l': l, 'a': a})
+        timer('writeback')
+        timer.stop()
+        return result
     # --------------------------------------------------------------------------
     # update form
     # --------------------------------------------------------------------------
-    for key, attr in form.vertices(True):
-        i = k_i[key]
-        attr['x'] = xy[i, 0]
-        attr['y'] = xy[i, 1]
-    for u, v, attr in form.edges_where({'is_edge': True}, True):
-        i = uv_i[(u, v)]
-        attr['q'] = q[i, 0]
-        attr['f'] = f[i, 0]
-        attr['l'] = l[i, 0]
-        attr['a'] = a[i]
+    form.set_vertices_arrays({'x': xy[:, 0], 'y': xy[:, 1]}, keys=arrays.vertex_keys)
+    form.set_edges_arrays({'q': q, 'f': f, 'l': l, 'a': a}, keys=arrays.edge_keys)
     # --------------------------------------------------------------------------
     # update force
     # --------------------------------------------------------------------------
-    for key, attr in force.vertices(True):
-        i = _k_i[key]
-        attr['x'] = _xy[i, 0]
-        attr['y'] = _xy[i, 1]
+    force.set_vertices_arrays({'x': _xy[:, 0], 'y': _xy[:, 1]}, keys=arrays._vertex_keys)
+    timer('writeback')
+    timer.stop()
+
+    return result
 
 
 # ==============================================================================
@@ -0,0 +1,304 @@
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import division
+
+import sys
+
+from copy import copy
+from itertools import product
+
+try:
+    from numpy import array
+    from numpy import asarray
+    from numpy import empty
+    from numpy import ndarray
+    from numpy import generic
+
+    from scipy.sparse import csr_matrix
+
+except ImportError:
+    if 'ironpython' not in sys.version.lower():
+        raise
+
+try:
+    import multiprocessing
+except ImportError:
+    multiprocessing = None
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    shared_memory = None
+
+from compas_tna.equilibrium.horizontal import horizontal
+from compas_tna.equilibrium.horizontal import horizontal_nodal
+from compas_tna.equilibrium.vertical import vertical_from_zmax
+from compas_tna.equilibrium.vertical import vertical_from_bbox
+from compas_tna.equilibrium.vertical import vertical_from_q
+
+
+__author__  = 'Tom Van Mele'
+__email__   = 'vanmelet@ethz.ch'
+
+
+__all__ = ['parameter_sweep']
+
+
+SOLVERS = {
+    'horizontal'        : horizontal,
+    'horizontal_nodal'  : horizontal_nodal,
+    'vertical_from_zmax': vertical_from_zmax,
+    'vertical_from_bbox': vertical_from_bbox,
+    'vertical_from_q'   : vertical_from_q,
+}
+
+HORIZONTAL = ('horizontal', 'horizontal_nodal')
+
+# the numerical data of a snapshot that is shared between the processes
+ARRAYS = ('xyz', 'p', 't', 'q', 'lmin', 'lmax', 'fmin', 'fmax', '_xy')
+
+MATRICES = ('C', '_C')
+
+
+# ==============================================================================
+# Shared memory
+# ==============================================================================
+
+class _SharedArrays(object):
+    # the numerical arrays of a snapshot, in blocks of shared memory
+    # the remaining (topological) data is pickled once per worker
+
+    def __init__(self, arrays):
+        self.blocks = []
+        self.specs  = {}
+        self.shell  = copy(arrays)
+        for name in ARRAYS:
+            value = getattr(arrays, name)
+            if value is None:
+                continue
+            self.specs[name] = self._share(value)
+            setattr(self.shell, name, None)
+        for name in MATRICES:
+            value = getattr(arrays, name)
+            if value is None:
+                continue
+            value = value.tocsr()
+            self.specs[name] = (value.shape, self._share(value.data), self._share(value.indices), self._share(value.indptr))
+            setattr(self.shell, name, None)
+
+    def _share(self, value):
+        value = asarray(value)
+        block = shared_memory.SharedMemory(create=True, size=max(1, value.nbytes))
+        self.blocks.append(block)
+        view = ndarray(value.shape, dtype=value.dtype, buffer=block.buf)
+        view[...] = value
+        return block.name, value.shape, value.dtype.str
+
+    def release(self):
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+
+def _attach(shell, specs):
+    # reconstruct a read-only snapshot from the shared blocks
+    blocks = []
+
+    def view(spec):
+        name, shape, dtype = spec
+        block = shared_memory.SharedMemory(name=name)
+        blocks.append(block)
+        value = ndarray(shape, dtype=dtype, buffer=block.buf)
+        value.flags.writeable = False
+        return value
+
+    arrays = copy(shell)
+    for name, spec in specs.items():
+        if name in MATRICES:
+            shape, data, indices, indptr = spec
+            setattr(arrays, name, csr_matrix((view(data), view(indices), view(indptr)), shape=shape, copy=False))
+        else:
+            setattr(arrays, name, view(spec))
+    return arrays, blocks
+
+
+# ==============================================================================
+# Workers
+# ==============================================================================
+
+_STATE = {}
+
+
+def _initialize(solver, formdata, forcedata, shell, specs, options):
+    from compas_tna.diagrams import FormDiagram
+    from compas_tna.diagrams import ForceDiagram
+    if specs is None:
+        arrays, blocks = shell, []
+    else:
+        arrays, blocks = _attach(shell, specs)
+    _STATE['solver']  = solver
+    _STATE['form']    = FormDiagram.from_bytes(formdata)
+    _STATE['force']   = ForceDiagram.from_bytes(forcedata) if forcedata is not None else None
+    _STATE['arrays']  = arrays
+    _STATE['blocks']  = blocks
+    _STATE['options'] = options
+
+
+def _solve(solver, form, force, arrays, options, parameters):
+    kwargs = dict(options)
+    kwargs.update(parameters)
+    kwargs.update({'arrays': arrays, 'writeback': False, 'display': False})
+    if solver in HORIZONTAL:
+        return SOLVERS[solver](form, force, **kwargs)
+    return SOLVERS[solver](form, **kwargs)
+
+
+def _work(task):
+    index, parameters = task
+    state = _STATE
+    return index, _solve(state['solver'], state['form'], state['force'], state['arrays'], state['options'], parameters)
+
+
+# ==============================================================================
+# Results
+# ==============================================================================
+
+def _stack(values, shape):
+    # arrays and scalars are stacked along the parameter axes
+    # anything else is collected in an array of objects
+    if all(isinstance(value, (ndarray, generic, int, float, bool)) for value in values):
+        shapes = set(asarray(value).shape for value in values)
+        if len(shapes) == 1:
+            stacked = array([asarray(value) for value in values])
+            return stacked.reshape(shape + stacked.shape[1:])
+    stacked = empty(len(values), dtype=object)
+    for index, value in enumerate(values):
+        stacked[index] = value
+    return stacked.reshape(shape)
+
+
+def parameter_sweep(form, parameters, solver='vertical_from_zmax', force=None, processes=None, shared=True, **kwargs):
+    """Solve an equilibrium problem for all combinations of a set of parameter values,
+    in parallel, without modifying the diagrams.
+
+    Parameters
+    ----------
+    form : compas_tna.diagrams.FormDiagram
+        The form diagram.
+    parameters : dict or list
+        The parameter grid, as a dict or as a list of pairs, mapping the names of
+        keyword arguments of the solver to sequences of values.
+        The solver is called for all combinations of the values.
+        The parameters of a dict are sorted by name.
+    solver : {'vertical_from_zmax', 'vertical_from_bbox', 'vertical_from_q', 'horizontal', 'horizontal_nodal'}, optional
+        The name of the solver.
+        Default is ``'vertical_from_zmax'``.
+    force : compas_tna.diagrams.ForceDiagram, optional
+        The force diagram.
+        Required for the horizontal solvers.
+    processes : int, optional
+        The number of worker processes.
+        Default is ``None``, in which case the number of CPUs is used.
+        If ``1``, or if multiprocessing is not available, the problems are solved
+        in the current process.
+    shared : bool, optional
+        Share the numerical data of the snapshot of the diagrams with the workers
+        through shared memory, instead of sending a copy to every worker.
+        Default is ``True``.
+        Ignored if shared memory is not available (Python < 3.8).
+    kwargs : dict, optional
+        Additional keyword arguments of the solver, that are the same for all problems.
+
+    Returns
+    -------
+    dict
+        The results, with the names of the ``'parameters'``, and their ``'values'``,
+        in the order of the axes of the result arrays.
+        The results of the solver are stacked, such that the first axes correspond to the
+        parameters. For example, for a sweep over 5 values of ``density`` and 10 values of
+        ``zmax`` with ``vertical_from_zmax``, ``result['xyz']`` is a (5 x 10 x n x 3) array,
+        and ``result['scale']`` a (5 x 10) array.
+        The results are aligned with the vertex and edge indices of ``form.to_arrays()``.
+        Results that cannot be stacked, such as the convergence history of the
+        horizontal solvers, are returned as arrays of objects.
+
+    Notes
+    -----
+    The snapshot of the diagrams is computed once. Every worker receives the
+    diagrams and the topological data once, at startup, and attaches to the
+    shared numerical data, rather than receiving a copy with every problem.
+    The shared data is read-only.
+
+    Examples
+    --------
+    .. code-block:: python
+
+        result = parameter_sweep(form, {'density': [1.0, 2.0], 'zmax': linspace(2.0, 5.0, 100)})
+
+        scale = result['scale']  # (2 x 100)
+
+        result = parameter_sweep(form, {'alpha': [0, 25, 50, 75, 100]}, solver='horizontal', force=force, kmax=50)
+
+    """
+    if solver not in SOLVERS:
+        raise ValueError('Unknown solver: {}'.format(solver))
+    if solver in HORIZONTAL and force is None:
+        raise ValueError('The horizontal solvers require a force diagram.')
+    if isinstance(parameters, dict):
+        parameters = sorted(parameters.items())
+    names  = [name for name, values in parameters]
+    values = [list(values) for name, values in parameters]
+    shape  = tuple(len(v) for v in values)
+    tasks  = [(index, dict(zip(names, [v[i] for v, i in zip(values, index)]))) for index in product(*[range(n) for n in shape])]
+    arrays = form.to_arrays(force)
+
+    if processes is None and multiprocessing is not None:
+        processes = multiprocessing.cpu_count()
+    processes = min(processes or 1, len(tasks))
+
+    results = {}
+    if processes <= 1 or multiprocessing is None:
+        for index, task in tasks:
+            results[index] = _solve(solver, form, force, arrays, kwargs, task)
+    else:
+        blocks = _SharedArrays(arrays) if shared and shared_memory is not None else None
+        try:
+            if blocks is None:
+                shell, specs = arrays, None
+            else:
+                shell, specs = blocks.shell, blocks.specs
+            args = (solver,
+                    form.to_bytes(compress=False),
+                    force.to_bytes(compress=False) if force is not None else None,
+                    shell,
+                    specs,
+                    kwargs)
+            chunksize = max(1, len(tasks) // (4 * processes))
+            pool = multiprocessing.Pool(processes, initializer=_initialize, initargs=args)
+            try:
+                for index, result in pool.imap_unordered(_work, tasks, chunksize):
+                    results[index] = result
+            finally:
+                pool.close()
+                pool.join()
+        finally:
+            if blocks is not None:
+                blocks.release()
+
+    ordered = [results[index] for index, task in tasks]
+    sweep = {'parameters': names, 'values': values}
+    if all(isinstance(result, dict) for result in ordered):
+        for key in ordered[0]:
+            sweep[key] = _stack([result[key] for result in ordered], shape)
+    else:
+        sweep['result'] = _stack(ordered, shape)
+    return sweep
+
+
+# ==============================================================================
+# Main
+# ==============================================================================
+
+if __name__ == '__main__':
+    pass
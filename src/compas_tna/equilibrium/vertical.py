@@ -3,6 +3,7 @@ from __future__ import absolute_import
 from __future__ import division
 
 import sys
+import warnings
 
 try:
     from numpy import array
@@ -13,28 +14,28 @@ try:
     from numpy import reciprocal
     from numpy import vstack
     from numpy import hstack
+    from numpy import argmax
 
     from scipy.linalg import norm
     from scipy.linalg import solve
-    from scipy.sparse import diags
-    from scipy.sparse.linalg import spsolve
 
 except ImportError:
     if 'ironpython' not in sys.version.lower():
         raise
 
 import compas
-import compas_tna
 
-from compas.utilities import XFunc
-
-from compas.numerical import connectivity_matrix
 from compas.numerical import equilibrium_matrix
 from compas.numerical import normrow
 
 from compas_tna.utilities import LoadUpdater
+from compas_tna.utilities import spd_solver
+from compas_tna.utilities import factorization_cache
 from compas_tna.utilities import update_z
+from compas_tna.utilities import update_z_cases
 from compas_tna.utilities import update_q_from_qind
+from compas_tna.utilities import get_xworker
+from compas_tna.utilities import start_timer
 
 
 __author__  = 'Tom Van Mele'
@@ -45,6 +46,7 @@ __all__ = [
     'vertical_from_zmax',
     'vertical_from_bbox',
     'vertical_from_q',
+    'vertical_from_q_cases',
 
     'vertical_from_zmax_xfunc',
     'vertical_from_bbox_xfunc',
@@ -59,17 +61,37 @@ __all__ = [
 EPS = 1 / sys.float_info.epsilon
 
 
+def _zmax_scale(u, w, zmax, scale, kmax=100):
+    # the heights of the free vertices are z = u / scale + w
+    # z is linear in 1 / scale, so that newton iterations on 1 / scale
+    # are exact for the vertex that is currently the highest
+    for k in range(kmax):
+        i = argmax(u / scale + w)
+        if u[i] <= 0 or w[i] >= zmax:
+            # the highest vertex cannot reach zmax for any positive scale
+            # either because it is not lifted by the loads
+            # or because it is already above zmax due to the supports
+            # the caller warns about the height that is reached instead
+            break
+        s = u[i] / (zmax - w[i])
+        if abs(s - scale) <= 1e-12 * scale:
+            return s
+        scale = s
+    return scale
+
+
 def vertical_from_zmax_rhino(form, *args, **kwargs):
     import compas_rhino
     def callback(line, args):
         print(line)
         compas_rhino.wait()
-    f = XFunc('compas_tna.equilibrium.vertical_from_zmax_xfunc')
-    f.tmpdir = compas_tna.TEMP
-    f.callback = callback
-    formdata, scale = f(form.to_data(), *args, **kwargs)
-    form.data = formdata
-    return scale
+    worker = get_xworker()
+    worker.callback = callback
+    # the results are always returned as the changed columns
+    kwargs['delta'] = True
+    formdata, result = worker('compas_tna.equilibrium.vertical_from_zmax_xfunc', form.to_bytes(text=True), *args, **kwargs)
+    form.set_columns(formdata)
+    return result
 
 
 def vertical_from_bbox_rhino(form, *args, **kwargs):
@@ -77,12 +99,13 @@ def vertical_from_bbox_rhino(form, *args, **kwargs):
     def callback(line, args):
         print(line)
         compas_rhino.wait()
-    f = XFunc('compas_tna.equilibrium.vertical_from_bbox_xfunc')
-    f.tmpdir = compas_tna.TEMP
-    f.callback = callback
-    formdata, scale = f(form.to_data(), *args, **kwargs)
-    form.data = formdata
-    return scale
+    worker = get_xworker()
+    worker.callback = callback
+    # the results are always returned as the changed columns
+    kwargs['delta'] = True
+    formdata, result = worker('compas_tna.equilibrium.vertical_from_bbox_xfunc', form.to_bytes(text=True), *args, **kwargs)
+    form.set_columns(formdata)
+    return result
 
 
 def vertical_from_q_rhino(form, *args, **kwargs):
@@ -90,35 +113,51 @@ def vertical_from_q_rhino(form, *args, **kwargs):
     def callback(line, args):
         print(line)
         compas_rhino.wait()
-    f = XFunc('compas_tna.equilibrium.vertical_from_q_xfunc')
-    f.tmpdir = compas_tna.TEMP
-    f.callback = callback
-    formdata = f(form.to_data(), *args, **kwargs)
-    form.data = formdata
+    worker = get_xworker()
+    worker.callback = callback
+    # the results are always returned as the changed columns
+    kwargs['delta'] = True
+    formdata = worker('compas_tna.equilibrium.vertical_from_q_xfunc', form.to_bytes(text=True), *args, **kwargs)
+    form.set_columns(formdata)
 
 
 def vertical_from_zmax_xfunc(formdata, *args, **kwargs):
     from compas_tna.diagrams import FormDiagram
+    delta = kwargs.pop('delta', False)
+    # the diagrams are reconstructed on every call
+    # but the factorisations are kept in the cache of the (worker) process
+    kwargs.setdefault('cache', factorization_cache())
     form = FormDiagram.from_data(formdata)
-    scale = vertical_from_zmax(form, *args, **kwargs)
-    return form.to_data(), scale
+    columns = form.get_columns() if delta else None
+    result = vertical_from_zmax(form, *args, **kwargs)
+    return form.to_data_like(formdata, columns), result
 
 
 def vertical_from_bbox_xfunc(formdata, *args, **kwargs):
     from compas_tna.diagrams import FormDiagram
+    delta = kwargs.pop('delta', False)
+    # the diagrams are reconstructed on every call
+    # but the factorisations are kept in the cache of the (worker) process
+    kwargs.setdefault('cache', factorization_cache())
     form = FormDiagram.from_data(formdata)
-    scale = vertical_from_bbox(form, *args, **kwargs)
-    return form.to_data(), scale
+    columns = form.get_columns() if delta else None
+    result = vertical_from_bbox(form, *args, **kwargs)
+    return form.to_data_like(formdata, columns), result
 
 
 def vertical_from_q_xfunc(formdata, *args, **kwargs):
     from compas_tna.diagrams import FormDiagram
+    delta = kwargs.pop('delta', False)
+    # the diagrams are reconstructed on every call
+    # but the factorisations are kept in the cache of the (worker) process
+    kwargs.setdefault('cache', factorization_cache())
     form = FormDiagram.from_data(formdata)
+    columns = form.get_columns() if delta else None
     vertical_from_q(form, *args, **kwargs)
-    return form.to_data()
+    return form.to_data_like(formdata, columns)
 
 
-def vertical_from_zmax(form, zmax, kmax=100, xtol=1e-2, rtol=1e-3, density=1.0, display=True):
+def vertical_from_zmax(form, zmax, kmax=100, xtol=1e-2, rtol=1e-3, density=1.0, display=True, arrays=None, writeback=True, callback=None, algo='fixed', cache=None):
     """For the given form and force diagram, compute the scale of the force
     diagram for which the highest point of the thrust network is equal to a
     specified value.
@@ -136,39 +175,76 @@ def vertical_from_zmax(form, zmax, kmax=100, xtol=1e-2, rtol=1e-3, density=1.0,
     kmax : int
         The maximum number of iterations for computing vertical equilibrium
         (the default is 100).
-    tol : float
-        The stopping criterion.
+    xtol : float
+        The stopping criterion for the difference between the height of the
+        highest point and ``zmax`` (the default is 0.01).
+    rtol : float
+        The stopping criterion for the residual forces (the default is 0.001).
     density : float
         The density for computation of the self-weight of the thrust network
         (the default is 1.0). Set this to 0.0 to ignore self-weight and only
         consider specified point loads.
     display : bool
         If True, information about the current iteration will be displayed.
+    arrays : compas_tna.diagrams.TNAArrays, optional
+        A snapshot of the data of the form diagram, as returned by ``form.to_arrays()``.
+        The snapshot itself is not modified.
+        Default is ``None``, in which case a snapshot is made.
+    writeback : bool, optional
+        If True, the results are assigned to the attributes of the form diagram.
+        If False, the form diagram is not modified and the results are returned
+        as a dict of arrays instead, aligned with the vertex and edge indices of the snapshot.
+        Default is ``True``.
+    callback : callable, optional
+        A function to be called after every iteration, with the index of the
+        iteration and a dict with information about the current state as parameters.
+        While the scale is computed, the dict contains the current ``'scale'`` and
+        the height of the highest point (``'zmax'``).
+        During the subsequent update of the heights for the self-weight
+        it contains the norm of the residual forces (``'residual'``).
+        Default is ``None``.
+    algo : {'fixed', 'anderson', 'newton'}, optional
+        The iteration scheme for the update of the heights for the self-weight,
+        see :func:`compas_tna.utilities.update_z`.
+        Default is ``'fixed'``.
+    cache : compas_tna.utilities.FactorizationCache, optional
+        The cache of the factorisations of the reduced Laplacians,
+        for example the cache of the process (see :func:`compas_tna.utilities.factorization_cache`).
+        The factorisations are reused by subsequent calls with the same force densities.
+        Default is ``None``, in which case the Laplacians are factorised for this call only.
+
+    Returns
+    -------
+    dict
+        The ``'scale'`` of the horizontal forces,
+        the number of ``'iterations'`` of the update for the self-weight,
+        and the norm of the final ``'residual'`` forces.
+        If ``writeback`` is False, the dict also contains the results.
+
+    Warns
+    -----
+    UserWarning
+        If the height of the highest point differs from ``zmax`` by more than ``xtol``,
+        for example because a support is higher than ``zmax``,
+        or because the scale does not converge in ``kmax`` iterations.
+        The last computed scale is used.
 
     """
     xtol2 = xtol ** 2
+    timer = start_timer('vertical_from_zmax')
     # --------------------------------------------------------------------------
     # FormDiagram
     # --------------------------------------------------------------------------
-    k_i     = form.key_index()
-    uv_i    = form.uv_index()
-    vcount  = len(form.vertex)
-    anchors = list(form.anchors())
-    fixed   = list(form.fixed())
-    fixed   = set(anchors + fixed)
-    fixed   = [k_i[key] for key in fixed]
-    free    = list(set(range(vcount)) - set(fixed))
-    edges   = [(k_i[u], k_i[v]) for u, v in form.edges_where({'is_edge': True})]
-    xyz     = array(form.get_vertices_attributes('xyz'), dtype=float64)
-    thick   = array(form.get_vertices_attribute('t'), dtype=float64).reshape((-1, 1))
-    p       = array(form.get_vertices_attributes(('px', 'py', 'pz')), dtype=float64)
-    q       = [attr.get('q', 1.0) for u, v, attr in form.edges_where({'is_edge': True}, True)]
-    q       = array(q, dtype=float64).reshape((-1, 1))
-    C       = connectivity_matrix(edges, 'csr')
-    Ci      = C[:, free]
-    Cf      = C[:, fixed]
-    Cit     = Ci.transpose()
-    Ct      = C.transpose()
+    if arrays is None:
+        arrays = form.to_arrays()
+    timer('extraction')
+    fixed   = arrays.fixed
+    free    = arrays.free
+    xyz     = arrays.xyz.copy()
+    thick   = arrays.t
+    p       = arrays.p.copy()
+    q       = arrays.q
+    C       = arrays.C
     # --------------------------------------------------------------------------
     # original data
     # --------------------------------------------------------------------------
@@ -178,10 +254,23 @@ def vertical_from_zmax(form, zmax, kmax=100, xtol=1e-2, rtol=1e-3, density=1.0,
     # load updater
     # --------------------------------------------------------------------------
     update_loads = LoadUpdater(form, p0, thickness=thick, density=density)
+    timer('assembly')
     # --------------------------------------------------------------------------
     # scale to zmax
     # note that zmax should not exceed scale * diagonal
     # --------------------------------------------------------------------------
+    # since A(scale) = scale * A0 and B(scale) = scale * B0
+    # the heights of the free vertices are z = A0^-1 p / scale - A0^-1 B0 zf
+    # therefore, A0 has to be factorised only once
+    # and the second term does not change
+    # --------------------------------------------------------------------------
+    A0, B0, L0 = arrays.assembler.assemble(q0)
+    timer('assembly')
+    A0solve = spd_solver(A0, ordering=arrays.assembler.ordering(), cache=cache)
+    timer('factorization')
+    w       = - A0solve(B0.dot(xyz[fixed, 2]))
+    u       = None
+
     scale = 1.0
 
     for k in range(kmax):
@@ -189,74 +278,85 @@ def vertical_from_zmax(form, zmax, kmax=100, xtol=1e-2, rtol=1e-3, density=1.0,
             print(k)
 
         update_loads(p, xyz)
+        timer('loads')
+
+        u = A0solve(p[free, 2], u)
+        timer('solves')
 
-        q            = scale * q0
-        Q            = diags([q.ravel()], [0])
-        A            = Cit.dot(Q).dot(Ci)
-        b            = p[free, 2] - Cit.dot(Q).dot(Cf).dot(xyz[fixed, 2])
-        xyz[free, 2] = spsolve(A, b)
+        zf           = xyz[free, 2].copy()
+        xyz[free, 2] = u / scale + w
         z            = max(xyz[free, 2])
         res2         = (z - zmax) ** 2
+        dz2          = max((xyz[free, 2] - zf) ** 2)
+
+        if callback:
+            callback(k, {'scale': scale, 'zmax': z})
 
-        if res2 < xtol2:
+        # the heights have to be stationary as well
+        # otherwise the loads of the last iteration are not consistent with the heights
+        if res2 < xtol2 and dz2 < xtol2:
+            timer('residuals')
             break
 
-        scale = scale * (z / zmax)
+        scale = _zmax_scale(u, w, zmax, scale)
+        timer('residuals')
     # --------------------------------------------------------------------------
     # vertical
     # --------------------------------------------------------------------------
+    # the matrices of the initial force densities are no longer needed
+    # and are updated in-place
+    # --------------------------------------------------------------------------
     q = scale * q0
-    Q = diags([q.ravel()], [0])
+    A, B, L = A0, B0, L0
+    arrays.assembler.update(q, A, B, L)
+
+    res, k = update_z(xyz, None, C, p, free, fixed, update_loads, tol=rtol, kmax=kmax,
+                      display=display, callback=callback, timer=timer, algo=algo, laplacians=(A, B, L), iterations=True, ordering=arrays.assembler.ordering(),
+                      cache=cache)
 
-    res = update_z(xyz, Q, C, p, free, fixed, update_loads, tol=rtol, kmax=kmax, display=display)
+    z = max(xyz[free, 2])
+    if (z - zmax) ** 2 > xtol2:
+        warnings.warn('The maximum height {0} was not reached. The maximum height of the thrust network is {1}.'.format(zmax, z))
     # --------------------------------------------------------------------------
     # update
     # --------------------------------------------------------------------------
     l  = normrow(C.dot(xyz))
     f  = q * l
-    r  = Ct.dot(Q).dot(C).dot(xyz) - p
+    r  = L.dot(xyz) - p
     sw = p - p0
     # --------------------------------------------------------------------------
+    # return the arrays, if write-back is not requested
+    # --------------------------------------------------------------------------
+    if not writeback:
+        timer('writeback')
+        timer.stop()
+        return {'scale': scale, 'xyz': xyz, 'r': r, 'sw': sw[:, 2:3], 'q': q, 'f': f, 'l': l, 'iterations': k, 'residual': res}
+    # --------------------------------------------------------------------------
     # form
     # --------------------------------------------------------------------------
-    for key, attr in form.vertices(True):
-        index = k_i[key]
-        attr['z']  = xyz[index, 2]
-        attr['rx'] = r[index, 0]
-        attr['ry'] = r[index, 1]
-        attr['rz'] = r[index, 2]
-        attr['sw'] = sw[index, 2]
-    for u, v, attr in form.edges_where({'is_edge': True}, True):
-        index = uv_i[(u, v)]
-        attr['f'] = f[index, 0]
-        attr['l'] = l[index, 0]
+    form.set_vertices_arrays({'z': xyz[:, 2], 'rx': r[:, 0], 'ry': r[:, 1], 'rz': r[:, 2], 'sw': sw[:, 2]}, keys=arrays.vertex_keys)
+    form.set_edges_arrays({'f': f, 'l': l}, keys=arrays.edge_keys)
+    timer('writeback')
+    timer.stop()
 
-    return scale
+    return {'scale': scale, 'iterations': k, 'residual': res}
 
 
-def vertical_from_bbox(form, factor=5.0, kmax=100, tol=1e-3, density=1.0, display=True):
+def vertical_from_bbox(form, factor=5.0, kmax=100, tol=1e-3, density=1.0, display=True, arrays=None, writeback=True, callback=None, algo='fixed', cache=None):
+    timer = start_timer('vertical_from_bbox')
     # --------------------------------------------------------------------------
     # FormDiagram
     # --------------------------------------------------------------------------
-    k_i     = form.key_index()
-    uv_i    = form.uv_index()
-    vcount  = len(form.vertex)
-    anchors = list(form.anchors())
-    fixed   = list(form.fixed())
-    fixed   = set(anchors + fixed)
-    fixed   = [k_i[key] for key in fixed]
-    free    = list(set(range(vcount)) - set(fixed))
-    edges   = [(k_i[u], k_i[v]) for u, v in form.edges_where({'is_edge': True})]
-    xyz     = array(form.get_vertices_attributes('xyz'), dtype=float64)
-    thick   = array(form.get_vertices_attribute('t'), dtype=float64).reshape((-1, 1))
-    p       = array(form.get_vertices_attributes(('px', 'py', 'pz')), dtype=float64)
-    q       = [attr.get('q', 1.0) for u, v, attr in form.edges_where({'is_edge': True}, True)]
-    q       = array(q, dtype=float64).reshape((-1, 1))
-    C       = connectivity_matrix(edges, 'csr')
-    Ci      = C[:, free]
-    Cf      = C[:, fixed]
-    Cit     = Ci.transpose()
-    Ct      = C.transpose()
+    if arrays is None:
+        arrays = form.to_arrays()
+    timer('extraction')
+    fixed   = arrays.fixed
+    free    = arrays.free
+    xyz     = arrays.xyz.copy()
+    thick   = arrays.t
+    p       = arrays.p.copy()
+    q       = arrays.q
+    C       = arrays.C
     # --------------------------------------------------------------------------
     # original data
     # --------------------------------------------------------------------------
@@ -266,44 +366,48 @@ def vertical_from_bbox(form, factor=5.0, kmax=100, tol=1e-3, density=1.0, displa
     # load updater
     # --------------------------------------------------------------------------
     update_loads = LoadUpdater(form, p0, thickness=thick, density=density)
+    timer('assembly')
     # --------------------------------------------------------------------------
     # scale
     # --------------------------------------------------------------------------
-    (xmin, ymin, zmin), (xmax, ymax, zmax) = form.bbox()
+    (xmin, ymin), (xmax, ymax) = xyz[:, :2].min(axis=0), xyz[:, :2].max(axis=0)
     d = ((xmax - xmin) ** 2 + (ymax - ymin) ** 2) ** 0.5
     scale = d / factor
     # --------------------------------------------------------------------------
     # vertical
     # --------------------------------------------------------------------------
     q = scale * q0
-    Q = diags([q.ravel()], [0])
-    update_z(xyz, Q, C, p, free, fixed, update_loads, tol=tol, kmax=kmax, display=display)
+    A, B, L = arrays.assembler.assemble(q)
+    timer('assembly')
+    res, k = update_z(xyz, None, C, p, free, fixed, update_loads, tol=tol, kmax=kmax,
+                      display=display, callback=callback, timer=timer, algo=algo, laplacians=(A, B, L), iterations=True, ordering=arrays.assembler.ordering(),
+                      cache=cache)
     # --------------------------------------------------------------------------
     # update
     # --------------------------------------------------------------------------
     l  = normrow(C.dot(xyz))
     f  = q * l
-    r  = Ct.dot(Q).dot(C).dot(xyz) - p
+    r  = L.dot(xyz) - p
     sw = p - p0
     # --------------------------------------------------------------------------
+    # return the arrays, if write-back is not requested
+    # --------------------------------------------------------------------------
+    if not writeback:
+        timer('writeback')
+        timer.stop()
+        return {'scale': scale, 'xyz': xyz, 'r': r, 'sw': sw[:, 2:3], 'q': q, 'f': f, 'l': l, 'iterations': k, 'residual': res}
+    # --------------------------------------------------------------------------
     # form
     # --------------------------------------------------------------------------
-    for key, attr in form.vertices(True):
-        index = k_i[key]
-        attr['z']  = xyz[index, 2]
-        attr['rx'] = r[index, 0]
-        attr['ry'] = r[index, 1]
-        attr['rz'] = r[index, 2]
-        attr['sw'] = sw[index, 2]
-    for u, v, attr in form.edges_where({'is_edge': True}, True):
-        index = uv_i[(u, v)]
-        attr['f'] = f[index, 0]
-        attr['l'] = l[index, 0]
+    form.set_vertices_arrays({'z': xyz[:, 2], 'rx': r[:, 0], 'ry': r[:, 1], 'rz': r[:, 2], 'sw': sw[:, 2]}, keys=arrays.vertex_keys)
+    form.set_edges_arrays({'f': f, 'l': l}, keys=arrays.edge_keys)
+    timer('writeback')
+    timer.stop()
 
-    return scale
+    return {'scale': scale, 'iterations': k, 'residual': res}
 
 
-def vertical_from_q(form, scale=1.0, density=1.0, kmax=100, tol=1e-3, display=True):
+def vertical_from_q(form, scale=1.0, density=1.0, kmax=100, tol=1e-3, display=True, arrays=None, writeback=True, callback=None, algo='fixed', cache=None):
     """Compute vertical equilibrium from the force densities of the independent edges.
 
     Parameters
@@ -326,23 +430,48 @@ def vertical_from_q(form, scale=1.0, density=1.0, kmax=100, tol=1e-3, display=Tr
     display : bool
         Display information about the current iteration.
         Default is ``True``.
+    arrays : compas_tna.diagrams.TNAArrays, optional
+        A snapshot of the data of the form diagram, as returned by ``form.to_arrays()``.
+        The snapshot itself is not modified.
+        Default is ``None``, in which case a snapshot is made.
+    writeback : bool, optional
+        If True, the results are assigned to the attributes of the form diagram.
+        If False, the form diagram is not modified and the results are returned
+        as a dict of arrays instead, aligned with the vertex and edge indices of the snapshot.
+        Default is ``True``.
+    callback : callable, optional
+        A function to be called after every iteration, with the index of the
+        iteration and a dict with the norm of the residual forces at the free
+        vertices (``'residual'``) as parameters.
+        Default is ``None``.
+    algo : {'fixed', 'anderson', 'newton'}, optional
+        The iteration scheme for the update of the heights for the self-weight,
+        see :func:`compas_tna.utilities.update_z`.
+        Default is ``'fixed'``.
+    cache : compas_tna.utilities.FactorizationCache, optional
+        The cache of the factorisations of the reduced Laplacians,
+        for example the cache of the process (see :func:`compas_tna.utilities.factorization_cache`).
+        The factorisations are reused by subsequent calls with the same force densities.
+        Default is ``None``, in which case the Laplacians are factorised for this call only.
+
+    Returns
+    -------
+    dict
+        The number of ``'iterations'`` and the norm of the final ``'residual'`` forces.
+        If ``writeback`` is False, the dict also contains the results.
 
     """
-    k_i     = form.key_index()
-    uv_i    = form.uv_index()
-    vcount  = form.number_of_vertices()
-    anchors = list(form.anchors())
-    fixed   = list(form.fixed())
-    fixed   = set(anchors + fixed)
-    fixed   = [k_i[key] for key in fixed]
-    edges   = [(k_i[u], k_i[v]) for u, v in form.edges_where({'is_edge': True})]
-    free    = list(set(range(vcount)) - set(fixed))
-    xyz     = array(form.get_vertices_attributes('xyz'), dtype=float64)
-    thick   = array(form.get_vertices_attribute('t'), dtype=float64).reshape((-1, 1))
-    p       = array(form.get_vertices_attributes(('px', 'py', 'pz')), dtype=float64)
-    q       = [attr.get('q', 1.0) for u, v, attr in form.edges_where({'is_edge': True}, True)]
-    q       = array(q, dtype=float64).reshape((-1, 1))
-    C       = connectivity_matrix(edges, 'csr')
+    timer = start_timer('vertical_from_q')
+    if arrays is None:
+        arrays = form.to_arrays()
+    timer('extraction')
+    fixed   = arrays.fixed
+    free    = arrays.free
+    xyz     = arrays.xyz.copy()
+    thick   = arrays.t
+    p       = arrays.p.copy()
+    q       = arrays.q
+    C       = arrays.C
     # --------------------------------------------------------------------------
     # original data
     # --------------------------------------------------------------------------
@@ -352,36 +481,162 @@ def vertical_from_q(form, scale=1.0, density=1.0, kmax=100, tol=1e-3, display=Tr
     # load updater
     # --------------------------------------------------------------------------
     update_loads = LoadUpdater(form, p0, thickness=thick, density=density)
+    timer('assembly')
     # --------------------------------------------------------------------------
     # update forcedensity based on given q[ind]
     # --------------------------------------------------------------------------
     q = scale * q0
-    Q = diags([q.ravel()], [0])
+    A, B, L = arrays.assembler.assemble(q)
+    timer('assembly')
     # --------------------------------------------------------------------------
     # compute vertical
     # --------------------------------------------------------------------------
-    update_z(xyz, Q, C, p, free, fixed, update_loads, tol=tol, kmax=kmax, display=display)
+    res, k = update_z(xyz, None, C, p, free, fixed, update_loads, tol=tol, kmax=kmax,
+                      display=display, callback=callback, timer=timer, algo=algo, laplacians=(A, B, L), iterations=True, ordering=arrays.assembler.ordering(),
+                      cache=cache)
     # --------------------------------------------------------------------------
     # update
     # --------------------------------------------------------------------------
     l  = normrow(C.dot(xyz))
     f  = q * l
-    r  = C.transpose().dot(Q).dot(C).dot(xyz) - p
+    r  = L.dot(xyz) - p
     sw = p - p0
     # --------------------------------------------------------------------------
+    # return the arrays, if write-back is not requested
+    # --------------------------------------------------------------------------
+    if not writeback:
+        timer('writeback')
+        timer.stop()
+        return {'scale': scale, 'xyz': xyz, 'r': r, 'sw': sw[:, 2:3], 'q': q, 'f': f, 'l': l, 'iterations': k, 'residual': res}
+    # --------------------------------------------------------------------------
     # form
     # --------------------------------------------------------------------------
-    for key, attr in form.vertices(True):
-        index = k_i[key]
-        attr['z']  = xyz[index, 2]
-        attr['rx'] = r[index, 0]
-        attr['ry'] = r[index, 1]
-        attr['rz'] = r[index, 2]
-        attr['sw'] = sw[index, 2]
-    for u, v, attr in form.edges_where({'is_edge': True}, True):
-        index = uv_i[(u, v)]
-        attr['f'] = f[index, 0]
-        attr['l'] = l[index, 0]
+    form.set_vertices_arrays({'z': xyz[:, 2], 'rx': r[:, 0], 'ry': r[:, 1], 'rz': r[:, 2], 'sw': sw[:, 2]}, keys=arrays.vertex_keys)
+    form.set_edges_arrays({'f': f, 'l': l}, keys=arrays.edge_keys)
+    timer('writeback')
+    timer.stop()
+
+    return {'iterations': k, 'residual': res}
+
+
+def vertical_from_q_cases(form, cases, scale=1.0, density=1.0, kmax=100, tol=1e-3, display=True, arrays=None, callback=None):
+    """Compute vertical equilibrium from the force densities of the independent edges,
+    for multiple load cases at once.
+
+    Parameters
+    ----------
+    form : FormDiagram
+        The form diagram
+    cases : list or array
+        The load cases.
+        Either a list of dicts with (any of) the following items:
+
+        * ``'p'``: the (n x 3) externally applied loads, defaults to the loads of the form diagram,
+        * ``'density'``: the density for the computation of the self-weight, defaults to ``density``,
+        * ``'live'``: the live load per unit area, defaults to ``0.0``.
+
+        Or a stack of externally applied loads, as a (c x n x 3) array,
+        with the self-weight computed using ``density``.
+    scale : float
+        The scale of the horizontal forces.
+        Default is ``1.0``.
+    density : float, optional
+        The default density for computation of the self-weight of the thrust network.
+        Default is ``1.0``.
+    kmax : int, optional
+        The maximum number of iterations for computing vertical equilibrium.
+        Default is ``100``.
+    tol : float
+        The stopping criterion.
+        Default is ``0.001``.
+    display : bool
+        Display information about the current iteration.
+        Default is ``True``.
+    arrays : compas_tna.diagrams.TNAArrays, optional
+        A snapshot of the data of the form diagram, as returned by ``form.to_arrays()``.
+        The snapshot itself is not modified.
+        Default is ``None``, in which case a snapshot is made.
+    callback : callable, optional
+        A function to be called after every iteration, with the index of the
+        iteration and a dict with the norms of the residual forces per load case
+        (``'residual'``) and the number of load cases that have not yet converged
+        (``'active'``) as parameters.
+        Default is ``None``.
+
+    Returns
+    -------
+    dict
+        The results per load case, stacked along the first axis,
+        and aligned with the vertex and edge indices of the snapshot.
+
+        * ``'xyz'``: the (c x n x 3) vertex coordinates,
+        * ``'r'``: the (c x n x 3) residual forces,
+        * ``'sw'``: the (c x n x 1) self-weight,
+        * ``'f'``: the (c x m x 1) forces in the edges,
+        * ``'l'``: the (c x m x 1) lengths of the edges,
+        * ``'q'``: the (m x 1) force densities, which are the same for all cases,
+        * ``'residual'``: the (c, ) norms of the residual forces at the free vertices.
+
+    Notes
+    -----
+    The form diagram is not modified.
+    The stiffness matrix of the vertical equilibrium problem is the same for all
+    load cases, and is therefore factorised only once.
+    In every iteration, the heights of all cases that have not yet converged
+    are computed with a single solve with multiple right-hand sides.
+
+    Examples
+    --------
+    .. code-block:: python
+
+        cases = [{'density': 1.0}, {'density': 1.0, 'live': 0.5}, {'p': p_wind}]
+
+        result = vertical_from_q_cases(form, cases, display=False)
+
+        zmax = result['xyz'][:, :, 2].max(axis=1)
+
+    """
+    timer = start_timer('vertical_from_q_cases')
+    if arrays is None:
+        arrays = form.to_arrays()
+    timer('extraction')
+    fixed = arrays.fixed
+    free  = arrays.free
+    thick = arrays.t
+    q     = scale * arrays.q
+    C     = arrays.C
+    # --------------------------------------------------------------------------
+    # load cases
+    # --------------------------------------------------------------------------
+    if isinstance(cases, (list, tuple)):
+        cases = [dict(case) for case in cases]
+    else:
+        cases = [{'p': p} for p in cases]
+    updater = LoadUpdater(form, arrays.p, thickness=thick, density=density)
+    updaters = []
+    for case in cases:
+        p0 = array(case.get('p', arrays.p), dtype=float64).reshape((-1, 3))
+        updaters.append(updater.copy(p0=p0, density=case.get('density', density), live=case.get('live', 0.0)))
+    P0  = array([u.p0 for u in updaters], dtype=float64).reshape((len(cases), -1, 3))
+    P   = P0.copy()
+    XYZ = array([arrays.xyz] * len(cases), dtype=float64).reshape((len(cases), -1, 3))
+    timer('assembly')
+    # --------------------------------------------------------------------------
+    # compute vertical
+    # --------------------------------------------------------------------------
+    A, B, CtQC = arrays.assembler.assemble(q)
+    res = update_z_cases(XYZ, None, C, P, free, fixed, updaters, tol=tol, kmax=kmax,
+                         display=display, callback=callback, timer=timer, laplacians=(A, B, CtQC), ordering=arrays.assembler.ordering())
+    # --------------------------------------------------------------------------
+    # results
+    # --------------------------------------------------------------------------
+    l    = array([normrow(C.dot(xyz)) for xyz in XYZ]).reshape((len(cases), -1, 1))
+    f    = q * l
+    r    = array([CtQC.dot(xyz) for xyz in XYZ]).reshape(XYZ.shape) - P
+    sw   = P[:, :, 2:3] - P0[:, :, 2:3]
+    timer('writeback')
+    timer.stop()
+    return {'xyz': XYZ, 'r': r, 'sw': sw, 'f': f, 'l': l, 'q': q, 'residual': res}
 
 
 # ==============================================================================
@@ -14,22 +14,71 @@ compas_tna.utilities
     parallelise
     parallelise_sparse
     parallelise_nodal
+    NodalParalleliser
     rot90
     apply_bounds
+    angle_deviations
     update_z
+    update_z_cases
     update_q_from_qind
+    ForceDensityUpdater
+    condest
     distribute_thickness
 
+Linear algebra
+==============
+
+.. autosummary::
+    :toctree: generated/
+    :nosignatures:
+
+    LaplacianAssembler
+    SPDSolver
+    LaplacianSolver
+    laplacian_solver
+    spd_solver
+    fill_report
+    FactorizationCache
+    factorization_cache
+    topology_key
+    matrix_key
+    independent_columns
+
+External processes
+==================
+
+.. autosummary::
+    :toctree: generated/
+    :nosignatures:
+
+    XWorker
+    get_xworker
+
+Instrumentation
+===============
+
+.. autosummary::
+    :toctree: generated/
+    :nosignatures:
+
+    TimingCollector
+    start_timer
 
 """
 from __future__ import absolute_import
 
+from . import linalg
 from . import diagrams
 from . import loads
 from . import thickness
+from . import worker
+from . import timing
 
-__all__ = diagrams.__all__ + loads.__all__ + thickness.__all__
+__all__ = linalg.__all__ + diagrams.__all__ + loads.__all__ + thickness.__all__ + worker.__all__ + timing.__all__
 
+from .linalg import *
 from .diagrams import *
 from .loads import *
 from .thickness import *
+from .worker import *
+from .timing import *
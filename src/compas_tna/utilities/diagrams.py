@@ -8,31 +8,42 @@ try:
     from numpy import array
     from numpy import float64
     from numpy import empty_like
+    from numpy import arctan2
+    from numpy import absolute
+    from numpy import degrees
+    from numpy import zeros
+    from numpy import empty
+    from numpy import isfinite
     from numpy.linalg import cond
+    from numpy.linalg import LinAlgError
 
     from scipy.linalg import cho_factor
     from scipy.linalg import cho_solve
     from scipy.linalg import lstsq
-    from scipy.linalg import solve
     from scipy.linalg import norm
 
-    from scipy.sparse.linalg import factorized
+    from scipy.sparse.linalg import splu
+    from scipy.sparse.linalg import lsqr
+    from scipy.sparse.linalg import onenormest
+    from scipy.sparse.linalg import norm as norm1
+    from scipy.sparse.linalg import LinearOperator
 
 except ImportError:
     if 'ironpython' not in sys.version.lower():
         raise
 
-from compas.numerical import connectivity_matrix
 from compas.numerical import normrow
 from compas.numerical import chofactor
-from compas.numerical import lufactorized
-
-from compas.numerical import dof
-from compas.numerical import rref
-from compas.numerical import nonpivots
 
 from compas.numerical import equilibrium_matrix
 
+from compas_tna.utilities.linalg import laplacian_solver
+from compas_tna.utilities.linalg import matrix_key
+from compas_tna.utilities.linalg import SPDSolver
+from compas_tna.utilities.linalg import spd_solver
+from compas_tna.utilities.linalg import independent_columns
+from compas_tna.utilities.timing import start_timer
+
 
 __author__  = 'Tom Van Mele'
 __email__   = 'vanmelet@ethz.ch'
@@ -44,37 +55,85 @@ __all__ = [
     'parallelise',
     'parallelise_sparse',
     'parallelise_nodal',
+    'NodalParalleliser',
     'rot90',
     'apply_bounds',
+    'angle_deviations',
     'update_z',
+    'update_z_cases',
     'update_q_from_qind',
+    'ForceDensityUpdater',
+    'condest',
 ]
 
 
 EPS = 1 / sys.float_info.epsilon
 
 
-def count_dof(form):
-    k2i   = form.key_index()
-    xyz   = form.xyz()
-    fixed = form.anchors(k2i=k2i)
-    free  = list(set(range(form.number_of_vertices())) - set(fixed))
-    edges = [(k2i[u], k2i[v]) for u, v in form.edges_where({'is_edge': True})]
-    C     = connectivity_matrix(edges)
-    E     = equilibrium_matrix(C, xyz, free)
-    return dof(E)
+def _equilibrium_matrix(form):
+    arrays = form.to_arrays()
+    k_i    = arrays.key_index
+    fixed  = set(k_i[key] for key in form.anchors())
+    free   = [index for index in range(arrays.vcount) if index not in fixed]
+    return equilibrium_matrix(arrays.C, arrays.xyz, free, 'csr')
+
+
+def count_dof(form, algo='qr', tol=None):
+    """Count the degrees of freedom of the equilibrium of a form diagram.
+
+    Parameters
+    ----------
+    form : compas_tna.diagrams.FormDiagram
+        The form diagram.
+    algo : {'qr', 'lu', 'dense', 'sympy'}, optional
+        The algorithm used to determine the rank of the equilibrium matrix.
+        See :func:`compas_tna.utilities.independent_columns`.
+        Default is ``'qr'``.
+    tol : float, optional
+        The tolerance for the rank determination.
+        Default is ``None``, in which case a tolerance relative to the size
+        and the entries of the equilibrium matrix is used.
+
+    Returns
+    -------
+    tuple
+        The column degrees of freedom (the number of independent edges),
+        and the row degrees of freedom (the number of mechanisms).
+
+    """
+    E          = _equilibrium_matrix(form)
+    rank, _, _ = independent_columns(E, tol=tol, algo=algo or 'qr')
+    return E.shape[1] - rank, E.shape[0] - rank
 
 
-def identify_dof(form, **kwargs):
-    algo  = kwargs.get('algo') or 'sympy'
-    k2i   = form.key_index()
-    xyz   = form.xyz()
-    fixed = form.anchors(k2i=k2i)
-    free  = list(set(range(form.number_of_vertices())) - set(fixed))
-    edges = [(k2i[u], k2i[v]) for u, v in form.edges_where({'is_edge': True})]
-    C     = connectivity_matrix(edges)
-    E     = equilibrium_matrix(C, xyz, free)
-    return nonpivots(rref(E, algo=algo))
+def identify_dof(form, algo='qr', tol=None):
+    """Identify the independent edges of a form diagram.
+
+    Parameters
+    ----------
+    form : compas_tna.diagrams.FormDiagram
+        The form diagram.
+    algo : {'qr', 'lu', 'dense', 'sympy'}, optional
+        The algorithm used to identify the independent columns of the equilibrium matrix.
+        ``'sympy'`` computes the exact reduced row echelon form,
+        and is only feasible for small diagrams.
+        See :func:`compas_tna.utilities.independent_columns`.
+        Default is ``'qr'``.
+    tol : float, optional
+        The tolerance for the rank determination.
+        Default is ``None``, in which case a tolerance relative to the size
+        and the entries of the equilibrium matrix is used.
+
+    Returns
+    -------
+    list
+        The indices of the independent edges,
+        in the order of the edges with ``is_edge`` set to ``True``.
+
+    """
+    E = _equilibrium_matrix(form)
+    _, _, ind = independent_columns(E, tol=tol, algo=algo or 'qr')
+    return ind
 
 
 def parallelise(A, B, X, known, k=1, key=None):
@@ -95,22 +154,17 @@ def parallelise(A, B, X, known, k=1, key=None):
     return X
 
 
-def parallelise_sparse(A, B, X, known, k=1, key=None):
-    unknown = list(set(range(X.shape[0])) - set(known))
-    A11 = A[unknown, :][:, unknown]
-    A12 = A[unknown, :][:, known]
-    b = B[unknown] - A12.dot(X[known])
-    if key:
-        solve = lufactorized(A11, key)
-        Y = solve(b)
-    else:
-        solve = factorized(A11)
-        Y = solve(b)
-    X[unknown] = Y
-    return X
+def parallelise_sparse(A, B, X, known, k=1, key=None, cache=None):
+    # the key of the caller only labels the matrix
+    # the content of the matrix is always part of the key of the cached solver
+    # such that different matrices with the same label do not share a solver
+    if key is not None or cache is not None:
+        key = (key, matrix_key(A, known))
+    solver = laplacian_solver(A, known, key, cache=cache)
+    return solver(B, X)
 
 
-def parallelise_nodal(xy, C, targets, i_nbrs, ij_e, fixed=None, kmax=100, lmin=None, lmax=None):
+def parallelise_nodal(xy, C, targets, i_nbrs, ij_e, fixed=None, kmax=100, lmin=None, lmax=None, display=True):
     fixed = fixed or []
     fixed = set(fixed)
 
@@ -118,7 +172,8 @@ def parallelise_nodal(xy, C, targets, i_nbrs, ij_e, fixed=None, kmax=100, lmin=N
 
     for k in range(kmax):
 
-        print(k)
+        if display:
+            print(k)
 
         xy0 = xy.copy()
         uv  = C.dot(xy)
@@ -150,6 +205,87 @@ def parallelise_nodal(xy, C, targets, i_nbrs, ij_e, fixed=None, kmax=100, lmin=N
             xy[j] /= len(nbrs)
 
 
+class NodalParalleliser(object):
+    r"""Vectorised node-per-node parallelisation of the edges of a network
+    with respect to a set of target vectors.
+
+    This is the sparse matrix equivalent of :func:`parallelise_nodal`.
+    Every iteration, every free vertex is moved to the average of the positions
+    proposed by its neighbours, based on the previous positions (Jacobi).
+    For the connectivity matrix :math:`\mathbf{C}`, the vertex degrees
+    :math:`\mathbf{D}`, the target vectors :math:`\mathbf{t}` and the (bounded)
+    edge lengths :math:`\mathbf{l}`, this update is
+
+    .. math::
+
+        \mathbf{xy} \leftarrow \mathbf{xy} + \mathbf{D}^{-1} \mathbf{C}^{T} (\mathbf{l} \mathbf{t} - \mathbf{C} \mathbf{xy})
+
+    Parameters
+    ----------
+    C : sparse matrix
+        The (m x n) connectivity matrix.
+    fixed : list, optional
+        The indices of the fixed vertices.
+
+    Notes
+    -----
+    The degree of a vertex is the number of rows of ``C`` in which it appears.
+    The reference implementation divides by the number of neighbours of a vertex
+    in the diagram instead, which also counts neighbours across edges that are
+    not part of ``C``. For vertices without such neighbours, the results are
+    the same.
+
+    Examples
+    --------
+    .. code-block:: python
+
+        parallelise = NodalParalleliser(C, fixed=fixed)
+        parallelise(xy, targets, kmax=100, lmin=lmin, lmax=lmax)
+
+    """
+
+    def __init__(self, C, fixed=None):
+        self.C   = C.tocsr()
+        self.Ct  = self.C.transpose().tocsr()
+        degree   = array(absolute(self.C).sum(axis=0), dtype=float64).ravel()
+        free     = degree > 0
+        free[list(fixed or [])] = False
+        inverse  = zeros((degree.shape[0], 1))
+        inverse[free, 0] = 1.0 / degree[free]
+        self.inverse_degree = inverse
+
+    def __call__(self, xy, targets, kmax=100, lmin=None, lmax=None):
+        """Parallelise the edges of the network, in-place.
+
+        Parameters
+        ----------
+        xy : array
+            The (n x 2) vertex coordinates.
+        targets : array
+            The (m x 2) target vectors.
+        kmax : int, optional
+            The number of iterations.
+            Default is ``100``.
+        lmin : array, optional
+            The (m x 1) lower bounds on the edge lengths.
+        lmax : array, optional
+            The (m x 1) upper bounds on the edge lengths.
+
+        Returns
+        -------
+        array
+            The updated coordinates.
+
+        """
+        for k in range(kmax):
+            uv = self.C.dot(xy)
+            l  = normrow(uv)
+            if lmin is not None and lmax is not None:
+                apply_bounds(l, lmin, lmax)
+            xy += self.inverse_degree * self.Ct.dot(l * targets - uv)
+        return xy
+
+
 def rot90(xy, zdir=1.0):
     temp = empty_like(xy)
     temp[:, 0] = - zdir * xy[:, 1]
@@ -164,32 +300,510 @@ def apply_bounds(x, xmin, xmax):
     x[xbig]   = xmax[xbig]
 
 
-def update_z(xyz, Q, C, p, free, fixed, updateloads, tol=1e-3, kmax=100, display=True):
-    Ci      = C[:, free]
-    Cf      = C[:, fixed]
-    Ct      = C.transpose()
-    Cit     = Ci.transpose()
-    A       = Cit.dot(Q).dot(Ci)
-    A_solve = factorized(A)
-    B       = Cit.dot(Q).dot(Cf)
-    CtQC    = Ct.dot(Q).dot(C)
+def angle_deviations(uv, _uv, deg=True):
+    """Compute the angles between corresponding rows of two sets of 2D vectors.
+
+    Parameters
+    ----------
+    uv : array
+        The (m x 2) edge vectors of the form diagram.
+    _uv : array
+        The (m x 2) edge vectors of the force diagram, rotated to be parallel
+        to the corresponding edges of the form diagram.
+    deg : bool, optional
+        Return the angles in degrees.
+        Default is ``True``.
+
+    Returns
+    -------
+    array
+        The (m, ) angle deviations.
+
+    Notes
+    -----
+    This is the vectorised equivalent of ``angle_vectors_xy``.
+    Like that function, it does not account for flipped edges.
+
+    """
+    dot   = uv[:, 0] * _uv[:, 0] + uv[:, 1] * _uv[:, 1]
+    cross = uv[:, 0] * _uv[:, 1] - uv[:, 1] * _uv[:, 0]
+    a     = arctan2(absolute(cross), dot)
+    if deg:
+        return degrees(a)
+    return a
+
+
+def _laplacians(Q, C, free, fixed):
+    Ci  = C[:, free]
+    Cf  = C[:, fixed]
+    Ct  = C.transpose()
+    Cit = Ci.transpose()
+    return Cit.dot(Q).dot(Ci), Cit.dot(Q).dot(Cf), Ct.dot(Q).dot(C)
+
+
+def update_z(xyz, Q, C, p, free, fixed, updateloads, tol=1e-3, kmax=100, display=True, callback=None, timer=None, algo='fixed', m=5, laplacians=None,
+             iterations=False, ordering='mmd', cache=None):
+    """Update the heights of the vertices of a thrust network.
+
+    Parameters
+    ----------
+    xyz : array
+        The (n x 3) vertex coordinates.
+        The heights of the free vertices are modified in-place.
+    Q : sparse matrix
+        The (m x m) diagonal matrix of force densities.
+        Ignored if ``laplacians`` is provided.
+    C : sparse matrix
+        The (m x n) connectivity matrix.
+    p : array
+        The (n x 3) loads.
+        The vertical components are modified in-place.
+    free : list
+        The indices of the free vertices.
+    fixed : list
+        The indices of the fixed vertices.
+    updateloads : callable
+        A callable for updating the loads.
+        With ``algo='newton'``, the callable should also provide the derivatives
+        of the loads through a ``jacobian`` method, like :class:`LoadUpdater`.
+    tol : float, optional
+        The stopping criterion.
+        Default is ``1e-3``.
+    kmax : int, optional
+        The maximum number of iterations.
+        Default is ``100``.
+    display : bool, optional
+        Display information about the current iteration.
+        Default is ``True``.
+    callback : callable, optional
+        A function to be called after every iteration, with the index of the
+        iteration and a dict with the norm of the residual forces at the free
+        vertices (``'residual'``) as parameters.
+        With ``algo='newton'``, the dict also contains the length of the
+        step along the Newton direction (``'step'``).
+        Default is ``None``.
+    timer : callable, optional
+        The timer of the calling solver, as returned by :func:`start_timer`.
+        Default is ``None``, in which case the call is timed separately.
+    algo : {'fixed', 'anderson', 'newton'}, optional
+        The iteration scheme.
+        ``'fixed'`` alternates solving for the heights and updating the self-weight.
+        ``'anderson'`` accelerates these fixed-point iterations with Anderson mixing.
+        ``'newton'`` solves the coupled problem with Newton's method.
+        Default is ``'fixed'``.
+    m : int, optional
+        The number of previous iterations used for Anderson mixing.
+        Default is ``5``.
+    laplacians : tuple, optional
+        The matrices ``Cit Q Ci``, ``Cit Q Cf`` and ``Ct Q C``,
+        for example assembled with :class:`LaplacianAssembler`.
+        Default is ``None``, in which case they are computed from ``Q`` and ``C``.
+    iterations : bool, optional
+        If True, the number of iterations is returned as well.
+        Default is ``False``.
+    ordering : str or array, optional
+        The fill-reducing ordering for the factorisation of ``Cit Q Ci``, see :class:`SPDSolver`,
+        for example the one of :meth:`LaplacianAssembler.ordering`, which is computed only once per topology.
+        Default is ``'mmd'``.
+    cache : FactorizationCache, optional
+        The cache of the factorisation of ``Cit Q Ci``, see :func:`spd_solver`.
+        Not used with ``algo='newton'``.
+        Default is ``None``, in which case the matrix is factorised for this call only.
+
+    Returns
+    -------
+    float
+        The norm of the residual forces at the free vertices.
+    int
+        The number of iterations.
+        Only if ``iterations`` is True.
+
+    Notes
+    -----
+    With Anderson mixing, the next heights are the combination of the results
+    of the last ``m`` fixed-point iterations that minimises the linearised
+    fixed-point residual. If a mixed step increases the residual forces, the
+    history is discarded and the plain fixed-point step is taken instead.
+
+    Newton's method accounts for the dependency of the self-weight on the heights,
+    through the derivatives of the tributary areas, and therefore converges
+    quadratically near the solution. The steps are shortened with a backtracking
+    line search until they sufficiently reduce the residual forces.
+    Every iteration factorises the (non-symmetric) Jacobian.
+
+    """
+    res, k = _update_z(xyz, Q, C, p, free, fixed, updateloads, tol, kmax, display, callback, timer, algo, m, laplacians, ordering, cache)
+    if iterations:
+        return res, k
+    return res
+
+
+class _AndersonMixer(object):
+    # anderson mixing (type II) for the fixed-point iteration z = g(z)
+
+    def __init__(self, m):
+        self.m = m
+        self.reset()
+
+    def reset(self):
+        self.dF = []
+        self.dG = []
+        self.f  = None
+        self.g  = None
+
+    def __call__(self, z, g):
+        f = g - z
+        if self.f is not None:
+            self.dF.append(f - self.f)
+            self.dG.append(g - self.g)
+            if len(self.dF) > self.m:
+                del self.dF[0]
+                del self.dG[0]
+        self.f = f
+        self.g = g
+        if not self.dF:
+            return g
+        dF = array(self.dF).T
+        dG = array(self.dG).T
+        try:
+            gamma = lstsq(dF, f)[0]
+        except (ValueError, LinAlgError):
+            self.reset()
+            return g
+        if not isfinite(gamma).all():
+            self.reset()
+            return g
+        return g - dG.dot(gamma)
+
+
+def _update_z(xyz, Q, C, p, free, fixed, updateloads, tol=1e-3, kmax=100, display=True, callback=None, timer=None, algo='fixed', m=5, laplacians=None, ordering='mmd',
+              cache=None):
+    # returns the norm of the residual forces and the number of iterations
+    if algo not in ('fixed', 'anderson', 'newton'):
+        raise ValueError('Unknown algorithm: {}'.format(algo))
+    if algo == 'newton' and not hasattr(updateloads, 'jacobian'):
+        raise ValueError('Newton iterations require a load updater with a jacobian.')
+    own = timer is None
+    if own:
+        timer = start_timer('update_z')
+    A, B, CtQC = laplacians or _laplacians(Q, C, free, fixed)
+    timer('assembly')
+
+    if algo == 'newton':
+        res, k = _newton_z(xyz, A, CtQC, p, free, updateloads, tol, kmax, display, callback, timer)
+        if own:
+            timer.stop()
+        return res, k
+
+    A_solve = spd_solver(A, ordering=ordering, cache=cache)
+    timer('factorization')
 
     updateloads(p, xyz)
+    timer('loads')
+
+    mix = _AndersonMixer(m) if algo == 'anderson' else None
+    res = float('inf')
+    k   = -1
 
     for k in range(kmax):
         if display:
             print(k)
 
-        xyz[free, 2] = A_solve(p[free, 2] - B.dot(xyz[fixed, 2]))
+        g = A_solve(p[free, 2] - B.dot(xyz[fixed, 2]), xyz[free, 2])
+        z = g if mix is None else mix(xyz[free, 2], g)
+        xyz[free, 2] = z
+        timer('solves')
 
         updateloads(p, xyz)
+        timer('loads')
+
+        r    = CtQC.dot(xyz[:, 2]) - p[:, 2]
+        res0 = res
+        res  = norm(r[free])
+        timer('residuals')
+
+        if mix is not None and z is not g and not res <= res0:
+            # safeguard
+            # discard the history and take the plain fixed-point step
+            mix.reset()
+            xyz[free, 2] = g
+            updateloads(p, xyz)
+            r   = CtQC.dot(xyz[:, 2]) - p[:, 2]
+            res = norm(r[free])
+            timer('residuals')
+
+        if callback:
+            callback(k, {'residual': res})
 
-        r   = CtQC.dot(xyz[:, 2]) - p[:, 2]
-        res = norm(r[free])
+        if res < tol:
+            break
+
+    if own:
+        timer.stop()
+    return res, k + 1
+
+
+def _newton_z(xyz, A, CtQC, p, free, updateloads, tol, kmax, display, callback, timer, c=1e-4, smin=1e-3):
+    # newton iterations on the residual forces at the free vertices
+    # r(z) = Cit Q C z - p(z)
+    # with a backtracking line search on the norm of the residual
+    updateloads(p, xyz)
+    timer('loads')
+    r   = CtQC.dot(xyz[:, 2]) - p[:, 2]
+    res = norm(r[free])
+    timer('residuals')
+    k   = -1
+
+    for k in range(kmax):
+        if display:
+            print(k)
+
+        P = updateloads.jacobian(xyz)[free][:, free]
+        J = (A - P).tocsc()
+        timer('assembly')
+        lu = splu(J)
+        timer('factorization')
+        dz = lu.solve(- r[free])
+        timer('solves')
+
+        z0   = xyz[free, 2].copy()
+        res0 = res
+        s    = 1.0
+        while True:
+            xyz[free, 2] = z0 + s * dz
+            updateloads(p, xyz)
+            r   = CtQC.dot(xyz[:, 2]) - p[:, 2]
+            res = norm(r[free])
+            if res <= (1.0 - c * s) * res0 or s <= smin:
+                break
+            s *= 0.5
+        timer('residuals')
+
+        if callback:
+            callback(k, {'residual': res, 'step': s})
 
         if res < tol:
             break
 
+    return res, k + 1
+
+
+class ForceDensityUpdater(object):
+    """Updater of the force densities of the dependent edges from the values of the independent edges.
+
+    Parameters
+    ----------
+    E : sparse matrix
+        The equilibrium matrix.
+    dep : list
+        The indices of the dependent edges.
+    ind : list
+        The indices of the independent edges.
+
+    Notes
+    -----
+    The (normal equations of the) dependent block of the equilibrium matrix are
+    factorised only once, with a sparse LU decomposition.
+    The condition number of the factorised matrix is estimated from the 1-norms of
+    the matrix and its inverse, rather than computed from a full SVD.
+    If the factorisation fails, or the estimate indicates that the block is
+    (numerically) rank deficient, a sparse least-squares solver is used instead.
+
+    The updater can be reused for as long as the geometry of the form diagram
+    and the selection of independent edges do not change.
+
+    Examples
+    --------
+    .. code-block:: python
+
+        update_q = ForceDensityUpdater(E, dep, ind)
+
+        q[ind] = 2.0
+        update_q(q)
+
+    """
+
+    def __init__(self, E, dep, ind):
+        E         = E.tocsc()
+        self.dep  = list(dep)
+        self.ind  = list(ind)
+        self.Ed   = E[:, self.dep]
+        self.Ei   = E[:, self.ind]
+        self.lu   = None
+        self.cond = None
+        if E.shape[0] > len(self.dep):
+            Edt    = self.Ed.transpose().tocsr()
+            self.A = Edt.dot(self.Ed).tocsc()
+            self.B = Edt.dot(self.Ei)
+        else:
+            self.A = self.Ed
+            self.B = self.Ei
+        if self.A.shape[0] != self.A.shape[1]:
+            return
+        try:
+            lu = splu(self.A)
+        except RuntimeError:
+            return
+        self.cond = condest(self.A, lu)
+        if self.cond < EPS:
+            self.lu = lu
+
+    def __call__(self, q):
+        """Update the force densities of the dependent edges, in-place.
+
+        Parameters
+        ----------
+        q : array
+            The force densities of the edges.
+
+        Returns
+        -------
+        array
+            The updated ``q``.
+
+        """
+        qi = q[self.ind]
+        if self.lu is not None:
+            b  = self.B.dot(qi)
+            qd = - self.lu.solve(b.reshape((b.shape[0], -1)))
+        else:
+            b  = self.Ei.dot(qi).reshape((self.Ei.shape[0], -1))
+            qd = empty((len(self.dep), b.shape[1]))
+            for j in range(b.shape[1]):
+                qd[:, j] = - lsqr(self.Ed, b[:, j], atol=1e-12, btol=1e-12)[0]
+        q[self.dep] = qd.reshape(q[self.dep].shape)
+        return q
+
+
+def condest(A, lu=None):
+    """Estimate the 1-norm condition number of a square sparse matrix.
+
+    Parameters
+    ----------
+    A : sparse matrix
+        The matrix.
+    lu : SuperLU, optional
+        The LU decomposition of ``A``, as returned by ``scipy.sparse.linalg.splu``.
+        Default is ``None``, in which case the decomposition is computed.
+
+    Returns
+    -------
+    float
+        The estimate of the condition number.
+
+    Notes
+    -----
+    The 1-norm of the inverse is estimated with a few solves using the factorisation,
+    without forming the inverse explicitly.
+
+    """
+    if lu is None:
+        lu = splu(A.tocsc())
+    n    = A.shape[0]
+    Ainv = LinearOperator((n, n),
+                          matvec=lambda x: lu.solve(x),
+                          rmatvec=lambda x: lu.solve(x, trans='T'),
+                          dtype=float64)
+    return norm1(A) * onenormest(Ainv)
+
+
+def update_z_cases(XYZ, Q, C, P, free, fixed, updateloads, tol=1e-3, kmax=100, display=True, callback=None, timer=None, laplacians=None, ordering='mmd'):
+    """Update the heights of the vertices of a thrust network for multiple load cases simultaneously.
+
+    Parameters
+    ----------
+    XYZ : array
+        The (c x n x 3) vertex coordinates per load case.
+        The heights of the free vertices are modified in-place.
+    Q : sparse matrix
+        The (m x m) diagonal matrix of force densities.
+        Ignored if ``laplacians`` is provided.
+    C : sparse matrix
+        The (m x n) connectivity matrix.
+    P : array
+        The (c x n x 3) loads per load case.
+        The vertical components are modified in-place.
+    free : list
+        The indices of the free vertices.
+    fixed : list
+        The indices of the fixed vertices.
+    updateloads : list
+        A callable for updating the loads, per load case.
+    tol : float, optional
+        The stopping criterion, per load case.
+        Default is ``1e-3``.
+    kmax : int, optional
+        The maximum number of iterations.
+        Default is ``100``.
+    display : bool, optional
+        Display information about the current iteration.
+        Default is ``True``.
+    callback : callable, optional
+        A function to be called after every iteration, with the index of the
+        iteration and a dict with the norms of the residual forces per load case
+        (``'residual'``) and the number of load cases that have not yet converged
+        (``'active'``) as parameters.
+        Default is ``None``.
+    timer : callable, optional
+        The timer of the calling solver, as returned by :func:`start_timer`.
+        Default is ``None``, in which case the call is timed separately.
+    laplacians : tuple, optional
+        The matrices ``Cit Q Ci``, ``Cit Q Cf`` and ``Ct Q C``,
+        for example assembled with :class:`LaplacianAssembler`.
+        Default is ``None``, in which case they are computed from ``Q`` and ``C``.
+    ordering : str or array, optional
+        The fill-reducing ordering for the factorisation of ``Cit Q Ci``, see :class:`SPDSolver`,
+        for example the one of :meth:`LaplacianAssembler.ordering`, which is computed only once per topology.
+        Default is ``'mmd'``.
+
+    Returns
+    -------
+    array
+        The (c, ) norms of the residual forces at the free vertices.
+
+    """
+    own = timer is None
+    if own:
+        timer = start_timer('update_z_cases')
+    A, B, CtQC = laplacians or _laplacians(Q, C, free, fixed)
+    timer('assembly')
+    A_solve = SPDSolver(A, ordering=ordering)
+    timer('factorization')
+
+    res    = zeros(XYZ.shape[0])
+    active = list(range(XYZ.shape[0]))
+
+    for i in active:
+        updateloads[i](P[i], XYZ[i])
+    timer('loads')
+
+    for k in range(kmax):
+        if display:
+            print(k)
+
+        b = array([P[i][free, 2] - B.dot(XYZ[i][fixed, 2]) for i in active]).T
+        z = A_solve(b, array([XYZ[i][free, 2] for i in active]).T)
+        timer('solves')
+
+        for j, i in enumerate(active):
+            XYZ[i][free, 2] = z[:, j]
+            updateloads[i](P[i], XYZ[i])
+        timer('loads')
+
+        r = CtQC.dot(XYZ[active, :, 2].T) - P[active, :, 2].T
+        res[active] = norm(r[free], axis=0)
+
+        active = [i for i in active if res[i] >= tol]
+        timer('residuals')
+
+        if callback:
+            callback(k, {'residual': res.copy(), 'active': len(active)})
+
+        if not active:
+            break
+
+    if own:
+        timer.stop()
     return res
 
 
@@ -212,6 +826,11 @@ def update_q_from_qind(E, q, dep, ind):
     None
         The force densities are modified in-place.
 
+    Notes
+    -----
+    To update the force densities repeatedly for the same equilibrium matrix,
+    use a :class:`ForceDensityUpdater` directly.
+
     Examples
     --------
     .. code-block:: python
@@ -219,23 +838,7 @@ def update_q_from_qind(E, q, dep, ind):
         #
 
     """
-    m  = E.shape[0] - len(dep)
-    qi = q[ind]
-    Ei = E[:, ind]
-    Ed = E[:, dep]
-    if m > 0:
-        Edt = Ed.transpose()
-        A = Edt.dot(Ed).toarray()
-        b = Edt.dot(Ei).dot(qi)
-    else:
-        A = Ed.toarray()
-        b = Ei.dot(qi)
-    if cond(A) > EPS:
-        res = lstsq(-A, b)
-        qd = res[0]
-    else:
-        qd = solve(-A, b)
-    q[dep] = qd
+    ForceDensityUpdater(E, dep, ind)(q)
 
 
 # ==============================================================================
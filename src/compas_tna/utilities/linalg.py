@@ -0,0 +1,984 @@
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import division
+
+import sys
+import hashlib
+import threading
+import warnings
+
+from collections import OrderedDict
+from heapq import heapify
+from heapq import heappush
+from heapq import heappop
+
+try:
+    from numpy import array
+    from numpy import int64
+    from numpy import absolute
+    from numpy import finfo
+    from numpy import asarray
+    from numpy import empty
+    from numpy import arange
+    from numpy import repeat
+    from numpy import cumsum
+    from numpy import concatenate
+    from numpy import bincount
+    from numpy import unique
+    from numpy import full
+    from numpy import diff
+    from numpy import argsort
+
+    from scipy.linalg import qr
+    from scipy.sparse import issparse
+    from scipy.sparse import diags
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.linalg import splu
+    from scipy.sparse.linalg import cg
+    from scipy.sparse.csgraph import reverse_cuthill_mckee
+
+except ImportError:
+    if 'ironpython' not in sys.version.lower():
+        raise
+
+try:
+    import sparseqr
+except ImportError:
+    sparseqr = None
+
+try:
+    import pyamg
+except ImportError:
+    pyamg = None
+
+
+__author__  = 'Tom Van Mele'
+__email__   = 'vanmelet@ethz.ch'
+
+
+__all__ = [
+    'LaplacianAssembler',
+    'SPDSolver',
+    'LaplacianSolver',
+    'laplacian_solver',
+    'spd_solver',
+    'fill_report',
+    'FactorizationCache',
+    'factorization_cache',
+    'topology_key',
+    'matrix_key',
+    'independent_columns',
+]
+
+
+ITERATIVE_THRESHOLD = 100000
+
+FACTORIZATION_BUDGET = 256 * 1024 * 1024
+
+# column permutation of superlu per ordering
+# with the symmetric orderings the diagonal is used as pivot
+ORDERINGS = {
+    'natural': 'NATURAL',
+    'colamd' : 'COLAMD',
+    'mmd'    : 'MMD_AT_PLUS_A',
+    'rcm'    : 'NATURAL',
+}
+
+
+def topology_key(edges, known, n):
+    """Construct a hashable key identifying a connectivity pattern and a set of known vertices.
+
+    Parameters
+    ----------
+    edges : list
+        The edges of the network as pairs of vertex indices.
+    known : list
+        The indices of the known (fixed) vertices.
+    n : int
+        The number of vertices.
+
+    Returns
+    -------
+    tuple
+        The number of vertices, and a digest of the edges and the known vertices.
+
+    """
+    h = hashlib.sha1()
+    h.update(array(edges, dtype=int64).tobytes())
+    h.update(b'|')
+    h.update(array(sorted(known), dtype=int64).tobytes())
+    return n, h.hexdigest()
+
+
+def matrix_key(A, known):
+    """Construct a hashable key identifying the content of a sparse matrix and a set of known vertices.
+
+    Parameters
+    ----------
+    A : sparse matrix
+        The matrix.
+    known : list
+        The indices of the known (fixed) vertices.
+
+    Returns
+    -------
+    tuple
+        The shape of the matrix, and a digest of its sparsity pattern, its values, and the known vertices.
+
+    """
+    A = A.tocsr()
+    if not A.has_canonical_format:
+        A = A.copy()
+        A.sum_duplicates()
+    h = hashlib.sha1()
+    h.update(A.indptr.astype(int64).tobytes())
+    h.update(b'|')
+    h.update(A.indices.astype(int64).tobytes())
+    h.update(b'|')
+    h.update(A.data.astype(float).tobytes())
+    h.update(b'|')
+    h.update(array(sorted(known), dtype=int64).tobytes())
+    return A.shape, h.hexdigest()
+
+
+def _nbytes(M):
+    if M is None:
+        return 0
+    if hasattr(M, 'indptr'):
+        return M.data.nbytes + M.indices.nbytes + M.indptr.nbytes
+    return getattr(M, 'nbytes', 0)
+
+
+class FactorizationCache(object):
+    """Thread-safe cache of factorised solvers, with least-recently-used eviction
+    under a memory budget.
+
+    Parameters
+    ----------
+    budget : int, optional
+        The maximum (estimated) number of bytes of the cached solvers.
+        Default is ``FACTORIZATION_BUDGET``.
+
+    Attributes
+    ----------
+    hits : int
+        The number of lookups that found a cached solver.
+    misses : int
+        The number of lookups that had to construct a solver.
+
+    Notes
+    -----
+    The solvers are constructed outside the lock, such that lookups from
+    other threads are not blocked by a factorisation. If two threads construct
+    a solver for the same key at the same time, the first one is kept.
+    A solver that is larger than the budget is returned, but not cached.
+
+    Examples
+    --------
+    .. code-block:: python
+
+        cache = FactorizationCache(budget=64 * 1024 * 1024)
+
+        solve = laplacian_solver(CtC, fixed, cache=cache)
+
+    """
+
+    def __init__(self, budget=FACTORIZATION_BUDGET):
+        self.budget  = budget
+        self.hits    = 0
+        self.misses  = 0
+        self._items  = OrderedDict()
+        self._nbytes = 0
+        self._lock   = threading.Lock()
+
+    def __getstate__(self):
+        # the solvers and the lock are not copied
+        return {'budget': self.budget}
+
+    def __setstate__(self, state):
+        self.__init__(state['budget'])
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    @property
+    def nbytes(self):
+        """int : The (estimated) number of bytes of the cached solvers."""
+        return self._nbytes
+
+    def get(self, key, factory):
+        """Get the solver stored under a key, or construct and store it.
+
+        Parameters
+        ----------
+        key : hashable
+            The key.
+        factory : callable
+            A function without parameters constructing the solver.
+            The solver should have an attribute ``nbytes``.
+
+        Returns
+        -------
+        object
+            The solver.
+
+        """
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None:
+                self._items[key] = self._items.pop(key)
+                self.hits += 1
+                return item[0]
+            self.misses += 1
+        solver = factory()
+        nbytes = getattr(solver, 'nbytes', 0)
+        if nbytes > self.budget:
+            return solver
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None:
+                return item[0]
+            self._items[key] = solver, nbytes
+            self._nbytes += nbytes
+            while self._nbytes > self.budget:
+                _, (_, size) = self._items.popitem(last=False)
+                self._nbytes -= size
+        return solver
+
+    def clear(self):
+        """Remove all solvers from the cache."""
+        with self._lock:
+            self._items.clear()
+            self._nbytes = 0
+
+
+_CACHE = FactorizationCache()
+
+_CACHE_LOCK = threading.Lock()
+
+
+def factorization_cache(diagram=None):
+    """Get the factorisation cache of a diagram, or the cache of the current process.
+
+    Parameters
+    ----------
+    diagram : compas_tna.diagrams.FormDiagram, optional
+        The diagram.
+        Default is ``None``, in which case the cache shared by the entire process is returned.
+
+    Returns
+    -------
+    FactorizationCache
+        The cache.
+
+    Notes
+    -----
+    The cache of a diagram is created on first use, and is discarded together with the diagram.
+    It is not part of the data of the diagram.
+
+    """
+    if diagram is None:
+        return _CACHE
+    cache = getattr(diagram, '_tna_factorizations', None)
+    if cache is None:
+        with _CACHE_LOCK:
+            cache = getattr(diagram, '_tna_factorizations', None)
+            if cache is None:
+                cache = diagram._tna_factorizations = FactorizationCache()
+    return cache
+
+
+class _Pattern(object):
+    # the sparsity pattern of a matrix assembled from contributions of the edges
+    # and, per contribution, the slot in the data array, the edge, and the coefficient
+
+    def __init__(self, rows, cols, edge, coef, shape):
+        keys, slot   = unique(rows * shape[1] + cols, return_inverse=True)
+        self.shape   = shape
+        self.indices = keys % shape[1]
+        self.indptr  = concatenate(([0], cumsum(bincount(keys // shape[1], minlength=shape[0]))))
+        self.slot    = slot.ravel()
+        self.edge    = edge
+        self.coef    = coef
+        self.nnz     = keys.shape[0]
+
+    def data(self, q):
+        return bincount(self.slot, weights=self.coef * q[self.edge], minlength=self.nnz)
+
+    def matrix(self, q):
+        return csr_matrix((self.data(q), self.indices, self.indptr), shape=self.shape)
+
+
+class LaplacianAssembler(object):
+    """Assembler of the force density weighted Laplacian of a network,
+    and of its blocks corresponding to the free and fixed vertices.
+
+    The sparsity patterns only depend on the topology. They are computed once,
+    at construction, together with a map from the edges to the non-zero entries,
+    such that for new force densities the matrices are assembled, or updated in-place,
+    with a few vectorised operations instead of a chain of sparse matrix products.
+
+    Parameters
+    ----------
+    C : sparse matrix
+        The (m x n) connectivity matrix.
+    free : list
+        The indices of the free vertices.
+    fixed : list
+        The indices of the fixed vertices.
+
+    Examples
+    --------
+    .. code-block:: python
+
+        assembler = LaplacianAssembler(C, free, fixed)
+
+        # A = Cit Q Ci, B = Cit Q Cf, L = Ct Q C
+        A, B, L = assembler.assemble(q)
+
+        for k in range(kmax):
+            q = ...
+            assembler.update(q, A, B, L)
+
+    """
+
+    def __init__(self, C, free, fixed):
+        C = C.tocsr()
+        m, n   = C.shape
+        counts = diff(C.indptr)
+        row    = repeat(arange(m), counts)
+        # all pairs of non-zeros in the same row of C
+        k      = counts[row]
+        left   = repeat(arange(C.nnz), k)
+        right  = C.indptr[row[left]] + arange(left.shape[0]) - repeat(cumsum(k) - k, k)
+        i      = C.indices[left]
+        j      = C.indices[right]
+        edge   = row[left]
+        coef   = C.data[left] * C.data[right]
+        index  = full(n, -1)
+        index[free] = arange(len(free))
+        _index = full(n, -1)
+        _index[fixed] = arange(len(fixed))
+        a = (index[i] >= 0) & (index[j] >= 0)
+        b = (index[i] >= 0) & (_index[j] >= 0)
+        self.free  = list(free)
+        self.fixed = list(fixed)
+        self._A = _Pattern(index[i[a]], index[j[a]], edge[a], coef[a], (len(free), len(free)))
+        self._B = _Pattern(index[i[b]], _index[j[b]], edge[b], coef[b], (len(free), len(fixed)))
+        self._L = _Pattern(i, j, edge, coef, (n, n))
+        self._m = m
+        self._orderings = {}
+
+    def assemble(self, q):
+        """Assemble the matrices for a set of force densities.
+
+        Parameters
+        ----------
+        q : array
+            The (m x 1) force densities.
+
+        Returns
+        -------
+        tuple
+            The reduced Laplacian of the free vertices ``Cit Q Ci``,
+            the coupling of the free and fixed vertices ``Cit Q Cf``,
+            and the full Laplacian ``Ct Q C``, as CSR matrices.
+            The matrices share their index arrays with the assembler.
+
+        """
+        q = asarray(q, dtype=float).ravel()
+        return self._A.matrix(q), self._B.matrix(q), self._L.matrix(q)
+
+    def update(self, q, A=None, B=None, L=None):
+        """Update matrices assembled by :meth:`assemble` for new force densities, in-place.
+
+        Parameters
+        ----------
+        q : array
+            The (m x 1) force densities.
+        A : sparse matrix, optional
+            The reduced Laplacian of the free vertices.
+        B : sparse matrix, optional
+            The coupling of the free and fixed vertices.
+        L : sparse matrix, optional
+            The full Laplacian.
+
+        """
+        q = asarray(q, dtype=float).ravel()
+        for pattern, M in ((self._A, A), (self._B, B), (self._L, L)):
+            if M is not None:
+                M.data[:] = pattern.data(q)
+
+    def ordering(self, ordering='mmd'):
+        """Get a fill-reducing ordering of the reduced Laplacian of the free vertices.
+
+        The ordering only depends on the sparsity pattern, and is computed only once
+        per assembler, and therefore per topology (see :class:`compas_tna.diagrams.TNAArrays`).
+
+        Parameters
+        ----------
+        ordering : {'mmd', 'rcm', 'natural'}, optional
+            The ordering, see :class:`SPDSolver`.
+            Default is ``'mmd'``.
+
+        Returns
+        -------
+        array or str
+            The permutation of the free vertices, to be passed to :class:`SPDSolver`.
+            ``None`` for the natural ordering.
+            If the number of free vertices exceeds ``ITERATIVE_THRESHOLD``,
+            the systems are solved iteratively by default, and the name of the ordering
+            is returned instead, such that the ordering is only computed if it is needed.
+
+        Examples
+        --------
+        .. code-block:: python
+
+            A, B, L = assembler.assemble(q)
+            solve = SPDSolver(A, ordering=assembler.ordering())
+
+        """
+        if ordering == 'colamd':
+            raise ValueError('The column ordering depends on the pivots of the factorisation and cannot be reused.')
+        if self._A.shape[0] > ITERATIVE_THRESHOLD:
+            return ordering
+        if ordering not in self._orderings:
+            # the ordering only depends on the pattern
+            # unit force densities and a shifted diagonal ensure that the matrix can be factorised
+            A = self._A.matrix(full(self._m, 1.0)) + diags(full(self._A.shape[0], 1.0))
+            self._orderings[ordering] = _ordering(A, ordering)
+        return self._orderings[ordering]
+
+
+def _ordering(A, ordering):
+    # the symmetric permutation corresponding to an ordering, if any
+    # the minimum degree ordering is only available as part of a factorisation
+    if ordering not in ORDERINGS:
+        raise ValueError('Unknown ordering: {}'.format(ordering))
+    if ordering == 'rcm':
+        return reverse_cuthill_mckee(A.tocsr(), symmetric_mode=True)
+    if ordering == 'mmd':
+        lu = splu(A.tocsc(), permc_spec='MMD_AT_PLUS_A', diag_pivot_thresh=0.0, options={'SymmetricMode': True})
+        return argsort(lu.perm_c)
+    return None
+
+
+def _factorize(A, ordering):
+    # returns the factorisation, and the permutation applied before the factorisation, if any
+    # the ordering is either the name of an ordering or a precomputed permutation
+    A = A.tocsc()
+    if ordering is None:
+        ordering = 'natural'
+    if isinstance(ordering, str):
+        if ordering == 'colamd':
+            return splu(A, permc_spec='COLAMD'), None
+        if ordering != 'rcm':
+            if ordering not in ORDERINGS:
+                raise ValueError('Unknown ordering: {}'.format(ordering))
+            return splu(A, permc_spec=ORDERINGS[ordering], diag_pivot_thresh=0.0, options={'SymmetricMode': True}), None
+        perm = _ordering(A, ordering)
+    else:
+        perm = asarray(ordering)
+    A = A[perm, :][:, perm].tocsc()
+    return splu(A, permc_spec='NATURAL', diag_pivot_thresh=0.0, options={'SymmetricMode': True}), perm
+
+
+def _positions(lu, perm):
+    # the position of every row and column of the original matrix in the factors
+    positions = lu.perm_c
+    if perm is not None:
+        positions = positions[argsort(perm)]
+    return positions
+
+
+def _bandwidth(A, positions=None):
+    A = A.tocoo()
+    if not A.nnz:
+        return 0
+    if positions is None:
+        return int(absolute(A.row - A.col).max())
+    return int(absolute(positions[A.row] - positions[A.col]).max())
+
+
+def fill_report(A, known=None, orderings=None):
+    """Compare the fill-in of the factorisation of a symmetric positive definite matrix
+    for different orderings of its rows and columns.
+
+    Parameters
+    ----------
+    A : sparse matrix
+        The (n x n) matrix, for example the Laplacian ``C.transpose().dot(C)``.
+    known : list, optional
+        The indices of the known (fixed) vertices.
+        If provided, the rows and columns of the known vertices are eliminated first,
+        as in :class:`LaplacianSolver`.
+    orderings : list, optional
+        The orderings.
+        Default is ``None``, in which case all of ``ORDERINGS`` are compared.
+
+    Returns
+    -------
+    dict
+        Per ordering, the number of non-zeros of the (reduced) matrix (``'nnz'``),
+        and of the factors (``'factor_nnz'``), the ratio of both (``'fill'``),
+        the bandwidth of the matrix after reordering (``'bandwidth'``),
+        and an estimate of the memory of the factors in bytes (``'nbytes'``).
+
+    Examples
+    --------
+    .. code-block:: python
+
+        arrays = form.to_arrays()
+        report = fill_report(arrays.C.transpose().dot(arrays.C), arrays.fixed)
+
+        for ordering in report:
+            print(ordering, report[ordering]['fill'], report[ordering]['bandwidth'])
+
+    """
+    A = A.tocsr()
+    if known is not None:
+        unknown = sorted(set(range(A.shape[0])) - set(known))
+        A = A[unknown, :][:, unknown]
+    report = {}
+    for ordering in orderings or sorted(ORDERINGS):
+        lu, perm = _factorize(A, ordering)
+        report[ordering] = {
+            'nnz'       : A.nnz,
+            'factor_nnz': lu.nnz,
+            'fill'      : lu.nnz / A.nnz if A.nnz else 0.0,
+            'bandwidth' : _bandwidth(A, _positions(lu, perm)),
+            'nbytes'    : 12 * lu.nnz + 16 * A.shape[0],
+        }
+    return report
+
+
+def _cg(A, b, x0, tol, maxiter, M):
+    # the relative tolerance is called rtol as of scipy 1.12
+    try:
+        return cg(A, b, x0=x0, rtol=tol, atol=0.0, maxiter=maxiter, M=M)
+    except TypeError:
+        return cg(A, b, x0=x0, tol=tol, atol=0.0, maxiter=maxiter, M=M)
+
+
+class SPDSolver(object):
+    """Solver for a sparse, symmetric positive definite system,
+    such as a reduced (weighted) graph Laplacian.
+
+    Small systems are factorised once, at construction.
+    Large systems are solved with the preconditioned conjugate gradient method,
+    which requires memory proportional to the number of non-zeros of the matrix,
+    instead of the (much larger) memory required for the fill-in of the factorisation.
+
+    Parameters
+    ----------
+    A : sparse matrix
+        The (n x n) matrix.
+    method : {'auto', 'direct', 'cg'}, optional
+        The solution method.
+        ``'auto'`` uses ``'cg'`` if the size of the system exceeds ``ITERATIVE_THRESHOLD``,
+        and ``'direct'`` otherwise.
+        Default is ``'auto'``.
+    preconditioner : {'auto', 'amg', 'jacobi', None}, optional
+        The preconditioner of the conjugate gradient method.
+        ``'amg'`` uses a smoothed aggregation algebraic multigrid V-cycle,
+        and requires the optional package ``pyamg``.
+        ``'jacobi'`` uses the inverse of the diagonal.
+        ``'auto'`` uses ``'amg'`` if ``pyamg`` is available, and ``'jacobi'`` otherwise.
+        Default is ``'auto'``.
+    tol : float, optional
+        The relative tolerance of the residual of the conjugate gradient method.
+        Default is ``1e-10``.
+    maxiter : int, optional
+        The maximum number of iterations of the conjugate gradient method.
+        Default is ``None``, in which case the default of ``scipy`` is used.
+    ordering : {'mmd', 'colamd', 'rcm', 'natural'} or array, optional
+        The fill-reducing ordering of the rows and columns for the factorisation.
+        ``'mmd'`` is the minimum degree ordering of ``A + At``,
+        ``'colamd'`` the approximate minimum degree column ordering (the default of ``scipy``),
+        and ``'rcm'`` the reverse Cuthill-McKee ordering, which minimises the bandwidth.
+        With the symmetric orderings, the factorisation does not pivot.
+        A precomputed permutation of a symmetric ordering can be provided as well,
+        for example the one of :meth:`LaplacianAssembler.ordering`, which is computed only once per topology.
+        Default is ``'mmd'``.
+        See :func:`fill_report` for a comparison of the orderings for a specific matrix.
+
+    Attributes
+    ----------
+    method : str
+        The method that is used.
+    info : int
+        The convergence information of the last iterative solve.
+        ``0`` if the solution converged, and the number of iterations otherwise.
+        If the system has several right-hand sides, the information of the first one that did not converge.
+    perm : array
+        The permutation applied to the rows and columns before the factorisation,
+        or ``None``. The solutions are returned in the original order.
+
+    Examples
+    --------
+    .. code-block:: python
+
+        solve = SPDSolver(A)
+
+        for k in range(kmax):
+            x = solve(b, x)
+
+    """
+
+    def __init__(self, A, method='auto', preconditioner='auto', tol=1e-10, maxiter=None, ordering='mmd'):
+        if method == 'auto':
+            method = 'cg' if A.shape[0] > ITERATIVE_THRESHOLD else 'direct'
+        if method not in ('direct', 'cg'):
+            raise ValueError('Unknown method: {}'.format(method))
+        self.method  = method
+        self.tol     = tol
+        self.maxiter = maxiter
+        self.info    = 0
+        if method == 'direct':
+            self.A = None
+            self.M = None
+            self._lu, self.perm = _factorize(A, ordering)
+            self._solve = self._lu.solve
+        else:
+            self._lu = None
+            self.perm = None
+            self.A = A.tocsr()
+            self.M = self._preconditioner(preconditioner)
+            self._solve = None
+
+    @property
+    def nbytes(self):
+        """int : An estimate of the number of bytes of the factors, or of the matrix and the preconditioner."""
+        if self._lu is not None:
+            # values and row indices of the non-zeros, and the permutations
+            return 12 * self._lu.nnz + 16 * self._lu.shape[0]
+        return _nbytes(self.A) + _nbytes(self.M)
+
+    def _preconditioner(self, preconditioner):
+        if preconditioner == 'auto':
+            preconditioner = 'amg' if pyamg is not None else 'jacobi'
+        if preconditioner is None:
+            return None
+        if preconditioner == 'jacobi':
+            return diags(1.0 / self.A.diagonal())
+        if preconditioner == 'amg':
+            if pyamg is None:
+                raise ImportError('The AMG preconditioner requires pyamg.')
+            return pyamg.smoothed_aggregation_solver(self.A).aspreconditioner(cycle='V')
+        raise ValueError('Unknown preconditioner: {}'.format(preconditioner))
+
+    def __call__(self, b, x0=None):
+        """Solve the system.
+
+        Parameters
+        ----------
+        b : array
+            The right-hand side, with one or more columns.
+        x0 : array, optional
+            The starting point of the iterative method, for example the previous solution.
+            Default is ``None``.
+            Ignored by the direct method.
+
+        Returns
+        -------
+        array
+            The solution.
+
+        Warns
+        -----
+        UserWarning
+            If the conjugate gradient method does not converge to the tolerance
+            in the maximum number of iterations.
+            The last iterate is returned.
+
+        """
+        if self._solve is not None:
+            if self.perm is None:
+                return self._solve(b)
+            x = empty(b.shape)
+            x[self.perm] = self._solve(b[self.perm])
+            return x
+        b = asarray(b, dtype=float)
+        if b.ndim == 1:
+            x, self.info = _cg(self.A, b, x0, self.tol, self.maxiter, self.M)
+        else:
+            x = empty(b.shape)
+            info = 0
+            for j in range(b.shape[1]):
+                x[:, j], info_j = _cg(self.A, b[:, j], None if x0 is None else x0[:, j], self.tol, self.maxiter, self.M)
+                info = info or info_j
+            self.info = info
+        if self.info > 0:
+            warnings.warn('The conjugate gradient method did not converge to a relative tolerance of {0} in {1} iterations.'.format(self.tol, self.info))
+        elif self.info < 0:
+            warnings.warn('The conjugate gradient method broke down. The matrix may not be positive definite.')
+        return x
+
+
+class LaplacianSolver(object):
+    """Solver for a system with a graph Laplacian of which the rows and columns
+    corresponding to a set of known vertices are eliminated.
+
+    The reduced Laplacian is sliced and factorised only once, at construction.
+    Above a size threshold, the system is solved iteratively instead (see :class:`SPDSolver`),
+    starting from the current values of the unknowns.
+
+    Parameters
+    ----------
+    A : sparse matrix
+        The (n x n) Laplacian, for example ``C.transpose().dot(C)``.
+    known : list
+        The indices of the known (fixed) vertices.
+    method : {'auto', 'direct', 'cg'}, optional
+        The solution method of the reduced system.
+        Default is ``'auto'``.
+    preconditioner : {'auto', 'amg', 'jacobi', None}, optional
+        The preconditioner of the iterative method.
+        Default is ``'auto'``.
+
+    Examples
+    --------
+    .. code-block:: python
+
+        solve = LaplacianSolver(CtC, fixed)
+
+        for k in range(kmax):
+            xy = solve(Ct.dot(l * t), xy)
+
+    """
+
+    def __init__(self, A, known, method='auto', preconditioner='auto'):
+        n = A.shape[0]
+        self.known   = list(known)
+        self.unknown = list(set(range(n)) - set(self.known))
+        A1           = A.tocsr()[self.unknown, :]
+        self.A11     = A1[:, self.unknown].tocsc()
+        self.A12     = A1[:, self.known]
+        self.solve   = SPDSolver(self.A11, method=method, preconditioner=preconditioner)
+
+    @property
+    def nbytes(self):
+        """int : An estimate of the number of bytes of the solver."""
+        return _nbytes(self.A11) + _nbytes(self.A12) + self.solve.nbytes
+
+    def __call__(self, B, X):
+        """Solve for the unknowns of ``X``, in-place.
+
+        Parameters
+        ----------
+        B : array
+            The (n x d) right-hand side.
+        X : array
+            The (n x d) solution, with the known values in the rows of the known vertices.
+            The values of the unknowns are the starting point of the iterative method.
+
+        Returns
+        -------
+        array
+            The updated ``X``.
+
+        """
+        b = B[self.unknown] - self.A12.dot(X[self.known])
+        X[self.unknown] = self.solve(b, X[self.unknown])
+        return X
+
+
+def laplacian_solver(A, known, key=None, method='auto', cache=None):
+    """Get a solver for the reduced Laplacian, from a cache if possible.
+
+    Parameters
+    ----------
+    A : sparse matrix
+        The (n x n) Laplacian.
+    known : list
+        The indices of the known (fixed) vertices.
+    key : hashable, optional
+        Identifier of ``A`` and ``known``, for example constructed with :func:`topology_key`.
+        Default is ``None``, in which case the content of ``A`` and ``known``
+        is used (see :func:`matrix_key`).
+    method : {'auto', 'direct', 'cg'}, optional
+        The solution method of the reduced system, see :class:`SPDSolver`.
+        Default is ``'auto'``.
+    cache : FactorizationCache, optional
+        The cache, for example the cache of a diagram (see :func:`factorization_cache`).
+        Default is ``None``, in which case the cache of the process is used if a ``key``
+        is provided, and a new solver is constructed otherwise.
+
+    Returns
+    -------
+    LaplacianSolver
+
+    """
+    if key is None and cache is None:
+        return LaplacianSolver(A, known, method=method)
+    if cache is None:
+        cache = _CACHE
+    if key is None:
+        key = matrix_key(A, known)
+    return cache.get((key, method), lambda: LaplacianSolver(A, known, method=method))
+
+
+def spd_solver(A, ordering='mmd', cache=None):
+    """Get a solver for a sparse, symmetric positive definite matrix, from a cache if possible.
+
+    Parameters
+    ----------
+    A : sparse matrix
+        The (n x n) matrix, for example a reduced force density weighted Laplacian.
+    ordering : str or array, optional
+        The fill-reducing ordering for the factorisation, see :class:`SPDSolver`.
+        Default is ``'mmd'``.
+    cache : FactorizationCache, optional
+        The cache, for example the cache of the process (see :func:`factorization_cache`).
+        Default is ``None``, in which case a new solver is constructed.
+
+    Returns
+    -------
+    SPDSolver
+
+    Notes
+    -----
+    The solvers are cached by the content of the matrix (see :func:`matrix_key`).
+    The ordering only affects the fill-in of the factorisation, and is not part of the key.
+
+    """
+    if cache is None:
+        return SPDSolver(A, ordering=ordering)
+    # the iterative solver keeps a reference to the matrix
+    # which the caller may modify in-place after the solver is cached
+    return cache.get(('spd', matrix_key(A, [])), lambda: SPDSolver(A.copy(), ordering=ordering))
+
+
+def _lu_pivots(A, tol=None):
+    # left-looking sparse lu decomposition with partial pivoting over the rows
+    # the columns are eliminated from left to right with the previous pivot columns
+    # and a column is a pivot column if a nonzero entry remains
+    # the eliminated pivot columns are stored with unit entries in their pivot rows
+    # and have to be applied in order, since their other entries may be in later pivot rows
+    # partial pivoting does not bound the growth of the rounding errors as well as qr
+    # therefore the default tolerance is larger than the one of the qr decompositions
+    A = A.tocsc()
+    m, n = A.shape
+    if tol is None:
+        tol = finfo(float).eps ** 0.5 * (absolute(A.data).max() if A.nnz else 0.0)
+    indptr  = A.indptr.tolist()
+    indices = A.indices.tolist()
+    data    = A.data.tolist()
+    rows    = []
+    columns = []
+    pivot   = {}
+    pivots  = []
+    for j in range(n):
+        col  = dict(zip(indices[indptr[j]:indptr[j + 1]], data[indptr[j]:indptr[j + 1]]))
+        heap = [pivot[i] for i in col if i in pivot]
+        seen = set(heap)
+        heapify(heap)
+        while heap:
+            k = heappop(heap)
+            a = col.pop(rows[k], 0.0)
+            if a == 0.0:
+                continue
+            for i, x in columns[k].items():
+                col[i] = col.get(i, 0.0) - a * x
+                if i in pivot and pivot[i] not in seen:
+                    seen.add(pivot[i])
+                    heappush(heap, pivot[i])
+        col = {i: x for i, x in col.items() if abs(x) > tol}
+        if not col:
+            continue
+        r = max(col, key=lambda i: abs(col[i]))
+        a = col.pop(r)
+        pivot[r] = len(rows)
+        rows.append(r)
+        columns.append({i: x / a for i, x in col.items()})
+        pivots.append(j)
+    return pivots
+
+
+def independent_columns(A, tol=None, algo='qr'):
+    """Identify a maximal set of linearly independent columns of a matrix.
+
+    Parameters
+    ----------
+    A : array or sparse matrix
+        The (m x n) matrix.
+    tol : float, optional
+        Values on the diagonal of the triangular factor (or pivots) with an absolute
+        value below this tolerance are considered zero.
+        Default is ``None``, in which case a tolerance relative to the largest
+        value and the size of the matrix is used.
+    algo : {'qr', 'lu', 'dense', 'sympy'}, optional
+        The algorithm.
+        ``'qr'`` uses a sparse QR decomposition with column pivoting if the
+        optional package ``sparseqr`` (SuiteSparseQR) is available.
+        Otherwise, sparse matrices are handled by ``'lu'`` and dense arrays by ``'dense'``.
+        ``'lu'`` uses a sparse LU decomposition with partial pivoting over the rows.
+        ``'dense'`` always uses a dense QR decomposition with column pivoting.
+        ``'sympy'`` uses the exact reduced row echelon form computed by ``sympy``,
+        which is only feasible for small matrices and intended for verification.
+        Default is ``'qr'``.
+
+    Returns
+    -------
+    tuple
+        The rank, the indices of the independent (pivot) columns,
+        and the indices of the remaining (non-pivot) columns.
+        The lists of indices are sorted.
+
+    Notes
+    -----
+    The QR based algorithms select the independent columns in order of decreasing
+    numerical significance, whereas the LU decomposition and the reduced row echelon
+    form select them from left to right. All result in a valid selection,
+    but not necessarily the same one.
+
+    The dense QR decomposition is cubic in the size of the matrix.
+    The cost of the sparse decompositions depends on the fill-in,
+    which is small for the equilibrium matrices of form diagrams.
+    The sparse QR decomposition is more robust for ill-conditioned matrices.
+
+    The reduced row echelon form of ``sympy`` is computed in floating point arithmetic,
+    and its pivots are not chosen by size. It is only a reliable reference if the entries
+    of the matrix are exact, such as for the equilibrium matrices of orthogonal grids.
+    With the rounding errors of curved geometry, it may overestimate the rank.
+
+    """
+    m, n = A.shape
+    if algo == 'sympy':
+        from sympy import Matrix
+        tol = 1e-12 if tol is None else tol
+        if issparse(A):
+            A = A.toarray()
+        _, pivots = Matrix(A.tolist()).rref(iszerofunc=lambda x: abs(x) < tol)
+        pivots = list(pivots)
+    elif algo == 'lu' or (algo == 'qr' and sparseqr is None and issparse(A)):
+        pivots = _lu_pivots(A if issparse(A) else csr_matrix(A), tol)
+    elif algo in ('qr', 'dense'):
+        if algo == 'qr' and sparseqr is not None and issparse(A):
+            _, _, E, rank = sparseqr.qr(A.tocsc(), tolerance=tol, economy=True)
+            pivots = list(E[:rank])
+        else:
+            if issparse(A):
+                A = A.toarray()
+            R, E = qr(A, mode='r', pivoting=True)
+            d = absolute(R.diagonal())
+            if tol is None:
+                tol = max(m, n) * finfo(float).eps * (d[0] if d.size else 0.0)
+            rank = int((d > tol).sum())
+            pivots = list(E[:rank])
+    else:
+        raise ValueError('Unknown algorithm: {}'.format(algo))
+    pivots    = sorted(int(i) for i in pivots)
+    nonpivots = sorted(set(range(n)) - set(pivots))
+    return len(pivots), pivots, nonpivots
+
+
+# ==============================================================================
+# Main
+# ==============================================================================
+
+if __name__ == '__main__':
+    pass
@@ -4,18 +4,27 @@ from __future__ import division
 
 import sys
 
+from copy import copy
+
 try:
     from numpy import array
     from numpy import zeros
+    from numpy import bincount
+    from numpy import cross
+    from numpy import sqrt
+    from numpy import asarray
+    from numpy import repeat
+    from numpy import arange
+    from numpy import cumsum
+    from numpy import divide
+    from numpy import concatenate
+
+    from scipy.sparse import coo_matrix
 
 except ImportError:
     if 'ironpython' not in sys.version.lower():
         raise
 
-from compas.geometry import centroid_points
-from compas.geometry import length_vector
-from compas.geometry import cross_vectors
-
 from compas.numerical import face_matrix
 
 
@@ -27,7 +36,32 @@ __all__ = ['LoadUpdater']
 
 
 class LoadUpdater(object):
-    """"""
+    """Callable for updating the vertical loads of a thrust network with
+    the self-weight corresponding to the current vertex coordinates.
+
+    The tributary area of a vertex consists of the triangles formed by
+    the vertex, the midpoints of its edges, and the centroids of the adjacent
+    loaded faces. The index arrays describing these triangles are computed
+    once, at construction, such that the areas can be computed with a few
+    vectorised operations for every new set of coordinates.
+
+    Parameters
+    ----------
+    mesh : compas_tna.diagrams.FormDiagram
+        The form diagram.
+    p0 : array
+        The (n x 3) externally applied loads.
+    thickness : float or array, optional
+        The thickness, per vertex as an (n x 1) array, or overall.
+        Default is ``1.0``.
+    density : float, optional
+        The density of the material.
+        Default is ``1.0``.
+    live : float, optional
+        The live load per unit area.
+        Default is ``0.0``.
+
+    """
     def __init__(self, mesh, p0, thickness=1.0, density=1.0, live=0.0):
         self.mesh       = mesh
         self.p0         = p0
@@ -38,47 +72,147 @@ class LoadUpdater(object):
         self.fkey_index = {fkey: index for index, fkey in enumerate(mesh.faces())}
         self.is_loaded  = {fkey: mesh.get_face_attribute(fkey, 'is_loaded') for fkey in mesh.faces()}
         self.F          = self.face_matrix()
+        self.triangles  = self.tributary_triangles()
+        self._expansion = None
 
     def __call__(self, p, xyz):
         ta = self._tributary_areas(xyz)
         sw = ta * self.thickness * self.density + ta * self.live
         p[:, 2] = self.p0[:, 2] + sw[:, 0]
 
+    def copy(self, p0=None, thickness=None, density=None, live=None):
+        """Make a copy of the updater for different load parameters.
+
+        The copy shares the topological data of the original, such that it can be
+        constructed without traversing the diagram again.
+
+        Parameters
+        ----------
+        p0 : array, optional
+            The (n x 3) externally applied loads.
+        thickness : float or array, optional
+            The thickness, per vertex as an (n x 1) array, or overall.
+        density : float, optional
+            The density of the material.
+        live : float, optional
+            The live load per unit area.
+
+        Returns
+        -------
+        LoadUpdater
+            The copy, with the load parameters of the original where no other values are specified.
+
+        """
+        other = copy(self)
+        if p0 is not None:
+            other.p0 = p0
+        if thickness is not None:
+            other.thickness = thickness
+        if density is not None:
+            other.density = density
+        if live is not None:
+            other.live = live
+        return other
+
     def face_matrix(self):
         face_vertices = [None] * self.mesh.number_of_faces()
         for fkey in self.mesh.faces():
             face_vertices[self.fkey_index[fkey]] = [self.key_index[key] for key in self.mesh.face_vertices(fkey)]
         return face_matrix(face_vertices, rtype='csr', normalize=True)
 
-    def _tributary_areas(self, xyz):
+    def tributary_triangles(self):
+        """Identify the triangles contributing to the tributary areas of the vertices.
+
+        Returns
+        -------
+        tuple
+            Three arrays with, per triangle, the index of the vertex it belongs to,
+            the index of the other vertex of the corresponding edge, and the index
+            of the loaded face.
+
+        """
         mesh       = self.mesh
         key_index  = self.key_index
         fkey_index = self.fkey_index
         is_loaded  = self.is_loaded
-
-        C = self.F.dot(xyz)
-
-        areas = zeros((xyz.shape[0], 1))
+        vertex = []
+        nbr    = []
+        face   = []
         for u in mesh.vertices():
-            p0 = xyz[key_index[u]]
-
-            a = 0
+            i = key_index[u]
             for v in mesh.halfedge[u]:
-                p1  = xyz[key_index[v]]
-                p01 = p1 - p0
-
-                fkey = mesh.halfedge[u][v]
-                if fkey is not None and is_loaded[fkey]:
-                    p2 = C[fkey_index[fkey]]
-                    a += 0.25 * length_vector(cross_vectors(p01, p2 - p0))
-
-                fkey = mesh.halfedge[v][u]
-                if fkey is not None and is_loaded[fkey]:
-                    p3 = C[fkey_index[fkey]]
-                    a += 0.25 * length_vector(cross_vectors(p01, p3 - p0))
-
-            areas[key_index[u]] = a
+                j = key_index[v]
+                for fkey in (mesh.halfedge[u][v], mesh.halfedge[v][u]):
+                    if fkey is not None and is_loaded[fkey]:
+                        vertex.append(i)
+                        nbr.append(j)
+                        face.append(fkey_index[fkey])
+        return array(vertex, dtype=int), array(nbr, dtype=int), array(face, dtype=int)
+
+    def jacobian(self, xyz):
+        """Compute the derivatives of the vertical loads with respect to the heights of the vertices.
+
+        Parameters
+        ----------
+        xyz : array
+            The (n x 3) vertex coordinates.
+
+        Returns
+        -------
+        scipy.sparse.csr_matrix
+            The (n x n) matrix with the derivatives of the vertical components
+            of the loads (rows) with respect to the z coordinates of the vertices (columns).
+
+        Notes
+        -----
+        The area of a tributary triangle depends on the heights of the vertex,
+        of the other vertex of the edge, and of the vertices of the face (through its centroid).
+        The derivatives of triangles with zero area are taken to be zero.
+
+        """
+        vertex, nbr, face = self.triangles
+        n = xyz.shape[0]
+        if self._expansion is None:
+            self._expansion = self._face_expansion()
+        index, columns, weights = self._expansion
+        c   = self.F.dot(xyz)
+        p0  = xyz[vertex]
+        e1  = xyz[nbr] - p0
+        e2  = c[face] - p0
+        nn  = cross(e1, e2)
+        ln  = sqrt((nn ** 2).sum(axis=1))
+        # the unit normal, and the derivatives of the area
+        # with respect to the height of the end of e1 and of e2
+        u   = divide(nn, ln[:, None], out=zeros(nn.shape), where=ln[:, None] > 0)
+        s2  = 0.25 * (u[:, 1] * e2[:, 0] - u[:, 0] * e2[:, 1])
+        s1  = 0.25 * (u[:, 0] * e1[:, 1] - u[:, 1] * e1[:, 0])
+        w   = asarray(self.thickness * self.density + self.live, dtype=float).reshape(-1)
+        if w.size == 1:
+            w = w.repeat(n)
+        rows = concatenate((vertex, vertex, vertex[index]))
+        cols = concatenate((nbr, vertex, columns))
+        vals = concatenate((s2, - s1 - s2, s1[index] * weights))
+        return coo_matrix((vals * w[rows], (rows, cols)), shape=(n, n)).tocsr()
+
+    def _face_expansion(self):
+        # per nonzero of the rows of the face matrix of the tributary triangles
+        # the index of the triangle, the index of the vertex, and the coefficient
+        vertex, nbr, face = self.triangles
+        F      = self.F
+        counts = F.indptr[face + 1] - F.indptr[face]
+        index  = repeat(arange(face.shape[0]), counts)
+        offset = arange(index.shape[0]) - repeat(cumsum(counts) - counts, counts)
+        nz     = F.indptr[face][index] + offset
+        return index, F.indices[nz], F.data[nz]
 
+    def _tributary_areas(self, xyz):
+        vertex, nbr, face = self.triangles
+        c   = self.F.dot(xyz)
+        p0  = xyz[vertex]
+        n   = cross(xyz[nbr] - p0, c[face] - p0)
+        a   = 0.25 * sqrt((n ** 2).sum(axis=1))
+        areas = zeros((xyz.shape[0], 1))
+        areas[:, 0] = bincount(vertex, weights=a, minlength=xyz.shape[0])
         return areas
 
 
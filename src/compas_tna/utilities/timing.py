@@ -0,0 +1,189 @@
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import division
+
+import threading
+
+from timeit import default_timer
+
+
+__author__  = 'Tom Van Mele'
+__email__   = 'vanmelet@ethz.ch'
+
+
+__all__ = [
+    'TimingCollector',
+    'start_timer',
+]
+
+
+_COLLECTORS = []
+
+_LOCK = threading.Lock()
+
+
+class TimingCollector(object):
+    """Context manager collecting the time spent in the different phases of the solvers.
+
+    While the collector is attached, every call to one of the solvers of
+    :mod:`compas_tna.equilibrium` adds a record to :attr:`calls`, with the name
+    of the solver, the total duration of the call, and the time spent per phase.
+    The phases are
+
+    * ``'extraction'``: making a snapshot of the data of the diagrams,
+    * ``'assembly'``: constructing the matrices of the problem,
+    * ``'factorization'``: factorising the matrices,
+    * ``'solves'``: solving the factorised systems,
+    * ``'loads'``: updating the self-weight,
+    * ``'residuals'``: computing residual forces or angle deviations,
+    * ``'writeback'``: computing the final results and assigning them to the attributes of the diagrams.
+
+    Attributes
+    ----------
+    calls : list
+        The records of the calls, as dicts with items ``'function'``, ``'total'`` and ``'phases'``.
+
+    Notes
+    -----
+    Collectors are attached globally, such that calls made from other threads are recorded as well.
+    Calls that raise an exception are not recorded.
+    If no collector is attached, the solvers do not read the clock at all.
+
+    Examples
+    --------
+    .. code-block:: python
+
+        with TimingCollector() as timings:
+            horizontal(form, force, display=False)
+            vertical_from_zmax(form, 3.0, display=False)
+
+        for call in timings.calls:
+            print(call['function'], call['total'], call['phases'])
+
+        print(timings.summary())
+
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def __enter__(self):
+        self.attach()
+        return self
+
+    def __exit__(self, *args):
+        self.detach()
+
+    def attach(self):
+        """Start collecting timings."""
+        with _LOCK:
+            if self not in _COLLECTORS:
+                _COLLECTORS.append(self)
+
+    def detach(self):
+        """Stop collecting timings."""
+        with _LOCK:
+            if self in _COLLECTORS:
+                _COLLECTORS.remove(self)
+
+    def clear(self):
+        """Remove all records."""
+        del self.calls[:]
+
+    def summary(self):
+        """Summarise the recorded calls per solver.
+
+        Returns
+        -------
+        dict
+            Per solver, the number of ``'calls'``, their ``'total'`` duration,
+            and the total time spent per phase (``'phases'``).
+
+        """
+        summary = {}
+        for call in list(self.calls):
+            item = summary.setdefault(call['function'], {'calls': 0, 'total': 0.0, 'phases': {}})
+            item['calls'] += 1
+            item['total'] += call['total']
+            for phase, t in call['phases'].items():
+                item['phases'][phase] = item['phases'].get(phase, 0.0) + t
+        return summary
+
+
+class _CallTimer(object):
+
+    __slots__ = ('record', 't0', 't')
+
+    def __init__(self, function):
+        self.record = {'function': function, 'total': 0.0, 'phases': {}}
+        self.t0 = self.t = default_timer()
+
+    def __call__(self, phase):
+        t = default_timer()
+        phases = self.record['phases']
+        phases[phase] = phases.get(phase, 0.0) + (t - self.t)
+        self.t = t
+
+    def stop(self):
+        self.record['total'] = default_timer() - self.t0
+        with _LOCK:
+            for collector in _COLLECTORS:
+                collector.calls.append(self.record)
+
+
+class _NullTimer(object):
+
+    __slots__ = ()
+
+    def __call__(self, phase):
+        pass
+
+    def stop(self):
+        pass
+
+
+_NULL = _NullTimer()
+
+
+def start_timer(function):
+    """Start timing a call to a solver.
+
+    Parameters
+    ----------
+    function : str
+        The name of the solver.
+
+    Returns
+    -------
+    callable
+        A timer. Calling the timer with the name of a phase attributes the time
+        elapsed since the previous call (or since the start) to that phase.
+        Calling ``stop`` ends the timing and adds the record to the attached collectors.
+        If no collector is attached, the timer does nothing.
+
+    Examples
+    --------
+    .. code-block:: python
+
+        timer = start_timer('solver')
+
+        A = assemble()
+        timer('assembly')
+
+        x = solve(A, b)
+        timer('solves')
+
+        timer.stop()
+
+    """
+    if not _COLLECTORS:
+        return _NULL
+    return _CallTimer(function)
+
+
+# ==============================================================================
+# Main
+# ==============================================================================
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,326 @@
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import division
+
+import sys
+import json
+import importlib
+import threading
+import traceback
+
+import compas
+
+from compas.utilities import DataEncoder
+from compas.utilities import DataDecoder
+
+try:
+    from subprocess import Popen
+    from subprocess import PIPE
+except ImportError:
+    if compas.is_windows():
+        compas.raise_if_not_ironpython()
+    elif not compas.is_mono():
+        raise
+
+try:
+    from queue import Queue
+    from queue import Empty
+except ImportError:
+    from Queue import Queue
+    from Queue import Empty
+
+
+__author__  = 'Tom Van Mele'
+__email__   = 'vanmelet@ethz.ch'
+
+
+__all__ = [
+    'XWorker',
+    'get_xworker',
+]
+
+
+_WORKERS = {}
+
+BOOTSTRAP = """
+import sys
+sys.path[0:0] = sys.argv[1:]
+from compas_tna.utilities.worker import _serve
+_serve()
+"""
+
+
+class XWorker(object):
+    """Long-lived external Python process for calling functions that are not
+    available in the current interpreter, for example because they require Numpy and Scipy.
+
+    In contrast to :class:`compas.utilities.XFunc`, which starts a new process
+    for every call, the worker process is started only once and then kept alive.
+    Modules imported by the wrapped functions, and anything they cache at the level of the process,
+    therefore persist between calls.
+    The diagrams are reconstructed from their data on every call,
+    but the ``*_xfunc`` wrappers of the equilibrium solvers factorise the Laplacians
+    through the cache of the process (see :func:`compas_tna.utilities.factorization_cache`),
+    such that repeated calls with the same topology, or the same force densities,
+    reuse the factorisations of the previous calls.
+
+    Parameters
+    ----------
+    python : str, optional
+        The Python executable.
+        Default is ``'pythonw'``.
+    paths : list, optional
+        A list of paths to be added to ``sys.path`` of the worker process.
+        Default is ``None``.
+    callback : callable, optional
+        A function to be called every time the wrapped function prints output.
+        The first parameter passed to this function is the line printed by the
+        wrapped function. Additional parameters can be defined using ``callback_args``.
+        Default is ``None``.
+    callback_args : tuple, optional
+        Additional parameters for the callback function.
+        Default is ``None``.
+    timeout : float, optional
+        The maximum number of seconds to wait for output of the worker process.
+        The timer is reset by every line printed by the wrapped function.
+        If the worker does not respond in time, it is stopped and an exception is raised.
+        Default is ``600``.
+        Use ``None`` to wait indefinitely.
+
+    Notes
+    -----
+    Requests and responses are exchanged as single lines of JSON over the standard
+    input and output of the worker process, serialised with the data encoder and
+    decoder of compas.
+    Output printed by the wrapped functions is forwarded line by line.
+
+    If the worker process is not running, or dies during a call, it is (re)started
+    and the call is retried once.
+    If it dies again, the exception includes what the process wrote to its standard error,
+    for example the traceback of an import error in the worker process itself.
+
+    Examples
+    --------
+    .. code-block:: python
+
+        worker = get_xworker()
+
+        formdata, forcedata, result = worker('compas_tna.equilibrium.horizontal_xfunc', form.to_data(), force.to_data())
+
+    """
+
+    def __init__(self, python='pythonw', paths=None, callback=None, callback_args=None, timeout=600):
+        self.python        = python
+        self.paths         = paths or []
+        self.callback      = callback
+        self.callback_args = callback_args
+        self.timeout       = timeout
+        self.process       = None
+        self.error         = None
+        self._lines        = None
+        self._errors       = None
+        self._stderr       = None
+
+    @property
+    def is_alive(self):
+        """bool : True if the worker process is running."""
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        """Start the worker process, if it is not running already."""
+        if self.is_alive:
+            return
+        self.stop()
+        args = [self.python, '-u', '-c', BOOTSTRAP] + list(self.paths)
+        self.process = Popen(args, stdin=PIPE, stdout=PIPE, stderr=PIPE, universal_newlines=True)
+        # both pipes are read by background threads
+        # such that the requests can time out, and the worker never blocks on a full pipe
+        self._lines  = Queue()
+        self._stderr = []
+        self._errors = _start_reader(self.process.stderr, self._stderr.append)
+        _start_reader(self.process.stdout, self._lines.put)
+
+    def stop(self):
+        """Stop the worker process."""
+        process, self.process = self.process, None
+        if process is None:
+            return
+        try:
+            if process.poll() is None:
+                process.stdin.close()
+                process.terminate()
+            process.wait()
+        except (IOError, OSError):
+            pass
+
+    def __call__(self, funcname, *args, **kwargs):
+        """Call a function in the worker process.
+
+        Parameters
+        ----------
+        funcname : str
+            The full name of the function, including the name of its module.
+        args : tuple
+            The positional arguments of the call.
+        kwargs : dict
+            The keyword arguments of the call.
+
+        Returns
+        -------
+        object
+            The data returned by the function.
+
+        Raises
+        ------
+        Exception
+            If the function raised an exception, with the traceback as message.
+        EOFError
+            If the worker process stopped unexpectedly, twice,
+            with the standard error of the process as message.
+        RuntimeError
+            If the worker process did not respond within ``timeout`` seconds.
+
+        """
+        request = json.dumps({'funcname': funcname, 'args': args, 'kwargs': kwargs}, cls=DataEncoder)
+        for attempt in range(2):
+            self.start()
+            try:
+                response = self._request(request)
+            except (IOError, OSError, EOFError, ValueError):
+                self.stop()
+                if attempt:
+                    raise
+                continue
+            self.error = response['error']
+            if self.error:
+                raise Exception(self.error)
+            return response['data']
+
+    def _request(self, request):
+        stdin = self.process.stdin
+        stdin.write(request + '\n')
+        stdin.flush()
+        while True:
+            try:
+                line = self._lines.get(timeout=self.timeout)
+            except Empty:
+                self.stop()
+                raise RuntimeError('The worker process did not respond within {0} seconds.'.format(self.timeout))
+            if not line:
+                self.process.wait()
+                raise EOFError('The worker process stopped unexpectedly.\n' + self._read_stderr())
+            message = json.loads(line, cls=DataDecoder)
+            if 'line' not in message:
+                return message
+            if self.callback:
+                self.callback(message['line'], self.callback_args)
+
+    def _read_stderr(self):
+        # the reader of stderr finishes when the process has exited
+        self._errors.join(1.0)
+        return ''.join(self._stderr)
+
+
+def get_xworker(python='pythonw', paths=None):
+    """Get the shared worker for a specific Python executable, and start it if necessary.
+
+    Parameters
+    ----------
+    python : str, optional
+        The Python executable.
+        Default is ``'pythonw'``.
+    paths : list, optional
+        A list of paths to be added to ``sys.path`` of the worker process.
+        Only used if the worker has to be created.
+        Default is ``None``.
+
+    Returns
+    -------
+    XWorker
+
+    """
+    worker = _WORKERS.get(python)
+    if worker is None:
+        worker = _WORKERS[python] = XWorker(python=python, paths=paths)
+    worker.start()
+    return worker
+
+
+def _start_reader(stream, put):
+    # read the lines of a stream in a background thread
+    # the end of the stream is marked by an empty string
+    def read():
+        for line in iter(stream.readline, ''):
+            put(line)
+        put('')
+    thread = threading.Thread(target=read)
+    thread.daemon = True
+    thread.start()
+    return thread
+
+
+# ==============================================================================
+# Worker process
+# ==============================================================================
+
+class _LineWriter(object):
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.buffer = ''
+
+    def write(self, text):
+        self.buffer += text
+        while '\n' in self.buffer:
+            line, self.buffer = self.buffer.split('\n', 1)
+            _send(self.stream, {'line': line})
+
+    def flush(self):
+        if self.buffer:
+            _send(self.stream, {'line': self.buffer})
+            self.buffer = ''
+        self.stream.flush()
+
+
+def _send(stream, message):
+    stream.write(json.dumps(message, cls=DataEncoder) + '\n')
+    stream.flush()
+
+
+def _serve():
+    stdin      = sys.stdin
+    stdout     = sys.stdout
+    writer     = _LineWriter(stdout)
+    sys.stdout = writer
+    sys.stderr = writer
+    functions  = {}
+    for line in iter(stdin.readline, ''):
+        try:
+            request  = json.loads(line, cls=DataDecoder)
+            funcname = request['funcname']
+            function = functions.get(funcname)
+            if function is None:
+                mname, fname = funcname.rsplit('.', 1)
+                function = functions[funcname] = getattr(importlib.import_module(mname), fname)
+            data = function(*request['args'], **request['kwargs'])
+        except Exception:
+            response = {'data': None, 'error': traceback.format_exc()}
+        else:
+            response = {'data': data, 'error': None}
+        writer.flush()
+        _send(stdout, response)
+
+
+def _cache_info():
+    # the statistics of the factorisation cache of the worker process
+    from compas_tna.utilities.linalg import factorization_cache
+    cache = factorization_cache()
+    return {'hits': cache.hits, 'misses': cache.misses, 'size': len(cache)}
+
+
+# ==============================================================================
+# Main
+# ==============================================================================
+
+if __name__ == '__main__':
+    pass
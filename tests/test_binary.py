@@ -0,0 +1,52 @@
+from compas_tna.benchmarks import orthogonal_grid
+from compas_tna.diagrams import FormDiagram
+from compas_tna.diagrams import ForceDiagram
+from compas_tna.equilibrium import horizontal_nodal
+from compas_tna.equilibrium import vertical_from_zmax
+
+
+def _types(data):
+    # the types of all values, since 1 == 1.0
+    # tuples become lists, as in every exchange through JSON
+    if isinstance(data, dict):
+        return dict((key, _types(value)) for key, value in data.items())
+    if isinstance(data, (list, tuple)):
+        return [_types(value) for value in data]
+    return type(data), data
+
+
+def _assert_roundtrip(diagram, cls):
+    data = diagram.to_data()
+    for compress in (True, False):
+        other = cls.from_bytes(diagram.to_bytes(compress=compress))
+        assert _types(other.to_data()) == _types(data)
+
+
+def test_roundtrip():
+    form = orthogonal_grid(6)
+    force = ForceDiagram.from_formdiagram(form)
+    horizontal_nodal(form, force, display=False)
+    vertical_from_zmax(form, 2.0, display=False)
+    _assert_roundtrip(form, FormDiagram)
+    _assert_roundtrip(force, ForceDiagram)
+
+
+def test_roundtrip_mixed_types():
+    form = orthogonal_grid(4)
+    keys = list(form.vertices())
+    # integers in columns of doubles
+    form.set_vertex_attribute(keys[0], 'z', 1)
+    form.set_vertex_attribute(keys[1], 'pz', -2)
+    form.set_vertex_attribute(keys[1], 'z', 0.5)
+    # integers outside the range of the integer columns
+    form.set_vertex_attribute(keys[2], 'px', 2 ** 40)
+    # values that are not numbers
+    form.set_vertex_attribute(keys[3], 'name', 'a')
+    form.set_vertex_attribute(keys[4], 'name', None)
+    u, v = next(form.edges())
+    form.set_edge_attribute((u, v), 'q', 3)
+    _assert_roundtrip(form, FormDiagram)
+    other = FormDiagram.from_bytes(form.to_bytes())
+    assert type(other.vertex[keys[0]]['z']) is int
+    assert type(other.vertex[keys[1]]['z']) is float
+    assert type(other.get_edge_attribute((u, v), 'q')) is int
@@ -0,0 +1,40 @@
+import pytest
+
+from numpy import ones
+from numpy import linspace
+from numpy.linalg import matrix_rank
+from numpy.linalg import norm
+
+from compas_tna.benchmarks import orthogonal_grid
+from compas_tna.utilities import SPDSolver
+from compas_tna.utilities import independent_columns
+from compas_tna.utilities.diagrams import _equilibrium_matrix
+
+
+def test_cg_matches_direct():
+    arrays = orthogonal_grid(20).to_arrays()
+    q = linspace(1.0, 3.0, arrays.ecount).reshape((-1, 1))
+    A, B, L = arrays.assembler.assemble(q)
+    b = ones((A.shape[0], 3))
+    x = SPDSolver(A, method='direct')(b)
+    for preconditioner in ('jacobi', 'auto'):
+        solve = SPDSolver(A, method='cg', preconditioner=preconditioner, tol=1e-12)
+        y = solve(b)
+        assert solve.info == 0
+        assert norm(y - x) <= 1e-8 * norm(x)
+
+
+# the reduced row echelon form of sympy is only a reference for exact geometry
+@pytest.mark.parametrize('form', [orthogonal_grid(4), orthogonal_grid(6, opening=2), orthogonal_grid(5, feet=1)])
+def test_independent_columns_agree(form):
+    E = _equilibrium_matrix(form)
+    rank, ind, dep = independent_columns(E, algo='sympy')
+    # the sparse LU decomposition and the reduced row echelon form
+    # both select the independent columns from left to right
+    assert independent_columns(E, algo='lu') == (rank, ind, dep)
+    # the QR decompositions select a different, but equally valid set
+    for algo in ('dense', 'qr'):
+        r, i, d = independent_columns(E, algo=algo)
+        assert r == rank
+        assert sorted(i + d) == list(range(E.shape[1]))
+        assert matrix_rank(E.toarray()[:, i]) == rank
@@ -0,0 +1,38 @@
+from numpy import array_equal
+
+from compas_tna.benchmarks import orthogonal_grid
+from compas_tna.diagrams import ForceDiagram
+from compas_tna.equilibrium import horizontal_nodal
+from compas_tna.equilibrium import parameter_sweep
+
+
+def _assert_equal(serial, parallel):
+    assert serial['parameters'] == parallel['parameters']
+    assert serial['values'] == parallel['values']
+    for key in serial:
+        if key in ('parameters', 'values'):
+            continue
+        if serial[key].dtype == object:
+            assert serial[key].tolist() == parallel[key].tolist()
+        else:
+            assert array_equal(serial[key], parallel[key])
+
+
+def test_vertical_sweep_parallel_equals_serial():
+    form = orthogonal_grid(6)
+    force = ForceDiagram.from_formdiagram(form)
+    horizontal_nodal(form, force, display=False)
+    parameters = {'zmax': [1.0, 2.0, 3.0], 'density': [1.0, 2.0]}
+    serial = parameter_sweep(form, parameters, processes=1)
+    for shared in (True, False):
+        parallel = parameter_sweep(form, parameters, processes=2, shared=shared)
+        _assert_equal(serial, parallel)
+
+
+def test_horizontal_sweep_parallel_equals_serial():
+    form = orthogonal_grid(6)
+    force = ForceDiagram.from_formdiagram(form)
+    parameters = {'alpha': [0, 50, 100]}
+    serial = parameter_sweep(form, parameters, solver='horizontal', force=force, processes=1, kmax=20)
+    parallel = parameter_sweep(form, parameters, solver='horizontal', force=force, processes=2, kmax=20)
+    _assert_equal(serial, parallel)
@@ -0,0 +1,48 @@
+import json
+
+from compas.utilities import DataEncoder
+
+from compas_tna.benchmarks import orthogonal_grid
+from compas_tna.diagrams import FormDiagram
+from compas_tna.diagrams import ForceDiagram
+from compas_tna.equilibrium import horizontal_xfunc
+from compas_tna.equilibrium import vertical_from_zmax_xfunc
+
+
+def _json(data):
+    # the results of the worker are exchanged as JSON
+    return json.loads(json.dumps(data, cls=DataEncoder, sort_keys=True))
+
+
+def _columns(diagram):
+    # the solvers create entries in the edge data of compas while reading attributes,
+    # so the data is compared through the attributes of the vertices and edges
+    return _json(diagram.get_columns())
+
+
+def _diagrams():
+    form = orthogonal_grid(6)
+    force = ForceDiagram.from_formdiagram(form)
+    return form, force
+
+
+def test_horizontal_delta_equals_full():
+    form, force = _diagrams()
+    formdata, forcedata = form.to_bytes(text=True), force.to_bytes(text=True)
+    full = _json(horizontal_xfunc(formdata, forcedata, kmax=20, display=False))
+    delta = _json(horizontal_xfunc(formdata, forcedata, kmax=20, display=False, delta=True))
+    form.set_columns(delta[0])
+    force.set_columns(delta[1])
+    assert _columns(form) == _columns(FormDiagram.from_data(full[0]))
+    assert _columns(force) == _columns(ForceDiagram.from_data(full[1]))
+    assert delta[2] == full[2]
+
+
+def test_vertical_delta_equals_full():
+    form, force = _diagrams()
+    formdata = form.to_bytes(text=True)
+    full = _json(vertical_from_zmax_xfunc(formdata, 2.0, display=False))
+    delta = _json(vertical_from_zmax_xfunc(formdata, 2.0, display=False, delta=True))
+    form.set_columns(delta[0])
+    assert _columns(form) == _columns(FormDiagram.from_data(full[0]))
+    assert delta[1] == full[1]
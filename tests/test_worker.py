@@ -0,0 +1,20 @@
+import sys
+
+from compas_tna.benchmarks import orthogonal_grid
+from compas_tna.diagrams import ForceDiagram
+from compas_tna.utilities.worker import XWorker
+
+
+def test_worker_reuses_factorizations():
+    form = orthogonal_grid(8)
+    force = ForceDiagram.from_formdiagram(form)
+    worker = XWorker(python=sys.executable, paths=sys.path)
+    try:
+        for k in range(2):
+            worker('compas_tna.equilibrium.horizontal_xfunc', form.to_data(), force.to_data(), kmax=10, display=False)
+            info = worker('compas_tna.utilities.worker._cache_info')
+    finally:
+        worker.stop()
+    # the second call reuses the factorisations of the first
+    assert info['hits'] > 0
+    assert info['misses'] == info['size']